@@ -0,0 +1,685 @@
+'''
+Created on 18.10.2026
+
+@author: wk
+'''
+import calendar
+import datetime
+import itertools
+import mmap
+import os
+import re
+import shutil
+import struct
+from SilentLog import SilentLog
+
+
+class BitWriter:
+    '''Collects values with a given count of bits (most significant bit first).
+    '''
+
+    def __init__(self):
+        '''Constructor.
+        '''
+        self._buffer = bytearray()
+        self._value = 0
+        self._bits = 0
+
+    def write(self, value: int, bits: int):
+        '''Appends a value.
+        @param value: the value: only the lowest bits are stored
+        @param bits: the count of bits to store
+        '''
+        self._value = (self._value << bits) | (value & ((1 << bits) - 1))
+        self._bits += bits
+        while self._bits >= 8:
+            self._bits -= 8
+            self._buffer.append((self._value >> self._bits) & 0xff)
+        self._value &= (1 << self._bits) - 1
+
+    def data(self) -> bytes:
+        '''Returns the collected bits: the last byte is filled with 0 bits.
+        @return: the bits as bytes
+        '''
+        rc = bytes(self._buffer)
+        if self._bits > 0:
+            rc += bytes(((self._value << (8 - self._bits)) & 0xff,))
+        return rc
+
+
+class BitReader:
+    '''Reads values with a given count of bits (most significant bit first) from bytes written by BitWriter.
+    '''
+
+    def __init__(self, data):
+        '''Constructor.
+        @param data: the bytes (bytes, bytearray or a memoryview)
+        '''
+        self._data = bytes(data)
+        self._position = 0
+
+    def read(self, bits: int) -> int:
+        '''Reads the next value.
+        @param bits: the count of bits of the value
+        @return: the value (unsigned)
+        '''
+        position = self._position
+        self._position += bits
+        end = (self._position + 7) >> 3
+        # only the bytes containing the value are converted:
+        rc = (int.from_bytes(self._data[position >> 3:end], 'big') >> ((end << 3) - self._position)) & ((1 << bits) - 1)
+        return rc
+
+    def prefix(self, maximum: int) -> int:
+        '''Reads a sequence of 1 bits terminated by a 0 bit.
+        @param maximum: the maximal count of 1 bits (no 0 bit follows this count)
+        @return: the count of 1 bits
+        '''
+        rc = 0
+        while rc < maximum and self.read(1) == 1:
+            rc += 1
+        return rc
+
+
+class Codec:
+    '''Compression of time series in the style of "Gorilla" (Facebook's in-memory time series database):
+    timestamps are stored as delta-of-delta, floats as XOR with the predecessor.
+    Regular timestamps need 1 bit, unchanged values 1 bit, slowly changing values some bits.
+    None is stored as a special NaN.
+    '''
+    # prefix (count of 1 bits) -> (count of bits, offset) of a delta-of-delta. The prefix 4 stores 64 bits.
+    dodRanges = ((7, 63), (9, 255), (12, 2047))
+    noneBits = 0x7ff8000000000001
+
+    @staticmethod
+    def encodeTimes(times) -> bytes:
+        '''Encodes ascending (or nearly ascending) integer timestamps.
+        @param times: the timestamps (seconds)
+        @return: the encoded data
+        '''
+        writer = BitWriter()
+        last = lastDelta = 0
+        for ix, value in enumerate(times):
+            if ix == 0:
+                writer.write(value, 64)
+            else:
+                delta = value - last
+                dod = delta - lastDelta
+                lastDelta = delta
+                if dod == 0:
+                    writer.write(0, 1)
+                else:
+                    for prefix, (bits, offset) in enumerate(Codec.dodRanges, 1):
+                        if -offset <= dod <= offset + 1:
+                            writer.write(((1 << (prefix + 1)) - 2) << bits | (dod + offset), prefix + 1 + bits)
+                            break
+                    else:
+                        writer.write(0xf, 4)
+                        writer.write(dod, 64)
+            last = value
+        return writer.data()
+
+    @staticmethod
+    def decodeTimes(data, count: int):
+        '''Decodes timestamps written by encodeTimes().
+        @param data: the encoded data
+        @param count: the count of timestamps
+        @return: the list of timestamps
+        '''
+        rc = []
+        if count > 0:
+            reader = BitReader(data)
+            value = reader.read(64)
+            if value >= 1 << 63:
+                value -= 1 << 64
+            rc.append(value)
+            delta = 0
+            for _ix in range(count - 1):
+                prefix = reader.prefix(4)
+                if prefix == 4:
+                    dod = reader.read(64)
+                    delta += dod - (1 << 64) if dod >= 1 << 63 else dod
+                elif prefix > 0:
+                    bits, offset = Codec.dodRanges[prefix - 1]
+                    delta += reader.read(bits) - offset
+                value += delta
+                rc.append(value)
+        return rc
+
+    @staticmethod
+    def encodeFloats(values) -> bytes:
+        '''Encodes floats (or None).
+        @param values: the values
+        @return: the encoded data
+        '''
+        writer = BitWriter()
+        last = 0
+        leading = trailing = -1
+        for ix, value in enumerate(values):
+            bits = Codec.noneBits if value is None else struct.unpack('>Q', struct.pack('>d', value))[0]
+            if ix == 0:
+                writer.write(bits, 64)
+            else:
+                xor = bits ^ last
+                if xor == 0:
+                    writer.write(0, 1)
+                else:
+                    currentLeading = min(31, 64 - xor.bit_length())
+                    currentTrailing = (xor & -xor).bit_length() - 1
+                    if leading >= 0 and currentLeading >= leading and currentTrailing >= trailing:
+                        writer.write(0b10, 2)
+                        writer.write(xor >> trailing, 64 - leading - trailing)
+                    else:
+                        leading, trailing = currentLeading, currentTrailing
+                        length = 64 - leading - trailing
+                        writer.write(0b11, 2)
+                        writer.write(leading, 5)
+                        writer.write(length - 1, 6)
+                        writer.write(xor >> trailing, length)
+            last = bits
+        return writer.data()
+
+    @staticmethod
+    def decodeFloats(data, count: int):
+        '''Decodes floats written by encodeFloats().
+        @param data: the encoded data
+        @param count: the count of values
+        @return: the list of values (float or None)
+        '''
+        rc = []
+        if count > 0:
+            reader = BitReader(data)
+            bits = reader.read(64)
+            unpack = struct.Struct('>d').unpack
+            pack = struct.Struct('>Q').pack
+            rc.append(None if bits == Codec.noneBits else unpack(pack(bits))[0])
+            leading = trailing = 0
+            for _ix in range(count - 1):
+                if reader.read(1) == 1:
+                    if reader.read(1) == 1:
+                        leading = reader.read(5)
+                        trailing = 64 - leading - reader.read(6) - 1
+                    bits ^= reader.read(64 - leading - trailing) << trailing
+                rc.append(None if bits == Codec.noneBits else unpack(pack(bits))[0])
+        return rc
+
+
+class ArchiveFile:
+    '''One column of one month in the archive, read by memory mapping.
+    Structure: header, block index, blocks. Each block is encoded independently (see Codec):
+    a time range is decoded without touching the other blocks.
+    Header: magic "SMA1", kind (0: timestamps, 1: floats), block size, count of values, count of blocks.
+    Block index: per block the first timestamp, the count of values, the offset and the length of the data.
+    '''
+    magic = b'SMA1'
+    header = struct.Struct('<4sBxxxIII')
+    entry = struct.Struct('<qIII')
+
+    def __init__(self, filename: str):
+        '''Constructor: maps the file into memory.
+        @param filename: the file to read
+        '''
+        self.filename = filename
+        self._fp = open(filename, 'rb')
+        self._map = mmap.mmap(self._fp.fileno(), 0, access=mmap.ACCESS_READ)
+        (magic, self.kind, self.blockSize, self.count, countBlocks) = ArchiveFile.header.unpack_from(self._map, 0)
+        if magic != ArchiveFile.magic:
+            self.close()
+            raise ValueError(f'{filename}: not an archive file')
+        # a list of (first timestamp, count, offset, length)
+        self.blocks = list(ArchiveFile.entry.iter_unpack(
+            self._map[ArchiveFile.header.size:ArchiveFile.header.size + countBlocks * ArchiveFile.entry.size]))
+
+    @staticmethod
+    def write(filename: str, kind: int, times, values, blockSize: int=1024):
+        '''Writes a column. The file is replaced atomically.
+        @param filename: the file to write
+        @param kind: 0: timestamps (values are ignored) 1: floats
+        @param times: the timestamps of the column (for the block index)
+        @param values: the values of the column (kind 1)
+        @param blockSize: the count of values of a block
+        @return: the size of the file
+        '''
+        writer = ColumnWriter(filename, kind, blockSize)
+        for ix, seconds in enumerate(times):
+            writer.add(seconds, None if kind == 0 else values[ix])
+        return writer.close()
+
+    def close(self):
+        '''Frees the resources.
+        '''
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+        if self._fp is not None:
+            self._fp.close()
+            self._fp = None
+
+    def decode(self, block: int):
+        '''Decodes one block.
+        @param block: the index of the block
+        @return: the values of the block
+        '''
+        (_first, count, offset, length) = self.blocks[block]
+        data = self._map[offset:offset + length]
+        rc = Codec.decodeTimes(data, count) if self.kind == 0 else Codec.decodeFloats(data, count)
+        return rc
+
+
+class ColumnWriter:
+    '''Writes a column file block by block (structure: see ArchiveFile): only the values of the current block
+    are held in memory. The encoded blocks are collected in a temporary file because the block index
+    is written before them.
+    '''
+
+    def __init__(self, filename: str, kind: int, blockSize: int=1024):
+        '''Constructor.
+        @param filename: the file to write
+        @param kind: 0: timestamps 1: floats
+        @param blockSize: the count of values of a block
+        '''
+        self._filename = filename
+        self._kind = kind
+        self._blockSize = blockSize
+        self._times = []
+        self._values = []
+        # a list of (first timestamp, count, offset in the data, length)
+        self._index = []
+        self._size = 0
+        self.count = 0
+        self._data = open(filename + '.data', 'w+b')
+
+    def add(self, seconds: int, value: float=None):
+        '''Adds one value.
+        @param seconds: the timestamp of the value
+        @param value: the value (kind 1)
+        '''
+        self._times.append(seconds)
+        self._values.append(value)
+        self.count += 1
+        if len(self._times) >= self._blockSize:
+            self._flush()
+
+    def _flush(self):
+        '''Encodes the current block into the temporary file.
+        '''
+        if len(self._times) > 0:
+            data = Codec.encodeTimes(self._times) if self._kind == 0 else Codec.encodeFloats(self._values)
+            self._index.append((self._times[0], len(self._times), self._size, len(data)))
+            self._data.write(data)
+            self._size += len(data)
+            self._times = []
+            self._values = []
+
+    def close(self) -> int:
+        '''Writes the file: header, block index and the blocks. The file is replaced atomically.
+        @return: the size of the file
+        '''
+        self._flush()
+        base = ArchiveFile.header.size + ArchiveFile.entry.size * len(self._index)
+        temp = self._filename + '.tmp'
+        try:
+            with open(temp, 'wb') as fp:
+                fp.write(ArchiveFile.header.pack(ArchiveFile.magic, self._kind, self._blockSize, self.count,
+                                                 len(self._index)))
+                fp.write(b''.join(map(lambda entry: ArchiveFile.entry.pack(entry[0], entry[1], base + entry[2],
+                                                                           entry[3]), self._index)))
+                self._data.seek(0)
+                shutil.copyfileobj(self._data, fp)
+            os.replace(temp, self._filename)
+        finally:
+            self.discard()
+        return base + self._size
+
+    def discard(self):
+        '''Removes the temporary file.
+        '''
+        if self._data is not None:
+            self._data.close()
+            self._data = None
+            os.unlink(self._filename + '.data')
+
+
+class ArchiveMonth:
+    '''The archived events of one month and one device: one file per column (timestamps and series).
+    The timestamps are the local time as seconds since the epoch (as if the local time were UTC): see Archive.toSeconds().
+    '''
+
+    def __init__(self, prefix: str):
+        '''Constructor.
+        @param prefix: the path of the files without the column name, e.g. "/opt/sunmonitor/archive/roof/2023-03"
+        '''
+        self._prefix = prefix
+        self._files = {}
+        self._changed = os.stat(prefix + '.time').st_mtime_ns
+        self.times = self.file('time')
+        self.count = self.times.count
+
+    def close(self):
+        '''Frees the resources.
+        '''
+        for file in self._files.values():
+            file.close()
+        self._files = {}
+
+    def isCurrent(self) -> bool:
+        '''Tests whether the files have not been replaced since opening (e.g. archived again).
+        @return: True: the mapped files are up to date
+        '''
+        rc = os.path.exists(self._prefix + '.time') and os.stat(self._prefix + '.time').st_mtime_ns == self._changed
+        return rc
+
+    def file(self, column: str) -> ArchiveFile:
+        '''Returns the file of a column (mapped on the first call).
+        @param column: "time" or a series name
+        @return: the ArchiveFile instance
+        '''
+        rc = self._files.get(column)
+        if rc is None:
+            rc = self._files[column] = ArchiveFile(f'{self._prefix}.{column}')
+        return rc
+
+    def rows(self, start: int, end: int, series):
+        '''Returns the archived values of a time range. Only the blocks overlapping the range are decoded.
+        @param start: the start of the range (local seconds, see Archive.toSeconds())
+        @param end: the end of the range (including)
+        @param series: the names of the series, e.g. ['total', 'apower']
+        @return: an iterator of tuples (seconds, value of the 1st series, ...) ordered by time
+        '''
+        blocks = self.times.blocks
+        for ix in range(len(blocks)):
+            if blocks[ix][0] > end:
+                break
+            if ix + 1 < len(blocks) and blocks[ix + 1][0] < start:
+                continue
+            columns = [self.times.decode(ix)] + list(map(lambda name: self.file(name).decode(ix), series))
+            for row in zip(*columns):
+                if start <= row[0] <= end:
+                    yield row
+
+
+class Archive:
+    '''Manages the archive of closed months: the events of each month and device are stored in compressed
+    column files (see Codec, ArchiveFile) instead of the table "events". Charts and statistics read the archived
+    months from these files.
+    Directory structure: <directory>/<device>/<YYYY-MM>.<column>, e.g. /opt/sunmonitor/archive/roof/2023-03.apower
+    The device "all" contains the events of all devices.
+    '''
+    # the archived series and the column in the table "events":
+    series = {'total': 'event_total', 'apower': 'event_apower', 'voltage': 'event_voltage',
+              'current': 'event_current', 'temperature': 'event_temperature'}
+    allDevices = 'all'
+
+    def __init__(self, directory: str, db=None, logger: SilentLog=None, blockSize: int=1024):
+        '''Constructor.
+        @param directory: the base directory of the archive
+        @param db: None or the database access (a MyDb instance): needed for archiving
+        @param logger: None or the error handler. None: db
+        @param blockSize: the count of values of a block (the unit of the decoding)
+        '''
+        self._directory = directory
+        self._db = db
+        self._logger = db if logger is None else logger
+        self._blockSize = blockSize
+        self._months = {}
+        self._opened = {}
+
+    @staticmethod
+    def toSeconds(eventTime: datetime.datetime) -> int:
+        '''Converts a (local) time into seconds since the epoch as if the local time were UTC.
+        That is unambiguous, even at the end of the daylight saving time.
+        @param eventTime: the time
+        @return: the seconds
+        '''
+        rc = calendar.timegm(eventTime.timetuple())
+        return rc
+
+    @staticmethod
+    def toDateTime(seconds: int) -> datetime.datetime:
+        '''Converts seconds computed by toSeconds() into a datetime instance.
+        @param seconds: the seconds
+        @return: the (local) time
+        '''
+        rc = datetime.datetime(1970, 1, 1) + datetime.timedelta(seconds=seconds)
+        return rc
+
+    @staticmethod
+    def monthStart(date: datetime.date, months: int=0) -> datetime.date:
+        '''Returns the first day of a month.
+        @param date: a day of the month
+        @param months: the count of months to add (may be negative)
+        @return: the first day of the month
+        '''
+        index = date.year * 12 + date.month - 1 + months
+        rc = datetime.date(index // 12, index % 12 + 1, 1)
+        return rc
+
+    def close(self):
+        '''Frees the resources (mapped files).
+        '''
+        for month in self._opened.values():
+            month.close()
+        self._opened = {}
+        self._months = {}
+
+    def path(self, month: datetime.date, device: str) -> str:
+        '''Returns the path of the files of one month without the column name.
+        @param month: a day of the month
+        @param device: None or the device
+        @return: the path, e.g. "/opt/sunmonitor/archive/roof/2023-03"
+        '''
+        rc = os.path.join(self._directory, device or Archive.allDevices, month.strftime('%Y-%m'))
+        return rc
+
+    def months(self, device: str):
+        '''Returns the archived months of a device.
+        @param device: None (all devices) or the device
+        @return: a set of the first days of the archived months
+        '''
+        device = device or Archive.allDevices
+        directory = os.path.join(self._directory, device)
+        # the directory is scanned again if it has been changed (e.g. by the archiving process):
+        changed = os.stat(directory).st_mtime_ns if os.path.isdir(directory) else 0
+        (rc, lastChanged) = self._months.get(device, (None, None))
+        if rc is None or changed != lastChanged:
+            rc = set()
+            if changed != 0:
+                for node in os.listdir(directory):
+                    matcher = re.match(r'^(\d{4})-(\d\d)\.time$', node)
+                    if matcher:
+                        rc.add(datetime.date(int(matcher.group(1)), int(matcher.group(2)), 1))
+            self._months[device] = (rc, changed)
+        return rc
+
+    def month(self, month: datetime.date, device: str) -> ArchiveMonth:
+        '''Returns the archived data of one month.
+        @param month: the first day of the month
+        @param device: None or the device
+        @return: None: not archived. Otherwise: the ArchiveMonth instance (opened on the first call)
+        '''
+        key = (month, device or Archive.allDevices)
+        rc = self._opened.get(key)
+        if rc is not None and not rc.isCurrent():
+            self._opened.pop(key).close()
+            rc = None
+        if rc is None and month in self.months(device):
+            rc = self._opened[key] = ArchiveMonth(self.path(month, device))
+        return rc
+
+    def covers(self, first: datetime.datetime, last: datetime.datetime, device: str) -> bool:
+        '''Tests whether a time range lies in archived months.
+        @param first: the start of the range
+        @param last: the end of the range (including)
+        @param device: None or the device
+        @return: True: all months of the range are archived
+        '''
+        months = self.months(device)
+        rc = len(months) > 0
+        month = Archive.monthStart(first)
+        while rc and month <= last.date():
+            rc = month in months
+            month = Archive.monthStart(month, 1)
+        return rc
+
+    def segments(self, firstDate: datetime.date, lastDate: datetime.date, device: str):
+        '''Splits a date range into parts which are archived or not.
+        @param firstDate: the start of the range
+        @param lastDate: the end of the range (excluding)
+        @param device: None or the device
+        @return: a list of tuples (first, last (excluding), archived)
+        '''
+        rc = []
+        months = self.months(device)
+        current = firstDate
+        while current < lastDate:
+            last = min(lastDate, Archive.monthStart(current, 1))
+            archived = Archive.monthStart(current) in months
+            if len(rc) > 0 and rc[-1][2] == archived:
+                rc[-1] = (rc[-1][0], last, archived)
+            else:
+                rc.append((current, last, archived))
+            current = last
+        return rc
+
+    def rows(self, first: datetime.datetime, last: datetime.datetime, device: str, series):
+        '''Returns the archived values of a time range.
+        @param first: the start of the range
+        @param last: the end of the range (including)
+        @param device: None or the device
+        @param series: the names of the series, e.g. ['total', 'apower']
+        @return: an iterator of tuples (seconds, value of the 1st series, ...) ordered by time.
+            seconds: see toSeconds()
+        '''
+        start = Archive.toSeconds(first)
+        end = Archive.toSeconds(last)
+        month = Archive.monthStart(first)
+        while month <= last.date():
+            archived = self.month(month, device)
+            if archived is not None:
+                yield from archived.rows(start, end, series)
+            month = Archive.monthStart(month, 1)
+
+    def events(self, firstDate: datetime.date, lastDate: datetime.date, device: str):
+        '''Returns the archived events of a date range in the form of the statistics (see Monitor.computeDays()).
+        @param firstDate: the start of the range
+        @param lastDate: the end of the range (excluding)
+        @param device: None or the device
+        @return: an iterator of tuples (event_time, event_total, event_apower) ordered by time
+        '''
+        last = datetime.datetime.combine(lastDate, datetime.time()) - datetime.timedelta(seconds=1)
+        for row in self.rows(datetime.datetime.combine(firstDate, datetime.time()), last, device,
+                             ('total', 'apower')):
+            yield (Archive.toDateTime(row[0]), row[1], row[2])
+
+    def write(self, month: datetime.date, device: str, rows):
+        '''Writes the archive files of one month. The rows are written block by block (streamed).
+        @param month: the first day of the month
+        @param device: None or the device
+        @param rows: the events ordered by time (an iterable): tuples (event_time, event_total, event_apower,
+            event_voltage, event_current, event_temperature) with event_time as datetime
+        @return: a tuple (count, size): the count of the events and the size of all files
+        '''
+        prefix = self.path(month, device)
+        os.makedirs(os.path.dirname(prefix), exist_ok=True)
+        times = ColumnWriter(f'{prefix}.time', 0, self._blockSize)
+        writers = list(map(lambda name: ColumnWriter(f'{prefix}.{name}', 1, self._blockSize), Archive.series))
+        try:
+            for row in rows:
+                seconds = Archive.toSeconds(row[0])
+                times.add(seconds)
+                for ix, writer in enumerate(writers):
+                    writer.add(seconds, None if row[ix + 1] is None else float(row[ix + 1]))
+            size = 0
+            for writer in writers:
+                size += writer.close()
+            # the time file is written last: it marks the month as archived
+            size += times.close()
+        finally:
+            for writer in writers + [times]:
+                writer.discard()
+        return (times.count, size)
+
+    @staticmethod
+    def merge(archived, events):
+        '''Merges the archived rows of a month with the events of the table "events" (both ordered by time).
+        Events with the time of an archived row are ignored (like an import ignores events with an existing time).
+        @param archived: the archived rows (an iterable)
+        @param events: the rows of the table "events" (an iterable)
+        @return: the merged rows (generator)
+        '''
+        archived = iter(archived)
+        nextArchived = next(archived, None)
+        lastTime = None
+        for row in events:
+            while nextArchived is not None and nextArchived[0] <= row[0]:
+                lastTime = nextArchived[0]
+                yield nextArchived
+                nextArchived = next(archived, None)
+            if row[0] != lastTime:
+                yield row
+        while nextArchived is not None:
+            yield nextArchived
+            nextArchived = next(archived, None)
+
+    def archiveMonth(self, month: datetime.date, device: str) -> int:
+        '''Writes the events of one month from the table "events" into the archive. The events are streamed.
+        An archived month is merged with the events: the archive keeps the events removed by the retention.
+        @param month: the first day of the month
+        @param device: None (all devices) or the device
+        @return: the count of archived events
+        '''
+        condition = '' if device is None else ' AND event_device=%s'
+        params = [month.strftime('%Y-%m-%d'), Archive.monthStart(month, 1).strftime('%Y-%m-%d')]
+        if device is not None:
+            params.append(device)
+        columns = ', '.join(Archive.series.values())
+        rows = self._db.dbIterate(f'''SELECT event_time, {columns}
+FROM events
+WHERE event_time >= %s AND event_time < %s{condition}
+ORDER BY event_time, event_id;''', params, 10000)
+        if month in self.months(device):
+            first = datetime.datetime.combine(month, datetime.time())
+            last = datetime.datetime.combine(Archive.monthStart(month, 1), datetime.time()) - datetime.timedelta(seconds=1)
+            archived = map(lambda row: (Archive.toDateTime(row[0]),) + row[1:],
+                           self.rows(first, last, device, list(Archive.series)))
+            rows = Archive.merge(archived, rows)
+        rows = iter(rows)
+        firstRow = next(rows, None)
+        rc = 0
+        if firstRow is not None:
+            (rc, size) = self.write(month, device, itertools.chain([firstRow], rows))
+            self._logger.log(f'archive {month.strftime("%Y-%m")} {device or Archive.allDevices}: {rc} event(s) '
+                             + f'{size} bytes ({size / rc:.1f} bytes per event)')
+        return rc
+
+    def devices(self, month: datetime.date):
+        '''Returns the devices with an archived month.
+        @param month: the first day of the month
+        @return: a list of the devices: None means all devices
+        '''
+        rc = []
+        if os.path.isdir(self._directory):
+            for node in sorted(os.listdir(self._directory)):
+                device = None if node == Archive.allDevices else node
+                if month in self.months(device):
+                    rc.append(device)
+        return rc
+
+    def archive(self, until: datetime.date, device: str, force: bool=False) -> int:
+        '''Archives the closed months (before the month of a given date) which are not archived yet.
+        @param until: a day of the first month which is not archived
+        @param device: None (all devices) or the device
+        @param force: True: the archived months are written again
+        @return: the count of archived months
+        '''
+        rc = 0
+        rows = self._db.dbSelect('SELECT min(event_time) FROM events;')
+        if rows[0][0] is not None:
+            month = Archive.monthStart(rows[0][0].date())
+            until = Archive.monthStart(until)
+            while month < until:
+                if force or month not in self.months(device):
+                    if self.archiveMonth(month, device) > 0:
+                        rc += 1
+                month = Archive.monthStart(month, 1)
+        return rc
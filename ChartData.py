@@ -0,0 +1,274 @@
+'''
+Created on 18.10.2026
+
+@author: wk
+'''
+import datetime
+import itertools
+from SilentLog import SilentLog
+from Archive import Archive
+
+
+class ChartData:
+    '''Delivers the data of a chart: depending on the time range and the chart width the rows are read
+    from the table "events" (raw data), from time buckets computed by the database (GROUP BY) or from
+    the rollup tables maintained by the monitor (see Rollup). Time ranges in archived months are read from the
+    archive files (see Archive).
+    The coarsest source is chosen that delivers at least one row per pixel.
+    The rows have always the same form: (seconds, value of the 1st series, value of the 2nd series...)
+    '''
+    # the known series and the column in the table "events":
+    columns = {'apower': 'event_apower', 'total': 'event_total', 'current': 'event_current',
+               'voltage': 'event_voltage', 'temperature': 'event_temperature'}
+    # the possible bucket lengths in seconds:
+    buckets = (60, 120, 300, 600, 900, 1800, 3600, 7200, 10800, 21600, 43200, 86400)
+    # the series stored in the rollup tables and their expression:
+    rollupColumns = {'apower': 'SUM(rollup_powersum)/SUM(rollup_count)', 'total': 'MAX(rollup_totallast)'}
+    # table name -> bucket length in seconds
+    rollupTables = (('events_1h', 3600), ('events_5m', 300))
+
+    def __init__(self, db, device: str=None, sampleInterval: int=60, useRollup: bool=False, logger: SilentLog=None,
+                 archive: Archive=None):
+        '''Constructor.
+        @param db: the database access (a MyDb instance)
+        @param device: None: all events. Otherwise: only the events of this device
+        @param sampleInterval: the usual time between two events in seconds
+        @param useRollup: True: the rollup tables (events_5m, events_1h) are used if possible
+        @param logger: None or the error handler. None: db
+        @param archive: None or the archive of the closed months
+        '''
+        self._db = db
+        self._archive = archive
+        self._device = device
+        self._sampleInterval = sampleInterval
+        self._useRollup = useRollup
+        self._logger = db if logger is None else logger
+        # the source of the last query: "events", "group", "archive" or the name of a rollup table
+        self.lastSource = None
+        self.lastBucket = 0
+
+    def bucket(self, seconds: float, pixels: int) -> int:
+        '''Returns the bucket length for a time range.
+        @param seconds: the length of the time range
+        @param pixels: the width of the chart
+        @return: 0: raw data. Otherwise: the bucket length in seconds
+        '''
+        rc = 0
+        maximum = seconds / max(1, pixels)
+        if maximum >= 1.5 * self._sampleInterval:
+            for length in ChartData.buckets:
+                if length > maximum:
+                    break
+                rc = length
+        return rc
+
+    @staticmethod
+    def toDateTime(text: str) -> datetime.datetime:
+        '''Converts a date and a time (with or without seconds) into a datetime instance.
+        @param text: the date and time, e.g. "2023-03-28 12:34:56" or "2023-03-28 8:00"
+        @return: the datetime instance
+        '''
+        rc = datetime.datetime.strptime(text, '%Y-%m-%d %H:%M:%S' if text.count(':') > 1 else '%Y-%m-%d %H:%M')
+        return rc
+
+    def plan(self, start: str, end: str, pixels: int, series=None):
+        '''Chooses the source of the chart data and builds the SQL statement.
+        @param start: the start of the time range, e.g. "2023-03-28 00:00:00" or "2023-03-28 8:00"
+        @param end: the end of the time range (including)
+        @param pixels: the width of the chart
+        @param series: None: all series. Otherwise: a list of series names, e.g. ['apower', 'total']
+        @return: a tuple (source, bucket, sql, params). source "archive": sql and params are None
+        '''
+        series = list(ChartData.columns) if series is None else series
+        seconds = (ChartData.toDateTime(end) - ChartData.toDateTime(start)).total_seconds()
+        bucket = self.bucket(seconds, pixels)
+        if self._archive is not None and self._archive.covers(ChartData.toDateTime(start), ChartData.toDateTime(end),
+                                                              self._device):
+            return ('archive', bucket, None, None)
+        return self.planSql(start, end, bucket, series)
+
+    def planSql(self, start: str, end: str, bucket: int, series):
+        '''Chooses the database source of the chart data and builds the SQL statement.
+        @param start: the start of the time range, e.g. "2023-03-28 00:00:00" or "2023-03-28 8:00"
+        @param end: the end of the time range (including)
+        @param bucket: 0: raw data. Otherwise: the bucket length in seconds
+        @param series: a list of series names, e.g. ['apower', 'total']
+        @return: a tuple (source, bucket, sql, params)
+        '''
+        params = [start, end]
+        if self._device is not None:
+            params.append(self._device)
+        source = 'events' if bucket == 0 else 'group'
+        if bucket > 0 and self._useRollup and all(map(lambda name: name in ChartData.rollupColumns, series)):
+            for table, length in ChartData.rollupTables:
+                if bucket % length == 0:
+                    source = table
+                    break
+        if source == 'events':
+            condition = '' if self._device is None else ' AND event_device=%s'
+            columns = ','.join(map(lambda name: ChartData.columns[name], series))
+            sql = f'''SELECT unix_timestamp(event_time) as seconds,
+  {columns}
+FROM events
+WHERE event_time>=%s AND event_time <=%s AND event_total > 0.0{condition}
+ORDER BY event_time, event_id;
+'''
+        elif source == 'group':
+            condition = '' if self._device is None else ' AND event_device=%s'
+            columns = ','.join(map(lambda name: ('MAX({})' if name == 'total' else 'AVG({})').format(
+                ChartData.columns[name]), series))
+            sql = f'''SELECT FLOOR(unix_timestamp(event_time)/{bucket})*{bucket} as seconds,
+  {columns}
+FROM events
+WHERE event_time>=%s AND event_time <=%s AND event_total > 0.0{condition}
+GROUP BY seconds
+ORDER BY seconds;
+'''
+        else:
+            condition = '' if self._device is None else ' AND rollup_device=%s'
+            columns = ','.join(map(lambda name: ChartData.rollupColumns[name], series))
+            sql = f'''SELECT FLOOR(unix_timestamp(rollup_start)/{bucket})*{bucket} as seconds,
+  {columns}
+FROM {source}
+WHERE rollup_start>=%s AND rollup_start <=%s AND rollup_totallast > 0.0{condition}
+GROUP BY seconds
+ORDER BY seconds;
+'''
+        return (source, bucket, sql, params)
+
+    def parts(self, start: str, end: str, pixels: int, series=None):
+        '''Splits the time range into the parts read from the archive and from the database (see plan()):
+        a range with archived and not archived months is read from both.
+        @param start: the start of the time range, e.g. "2023-03-28 00:00:00" or "2023-03-28 8:00"
+        @param end: the end of the time range (including)
+        @param pixels: the width of the chart
+        @param series: None: all series. Otherwise: a list of series names, e.g. ['apower', 'total']
+        @return: a list of tuples (source, bucket, sql, params, start, end) ordered by time
+        '''
+        series = list(ChartData.columns) if series is None else series
+        (source, bucket, sql, params) = self.plan(start, end, pixels, series)
+        rc = [(source, bucket, sql, params, start, end)]
+        if source != 'archive' and self._archive is not None:
+            first = ChartData.toDateTime(start)
+            last = ChartData.toDateTime(end)
+            segments = self._archive.segments(first.date(), last.date() + datetime.timedelta(days=1), self._device)
+            if any(map(lambda segment: segment[2], segments)):
+                rc = []
+                for segmentFirst, segmentLast, archived in segments:
+                    partStart = max(first, datetime.datetime.combine(segmentFirst, datetime.time())).strftime(
+                        '%Y-%m-%d %H:%M:%S')
+                    partEnd = min(last, datetime.datetime.combine(segmentLast, datetime.time())
+                                  - datetime.timedelta(seconds=1)).strftime('%Y-%m-%d %H:%M:%S')
+                    if archived:
+                        rc.append(('archive', bucket, None, None, partStart, partEnd))
+                    else:
+                        rc.append(self.planSql(partStart, partEnd, bucket, series) + (partStart, partEnd))
+        return rc
+
+    def _remember(self, parts):
+        '''Stores the sources of the last query, e.g. "events" or "archive+group".
+        @param parts: the parts of the query (see parts())
+        '''
+        sources = []
+        for part in parts:
+            if part[0] not in sources:
+                sources.append(part[0])
+        self.lastSource = '+'.join(sources)
+        self.lastBucket = parts[0][1]
+
+    def _rows(self, part, series, stream: bool):
+        '''Returns the rows of one part of a query.
+        @param part: a tuple (source, bucket, sql, params, start, end) (see parts())
+        @param series: None: all series. Otherwise: a list of series names
+        @param stream: True: the database rows are streamed
+        @return: the rows (an iterable)
+        '''
+        (source, bucket, sql, params, start, end) = part
+        if source == 'archive':
+            rc = self.archiveRows(start, end, bucket, series)
+        elif stream:
+            rc = self._db.dbIterate(sql, params)
+        else:
+            rc = self._db.dbSelect(sql, params)
+        return rc
+
+    def query(self, start: str, end: str, pixels: int, series=None):
+        '''Returns the data of a chart.
+        @param start: the start of the time range, e.g. "2023-03-28 00:00:00" or "2023-03-28 8:00"
+        @param end: the end of the time range (including)
+        @param pixels: the width of the chart
+        @param series: None: all series. Otherwise: a list of series names, e.g. ['apower', 'total']
+        @return: the rows (seconds, value of the 1st series, value of the 2nd series...) ordered by time
+        '''
+        parts = self.parts(start, end, pixels, series)
+        self._remember(parts)
+        rc = []
+        for part in parts:
+            rc += list(self._rows(part, series, False))
+        self._logger.debug(f'chart data: {len(rc)} row(s) from {self.lastSource} bucket: {self.lastBucket}')
+        return rc
+
+    def iterate(self, start: str, end: str, pixels: int, series=None):
+        '''Returns the data of a chart as stream: like query() but the rows are not held in memory.
+        @param start: the start of the time range, e.g. "2023-03-28 00:00:00" or "2023-03-28 8:00"
+        @param end: the end of the time range (including)
+        @param pixels: the width of the chart
+        @param series: None: all series. Otherwise: a list of series names, e.g. ['apower', 'total']
+        @return: an iterator of the rows (seconds, value of the 1st series, value of the 2nd series...) ordered by time
+        '''
+        parts = self.parts(start, end, pixels, series)
+        self._remember(parts)
+        self._logger.debug(f'chart data: streamed from {self.lastSource} bucket: {self.lastBucket}')
+        return itertools.chain.from_iterable(map(lambda part: self._rows(part, series, True), parts))
+
+    def archiveRows(self, start: str, end: str, bucket: int, series=None):
+        '''Returns the data of a chart from the archive: the same rows as the SQL statements of plan().
+        @param start: the start of the time range, e.g. "2023-03-28 00:00:00" or "2023-03-28 8:00"
+        @param end: the end of the time range (including)
+        @param bucket: 0: raw data. Otherwise: the bucket length in seconds
+        @param series: None: all series. Otherwise: a list of series names, e.g. ['apower', 'total']
+        @return: an iterator of the rows (seconds, value of the 1st series, value of the 2nd series...) ordered by time
+        '''
+        series = list(ChartData.columns) if series is None else series
+        # the total is needed for the condition "event_total > 0.0":
+        names = series if 'total' in series else series + ['total']
+        indexTotal = 1 + names.index('total')
+        rows = self._archive.rows(ChartData.toDateTime(start), ChartData.toDateTime(end), self._device, names)
+        current = None
+        values = None
+        for row in rows:
+            if row[indexTotal] is None or row[indexTotal] <= 0.0:
+                continue
+            seconds = int(Archive.toDateTime(row[0]).timestamp())
+            if bucket == 0:
+                yield (seconds,) + row[1:1 + len(series)]
+                continue
+            seconds = seconds // bucket * bucket
+            if seconds != current:
+                if current is not None:
+                    yield ChartData.aggregate(current, series, values)
+                current = seconds
+                values = list(map(lambda name: [], series))
+            for ix in range(len(series)):
+                if row[ix + 1] is not None:
+                    values[ix].append(row[ix + 1])
+        if current is not None:
+            yield ChartData.aggregate(current, series, values)
+
+    @staticmethod
+    def aggregate(seconds: int, series, values):
+        '''Summarizes the values of one bucket like the SQL statement of the source "group": MAX(total), AVG(others).
+        @param seconds: the start of the bucket
+        @param series: the names of the series
+        @param values: per series the list of the values (without None)
+        @return: the row (seconds, value of the 1st series, value of the 2nd series...)
+        '''
+        rc = [seconds]
+        for name, items in zip(series, values):
+            if len(items) == 0:
+                rc.append(None)
+            elif name == 'total':
+                rc.append(max(items))
+            else:
+                rc.append(sum(items) / len(items))
+        return tuple(rc)
@@ -85,6 +85,24 @@ class Configuration (SilentLog):
                     rc = defaultValue
         return rc
 
+    def asFloat(self, key, defaultValue: float=None) -> float:
+        '''Returns the value of a configuration variable given by its key as a floating point number.
+        @param key: the key of the variable
+        @param defaultValue: if the variable does not exist 
+            or the value is not a number this value will be returned
+        @return the value of the variable with the given key or the defaultValue on error
+        '''
+        value = self.asString(key) if self.hasKey(key) else None
+        if value is None:
+            rc = defaultValue
+        else:
+            try:
+                rc = float(value)
+            except ValueError:
+                self.error(f'{key} is not a number: {value}')
+                rc = defaultValue
+        return rc
+
     def asInt(self, key, defaultValue: int=-1) -> int:
         '''Returns the value of a configuration variable given by its key as an integer.
         @param key: the key of the variable
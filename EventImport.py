@@ -0,0 +1,242 @@
+'''
+Created on 18.10.2026
+
+@author: wk
+'''
+import csv
+import datetime
+import json
+import os.path
+from SilentLog import SilentLog
+
+
+class EventReader (SilentLog):
+    '''Reads measurements from CSV or JSON files (dumps of devices or of the Shelly cloud).
+    The files are read as stream, JSON arrays too (item by item).
+    Formats:
+    CSV: the first line contains the column names, separator is ',' or ';'
+    JSON: one object per line (JSON lines) or an array of objects.
+    The objects may be flat ({"time": ..., "total": ...}) or nested like the status of a device
+    ({"apower": ..., "aenergy": {"total": ..., "minute_ts": ...}, "temperature": {"tC": ...}}).
+    '''
+    # the accepted names of each field: the nested names of a JSON object are joined by '.'
+    aliases = {
+        'time': ('event_time', 'time', 'timestamp', 'ts', 'datetime', 'aenergy.minute_ts', 'minute_ts'),
+        'total': ('event_total', 'total', 'energy', 'aenergy.total', 'total_act'),
+        'apower': ('event_apower', 'apower', 'power', 'act_power'),
+        'voltage': ('event_voltage', 'voltage'),
+        'current': ('event_current', 'current'),
+        'temperature': ('event_temperature', 'temperature', 'temperature.tc', 'tc')
+    }
+    fields = ('time', 'total', 'apower', 'voltage', 'current', 'temperature')
+
+    def __init__(self, logger: SilentLog=None):
+        '''Constructor.
+        @param logger: None or the error handler. None: the instance itself
+        '''
+        SilentLog.__init__(self, 100, 100)
+        self._logger = self if logger is None else logger
+        self.countRecords = 0
+        self.countErrors = 0
+
+    @staticmethod
+    def flatten(item, prefix: str='', target=None):
+        '''Converts a nested dictionary into a flat one: the nested keys are joined by '.' (lower case).
+        @param item: the dictionary to convert
+        @param prefix: the prefix of the keys
+        @param target: None or the result dictionary
+        @return: the flat dictionary
+        '''
+        rc = {} if target is None else target
+        for key, value in item.items():
+            name = prefix + str(key).lower()
+            if type(value) == dict:
+                EventReader.flatten(value, name + '.', rc)
+            else:
+                rc[name] = value
+        return rc
+
+    @staticmethod
+    def toTimestamp(value) -> int:
+        '''Converts a time value into a timestamp.
+        @param value: seconds or milliseconds since the epoch or a string like "2023-03-28 12:34:56"
+        @return: the seconds since the epoch
+        '''
+        if type(value) in (int, float):
+            number = value
+        else:
+            value = str(value).strip()
+            try:
+                number = float(value)
+            except ValueError:
+                number = None
+        if number is not None:
+            rc = int(number / 1000 if number > 1E11 else number)
+        else:
+            value = value.replace('T', ' ').rstrip('Z')
+            if len(value) > 19:
+                value = value[0:19]
+            rc = int(datetime.datetime.strptime(value, '%Y-%m-%d %H:%M:%S' if len(value) > 16
+                                                else '%Y-%m-%d %H:%M').timestamp())
+        return rc
+
+    def _indexes(self, names):
+        '''Finds the field of each column name.
+        @param names: the column names (lower case)
+        @return: a dictionary: field -> column name
+        '''
+        rc = {}
+        for field in EventReader.fields:
+            for alias in EventReader.aliases[field]:
+                if alias in names:
+                    rc[field] = alias
+                    break
+        return rc
+
+    def _convert(self, item, columns, source: str):
+        '''Converts one record into an event.
+        @param item: the record as dictionary (flat, lower case keys)
+        @param columns: the column name of each field
+        @param source: the position of the record (for error messages)
+        @return: None (error) or a tuple (timestamp, total, apower, voltage, current, temperature)
+        '''
+        rc = None
+        try:
+            values = [EventReader.toTimestamp(item[columns['time']])]
+            for field in EventReader.fields[1:]:
+                value = item.get(columns[field]) if field in columns else None
+                values.append(None if value is None or value == '' else float(value))
+            if values[1] is None:
+                raise ValueError('missing total')
+            rc = tuple(values)
+        except (KeyError, ValueError, TypeError) as exc:
+            self.countErrors += 1
+            self._logger.error(f'{source}: {exc}')
+        return rc
+
+    @staticmethod
+    def iterateArray(fp, bufferSize: int=65536, maxItemSize: int=1024*1024):
+        '''Reads the items of a JSON array one by one (generator): the file is never read at once.
+        @param fp: the opened file, positioned before the '['
+        @param bufferSize: the count of characters read at once
+        @param maxItemSize: the maximal size of one item (protection against corrupted files)
+        @return: the decoded items
+        '''
+        decoder = json.JSONDecoder()
+        buffer = ''
+        pos = 0
+        eof = False
+        started = False
+        while True:
+            while pos < len(buffer) and (buffer[pos].isspace() or buffer[pos] == ',' and started):
+                pos += 1
+            if pos >= len(buffer):
+                if eof:
+                    raise ValueError('unexpected end of the JSON array')
+                buffer = fp.read(bufferSize)
+                pos = 0
+                eof = buffer == ''
+                continue
+            if not started:
+                if buffer[pos] != '[':
+                    raise ValueError('missing "[" at the start of the JSON array')
+                started = True
+                pos += 1
+            elif buffer[pos] == ']':
+                break
+            else:
+                try:
+                    item, end = decoder.raw_decode(buffer, pos)
+                    # a number at the end of the buffer may be incomplete:
+                    complete = end < len(buffer) or eof
+                except ValueError:
+                    if eof or len(buffer) - pos > maxItemSize:
+                        raise
+                    complete = False
+                if complete:
+                    pos = end
+                    yield item
+                else:
+                    more = fp.read(bufferSize)
+                    eof = more == ''
+                    buffer = buffer[pos:] + more
+                    pos = 0
+
+    def read(self, filename: str):
+        '''Reads the events of a file (generator).
+        @param filename: the name of the file: extension .csv, .json or .jsonl
+        @return: tuples (timestamp, total, apower, voltage, current, temperature)
+        '''
+        if not os.path.exists(filename):
+            self._logger.error(f'missing {filename}')
+        elif filename.lower().endswith('.csv'):
+            yield from self.readCsv(filename)
+        else:
+            yield from self.readJson(filename)
+
+    def readCsv(self, filename: str):
+        '''Reads the events of a CSV file (generator).
+        @param filename: the name of the file
+        @return: tuples (timestamp, total, apower, voltage, current, temperature)
+        '''
+        with open(filename, 'r', newline='') as fp:
+            first = fp.readline()
+            delimiter = ';' if first.count(';') > first.count(',') else ','
+            names = list(map(lambda name: name.strip().lower(), next(csv.reader([first], delimiter=delimiter))))
+            columns = self._indexes(names)
+            if 'time' not in columns or 'total' not in columns:
+                self._logger.error(f'{filename}: missing time or total column: {first.strip()}')
+            else:
+                lineNo = 1
+                for values in csv.reader(fp, delimiter=delimiter):
+                    lineNo += 1
+                    if len(values) == 0:
+                        continue
+                    event = self._convert(dict(zip(names, values)), columns, f'{filename}-{lineNo}')
+                    if event is not None:
+                        self.countRecords += 1
+                        yield event
+
+    def readLines(self, fp, filename: str):
+        '''Decodes the lines of a JSON-lines file (generator): invalid lines are counted and skipped.
+        @param fp: the opened file
+        @param filename: the name of the file (for error messages)
+        @return: tuples (lineNo, decoded item)
+        '''
+        lineNo = 0
+        for line in fp:
+            lineNo += 1
+            if line.strip() != '':
+                try:
+                    yield (lineNo, json.loads(line))
+                except json.JSONDecodeError as exc:
+                    self.countErrors += 1
+                    self._logger.error(f'{filename}-{lineNo}: {exc}')
+
+    def readJson(self, filename: str):
+        '''Reads the events of a JSON file (generator).
+        @param filename: the name of the file: one object per line or an array of objects
+        @return: tuples (timestamp, total, apower, voltage, current, temperature)
+        '''
+        with open(filename, 'r') as fp:
+            first = fp.read(1)
+            while first.isspace():
+                first = fp.read(1)
+            fp.seek(0)
+            if first == '[':
+                items = enumerate(EventReader.iterateArray(fp), 1)
+            else:
+                items = self.readLines(fp, filename)
+            columns = None
+            try:
+                for lineNo, item in items:
+                    item = EventReader.flatten(item)
+                    if columns is None or columns.get('time') not in item:
+                        columns = self._indexes(item)
+                    event = self._convert(item, columns, f'{filename}-{lineNo}')
+                    if event is not None:
+                        self.countRecords += 1
+                        yield event
+            except ValueError as exc:
+                self.countErrors += 1
+                self._logger.error(f'{filename}: {exc}')
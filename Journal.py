@@ -0,0 +1,415 @@
+'''
+Created on 18.10.2026
+
+@author: wk
+'''
+import datetime
+import math
+import mmap
+import os
+import struct
+import threading
+import zlib
+from SilentLog import SilentLog
+from Archive import Archive
+
+
+class Journal:
+    '''A local append-only journal of the events: fixed-size binary records in a memory-mapped file.
+    The monitor writes each event into the journal first (no network round trip), a background thread
+    (the drainer) replays the journal into the table "events" in batches. If the database is down the events
+    stay in the journal and are replayed later: nothing is lost.
+    The events of the last days can be read from the journal without a query (see events()).
+    The replay is "at least once": a crash between the INSERT and the update of the header repeats a batch.
+    File structure: header (magic "SMJ1", record size, count of records, count of replayed records,
+    the time since the journal contains all events), records.
+    Each record: marker, event time, creation time, total, apower, voltage, current, temperature, device,
+    creator, CRC32. None is stored as NaN (values) or as empty string (device).
+    A second file (<file>.idx) contains the per-day offset index: per day the index of the first record of that day.
+    All records before that index belong to earlier days (even if the events arrive out of order).
+    '''
+    magic = b'SMJ1'
+    header = struct.Struct('<4sIQQq')
+    headerSize = 64
+    record = struct.Struct('<Iqq5d32s12s4x')
+    crc = struct.Struct('<I')
+    marker = 0x4a4d53
+    timeFormat = '%Y-%m-%d %H:%M:%S'
+
+    def __init__(self, filename: str, logger: SilentLog=None, keepDays: int=7, sync: bool=False,
+                 growRecords: int=16384):
+        '''Constructor: opens or creates the journal.
+        @param filename: the journal file, e.g. "/opt/sunmonitor/journal.dat"
+        @param logger: None or the error handler
+        @param keepDays: the replayed events older than this count of days are removed (see compact())
+        @param sync: True: each append is flushed to the disk (msync). False: the page cache is flushed after each batch
+        @param growRecords: the file grows by this count of records
+        '''
+        self.filename = filename
+        self._logger = logger
+        self._keepDays = keepDays
+        self._sync = sync
+        self._growRecords = growRecords
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        # day (YYYY-MM-DD) -> index of the first record of that day, ascending
+        self._index = {}
+        self._fp = None
+        self._map = None
+        self.count = 0
+        self.drained = 0
+        self.start = 0
+        self.countReplayed = 0
+        self.countFailures = 0
+        self.open()
+
+    def _log(self, message: str, isError: bool=False):
+        '''Logs a message if a logger is given.
+        @param message: the message
+        @param isError: True: the message is an error message
+        '''
+        if self._logger is not None:
+            if isError:
+                self._logger.error(message)
+            else:
+                self._logger.log(message)
+
+    def open(self):
+        '''Opens the journal file: a missing file is created. Records written after the last header update
+        (e.g. a crash) are recovered if their checksum is valid.
+        '''
+        if os.path.dirname(self.filename) != '':
+            os.makedirs(os.path.dirname(self.filename), exist_ok=True)
+        exists = os.path.exists(self.filename) and os.path.getsize(self.filename) >= Journal.headerSize
+        self._fp = open(self.filename, 'r+b' if exists else 'w+b')
+        if not exists:
+            self._fp.truncate(Journal.headerSize + self._growRecords * Journal.record.size)
+        self._map = mmap.mmap(self._fp.fileno(), 0)
+        if not exists:
+            self.start = Archive.toSeconds(datetime.datetime.now())
+            self.writeHeader()
+        else:
+            (magic, size, self.count, self.drained, self.start) = Journal.header.unpack_from(self._map, 0)
+            if magic != Journal.magic or size != Journal.record.size:
+                self.close()
+                raise ValueError(f'{self.filename}: not a journal or a different record size')
+            recovered = 0
+            while self.capacity() > self.count and self.readRecord(self.count) is not None:
+                self.count += 1
+                recovered += 1
+            if recovered > 0:
+                self._log(f'journal: {recovered} record(s) recovered')
+                self.writeHeader()
+        self.readIndex()
+
+    def close(self):
+        '''Stops the drainer (without replay) and closes the file.
+        '''
+        self.stopDrainer(False)
+        with self._lock:
+            if self._map is not None:
+                self._map.flush()
+                self._map.close()
+                self._map = None
+            if self._fp is not None:
+                self._fp.close()
+                self._fp = None
+
+    def capacity(self) -> int:
+        '''Returns the count of records fitting into the current file.
+        @return: the count of records
+        '''
+        rc = (len(self._map) - Journal.headerSize) // Journal.record.size
+        return rc
+
+    def writeHeader(self):
+        '''Writes the counters into the header of the file.
+        '''
+        Journal.header.pack_into(self._map, 0, Journal.magic, Journal.record.size, self.count, self.drained, self.start)
+
+    def readIndex(self):
+        '''Reads the per-day offset index. A missing or inconsistent index is rebuilt from the records.
+        '''
+        self._index = {}
+        valid = os.path.exists(self.filename + '.idx')
+        if valid:
+            with open(self.filename + '.idx') as fp:
+                for line in fp:
+                    parts = line.split()
+                    if len(parts) == 2 and parts[1].isdigit() and int(parts[1]) <= self.count:
+                        self._index[parts[0]] = int(parts[1])
+                    else:
+                        valid = False
+        if not valid:
+            self._index = {}
+            last = None
+            for ix in range(self.count):
+                row = self.readRecord(ix)
+                day = None if row is None else row[0][0:10]
+                if day is not None and (last is None or day > last):
+                    self._index[day] = ix
+                    last = day
+            self.writeIndex()
+        else:
+            # days appended after the last update of the index file (e.g. recovered records):
+            last = max(self._index) if len(self._index) > 0 else None
+            start = 0 if last is None else self._index[last]
+            for ix in range(start, self.count):
+                row = self.readRecord(ix)
+                day = None if row is None else row[0][0:10]
+                if day is not None and (last is None or day > last):
+                    self._index[day] = ix
+                    last = day
+                    self.writeIndex()
+
+    def writeIndex(self):
+        '''Writes the per-day offset index (replaced atomically).
+        '''
+        with open(self.filename + '.idx.tmp', 'w') as fp:
+            for day, ix in self._index.items():
+                fp.write(f'{day} {ix}\n')
+        os.replace(self.filename + '.idx.tmp', self.filename + '.idx')
+
+    @staticmethod
+    def encode(row) -> bytes:
+        '''Converts an event into a record.
+        @param row: the event as row of the table "events" (see Monitor.sqlInsertEvent)
+        @return: the record
+        '''
+        values = list(map(lambda value: math.nan if value is None else float(value), row[1:6]))
+        data = Journal.record.pack(Journal.marker,
+                                   Archive.toSeconds(datetime.datetime.strptime(row[0], Journal.timeFormat)),
+                                   Archive.toSeconds(datetime.datetime.strptime(row[7], Journal.timeFormat)), *values,
+                                   Journal.truncate(row[6], 32), Journal.truncate(row[8], 12))
+        rc = data[0:-4] + Journal.crc.pack(zlib.crc32(data[0:-4]))
+        return rc
+
+    @staticmethod
+    def truncate(text: str, size: int) -> bytes:
+        '''Converts a text into UTF-8 with a maximum length: a multi-byte character is never split.
+        @param text: None or the text
+        @param size: the maximum count of bytes
+        @return: the UTF-8 bytes of the text
+        '''
+        rc = (text or '').encode('utf-8')
+        if len(rc) > size:
+            rc = rc[0:size].decode('utf-8', 'ignore').encode('utf-8')
+        return rc
+
+    @staticmethod
+    def decode(data):
+        '''Converts a record into an event.
+        @param data: the record
+        @return: None: invalid record. Otherwise: the event as row of the table "events"
+        '''
+        rc = None
+        if (Journal.crc.unpack_from(data, Journal.record.size - 4)[0] == zlib.crc32(data[0:-4])
+                and int.from_bytes(data[0:4], 'little') == Journal.marker):
+            (_marker, eventTime, created, total, power, voltage, current, temperature, device,
+             creator) = Journal.record.unpack(data)
+            values = list(map(lambda value: None if math.isnan(value) else value,
+                              (total, power, voltage, current, temperature)))
+            rc = (Archive.toDateTime(eventTime).strftime(Journal.timeFormat), *values,
+                  device.rstrip(b'\0').decode('utf-8', 'ignore') or None, Archive.toDateTime(created).strftime(Journal.timeFormat),
+                  creator.rstrip(b'\0').decode('utf-8', 'ignore') or None)
+        return rc
+
+    def readRecord(self, ix: int):
+        '''Reads one record.
+        @param ix: the index of the record
+        @return: None: invalid record. Otherwise: the event as row of the table "events"
+        '''
+        offset = Journal.headerSize + ix * Journal.record.size
+        rc = Journal.decode(self._map[offset:offset + Journal.record.size])
+        return rc
+
+    def grow(self, count: int):
+        '''Enlarges the file if needed.
+        @param count: the count of records which must fit into the file
+        '''
+        if count > self.capacity():
+            records = (count + self._growRecords - 1) // self._growRecords * self._growRecords
+            self._map.close()
+            self._fp.truncate(Journal.headerSize + records * Journal.record.size)
+            self._map = mmap.mmap(self._fp.fileno(), 0)
+
+    def append(self, rows):
+        '''Adds events to the journal and wakes up the drainer.
+        @param rows: the events as rows of the table "events" (see Monitor.sqlInsertEvent)
+        '''
+        rows = list(rows)
+        with self._lock:
+            self.grow(self.count + len(rows))
+            last = max(self._index) if len(self._index) > 0 else None
+            offset = Journal.headerSize + self.count * Journal.record.size
+            for row in rows:
+                day = row[0][0:10]
+                if last is None or day > last:
+                    self._index[day] = self.count
+                    last = day
+                    self.writeIndex()
+                self._map[offset:offset + Journal.record.size] = Journal.encode(row)
+                offset += Journal.record.size
+                self.count += 1
+            self.writeHeader()
+            if self._sync:
+                self._map.flush()
+        self._wakeup.set()
+
+    def pending(self) -> int:
+        '''Returns the count of events not replayed yet.
+        @return: the count of events
+        '''
+        return self.count - self.drained
+
+    def covers(self, day: datetime.date) -> bool:
+        '''Tests whether the journal contains all events of the monitor since the start of a day.
+        @param day: the day
+        @return: True: the journal contains the events
+        '''
+        rc = self.start <= Archive.toSeconds(datetime.datetime.combine(day, datetime.time()))
+        return rc
+
+    def events(self, first: datetime.datetime, last: datetime.datetime=None, device: str=None):
+        '''Returns the events of a time range from the journal (in the order of their arrival).
+        Only the records since the first day of the range are inspected (see the per-day offset index).
+        @param first: the start of the range
+        @param last: None or the end of the range (including)
+        @param device: None: all devices. Otherwise: only the events of this device
+        @return: a list of the events as rows of the table "events"
+        '''
+        firstStr = first.strftime(Journal.timeFormat)
+        lastStr = None if last is None else last.strftime(Journal.timeFormat)
+        rc = []
+        with self._lock:
+            start = self.count
+            for day, ix in self._index.items():
+                if day >= firstStr[0:10]:
+                    start = ix
+                    break
+            for ix in range(start, self.count):
+                row = self.readRecord(ix)
+                if (row is not None and row[0] >= firstStr and (lastStr is None or row[0] <= lastStr)
+                        and (device is None or row[6] == device)):
+                    rc.append(row)
+        return rc
+
+    def replay(self, store, batchSize: int=1000) -> int:
+        '''Stores the events not replayed yet into the database.
+        @param store: the function storing a list of events (raises an exception on failure)
+        @param batchSize: the maximal count of events stored with one call
+        @return: the count of replayed events
+        '''
+        rc = 0
+        while True:
+            with self._lock:
+                first = self.drained
+                rows = list(map(self.readRecord, range(first, min(self.count, first + batchSize))))
+            if len(rows) == 0:
+                break
+            # damaged records (no valid checksum) are skipped:
+            valid = list(filter(lambda row: row is not None, rows))
+            if len(valid) < len(rows):
+                self._log(f'journal: {len(rows) - len(valid)} damaged record(s) skipped', True)
+            if len(valid) > 0:
+                store(valid)
+            with self._lock:
+                self.drained = first + len(rows)
+                self.writeHeader()
+                self._map.flush()
+            rc += len(valid)
+            self.countReplayed += len(valid)
+        return rc
+
+    def compact(self):
+        '''Removes the replayed events older than keepDays: the journal file is rewritten (replaced atomically).
+        @return: the count of removed records
+        '''
+        rc = 0
+        with self._lock:
+            limit = (datetime.date.today() - datetime.timedelta(days=self._keepDays)).strftime('%Y-%m-%d')
+            candidates = list(filter(lambda item: item[0] <= limit and item[1] <= self.drained, self._index.items()))
+            if len(candidates) > 0 and candidates[-1][1] > 0:
+                (day, rc) = candidates[-1]
+                temp = self.filename + '.tmp'
+                data = self._map[Journal.headerSize + rc * Journal.record.size:
+                                 Journal.headerSize + self.count * Journal.record.size]
+                with open(temp, 'wb') as fp:
+                    fp.write(bytes(Journal.headerSize))
+                    fp.write(data)
+                    fp.truncate(Journal.headerSize + (len(data) // Journal.record.size + self._growRecords)
+                                * Journal.record.size)
+                self._map.close()
+                self._fp.close()
+                os.replace(temp, self.filename)
+                self._fp = open(self.filename, 'r+b')
+                self._map = mmap.mmap(self._fp.fileno(), 0)
+                self.count -= rc
+                self.drained -= rc
+                self.start = max(self.start, Archive.toSeconds(datetime.datetime.strptime(day, '%Y-%m-%d')))
+                self.writeHeader()
+                self._index = {key: ix - rc for key, ix in self._index.items() if key >= day}
+                self.writeIndex()
+        if rc > 0:
+            self._log(f'journal: {rc} replayed record(s) removed')
+        return rc
+
+    def startDrainer(self, store, batchSize: int=1000, retryMax: int=300):
+        '''Starts the background thread replaying the journal into the database.
+        @param store: the function storing a list of events (raises an exception on failure)
+        @param batchSize: the maximal count of events stored with one call
+        @param retryMax: the maximal delay (seconds) between two attempts if the database is not available
+        '''
+        self._stop.clear()
+        # the events left by the last run are replayed at once:
+        self._wakeup.set()
+        self._thread = threading.Thread(target=self.drain, args=(store, batchSize, retryMax), name='journal',
+                                        daemon=True)
+        self._thread.start()
+
+    def stopDrainer(self, replay: bool=True, store=None):
+        '''Stops the drainer thread.
+        @param replay: True: the pending events are replayed (if the database is available)
+        @param store: None or the function storing a list of events (for the final replay)
+        '''
+        if self._thread is not None:
+            self._stop.set()
+            self._wakeup.set()
+            self._thread.join()
+            self._thread = None
+        if replay and store is not None and self.pending() > 0:
+            try:
+                self.replay(store)
+            except Exception as exc:
+                self._log(f'journal: {self.pending()} event(s) not replayed: {exc}', True)
+
+    def drain(self, store, batchSize: int, retryMax: int):
+        '''The body of the drainer thread: replays the journal until stopDrainer() is called.
+        After a failure the delay of the next attempt is doubled (up to retryMax).
+        @param store: the function storing a list of events (raises an exception on failure)
+        @param batchSize: the maximal count of events stored with one call
+        @param retryMax: the maximal delay (seconds) between two attempts
+        '''
+        delay = None
+        lastDay = None
+        while not self._stop.is_set():
+            self._wakeup.wait(60 if delay is None else delay)
+            self._wakeup.clear()
+            if self._stop.is_set():
+                break
+            try:
+                self.replay(store, batchSize)
+                if delay is not None:
+                    self._log(f'journal: replay continued, pending: {self.pending()}')
+                delay = None
+                today = datetime.date.today()
+                if today != lastDay:
+                    lastDay = today
+                    self.compact()
+            except Exception as exc:
+                self.countFailures += 1
+                delay = 1 if delay is None else min(retryMax, delay * 2)
+                self._log(f'journal: replay failed (pending: {self.pending()}, next attempt in {delay} sec): {exc}',
+                          True)
@@ -3,12 +3,217 @@ Created on 21.07.2022
 
 @author: wk
 '''
-import mysql.connector
+import collections
+import contextlib
+import datetime
+import functools
+import math
+import re
+import sqlite3
+import struct
+import threading
+import time
+try:
+    import mysql.connector
+except ImportError:
+    mysql = None
 from SilentLog import SilentLog
+from QueryStats import QueryStats
 from Configuration import Configuration
 
 
+class DbPool:
+    '''A bounded pool of database connections. Thread safe.
+    A connection is checked out for one task and returned afterwards. A connection idle for a while
+    is tested (ping) before it is delivered again: a dead connection is replaced by a new one.
+    '''
+
+    def __init__(self, connect, size: int, checkInterval: float=30.0, clock=time.monotonic):
+        '''Constructor.
+        @param connect: a function without parameters returning a new connection
+        @param size: the maximal count of open connections
+        @param checkInterval: a connection idle at least this count of seconds is tested before use
+        @param clock: a function returning the time of the monotonic clock (exchangeable for tests)
+        '''
+        self._connect = connect
+        self._size = max(1, size)
+        self._checkInterval = checkInterval
+        self._clock = clock
+        # the idle connections: a list of tuples (connection, time of the release)
+        self._idle = []
+        self._countOpen = 0
+        self._condition = threading.Condition()
+        self.countConnects = 0
+        self.countReplaced = 0
+
+    def acquire(self, timeout: float=None):
+        '''Checks out a connection: waits until a connection is available.
+        @param timeout: None: wait forever. Otherwise: the maximal waiting time in seconds
+        @return: the connection
+        @throws TimeoutError: no connection available inside the timeout
+        '''
+        connection = None
+        released = None
+        with self._condition:
+            while len(self._idle) == 0 and self._countOpen >= self._size:
+                if not self._condition.wait(timeout):
+                    raise TimeoutError(f'no database connection available (pool size {self._size})')
+            if len(self._idle) > 0:
+                connection, released = self._idle.pop()
+            else:
+                self._countOpen += 1
+        try:
+            if connection is not None and self._clock() - released >= self._checkInterval \
+                    and not DbPool.isHealthy(connection):
+                self.countReplaced += 1
+                DbPool.closeQuietly(connection)
+                connection = None
+            if connection is None:
+                connection = self._connect()
+                self.countConnects += 1
+        except Exception:
+            with self._condition:
+                self._countOpen -= 1
+                self._condition.notify()
+            raise
+        return connection
+
+    def close(self):
+        '''Closes the idle connections. The connections in use are closed at their release.
+        '''
+        with self._condition:
+            for connection, released in self._idle:
+                DbPool.closeQuietly(connection)
+                self._countOpen -= 1
+            self._idle = []
+            self._size = 0
+            self._condition.notify_all()
+
+    @staticmethod
+    def closeQuietly(connection):
+        '''Closes a connection, errors are ignored.
+        @param connection: the connection to close
+        '''
+        try:
+            connection.close()
+        except Exception:
+            pass
+
+    @staticmethod
+    def isHealthy(connection) -> bool:
+        '''Tests whether a connection is usable.
+        @param connection: the connection to test
+        @return: True: the server answers
+        '''
+        try:
+            ping = getattr(connection, 'ping', None)
+            if ping is not None:
+                ping(reconnect=False)
+            else:
+                connection.execute('SELECT 1;')
+            rc = True
+        except Exception:
+            rc = False
+        return rc
+
+    def release(self, connection, broken: bool=False):
+        '''Returns a connection into the pool.
+        @param connection: the connection checked out by acquire()
+        @param broken: True: the connection is closed (e.g. after a connection error)
+        '''
+        with self._condition:
+            if broken or self._countOpen > self._size:
+                DbPool.closeQuietly(connection)
+                self._countOpen -= 1
+            else:
+                self._idle.append((connection, self._clock()))
+            self._condition.notify()
+
+
+class StatementCache:
+    '''The prepared statements of one MySQL connection: SQL text -> prepared cursor.
+    The server parses a statement only once, each further execution sends only the parameters.
+    The least recently used statement is closed (deallocated on the server) if the cache is full.
+    '''
+    _preparable = re.compile(r'^\s*(SELECT|INSERT|UPDATE|DELETE|REPLACE)\b', re.I)
+    # the type code of FLOAT columns (mysql.connector.constants.FieldType.FLOAT):
+    _typeFloat = 4
+
+    def __init__(self, connection, size: int):
+        '''Constructor.
+        @param connection: the MySQL connection
+        @param size: the maximal count of prepared statements
+        '''
+        self._connection = connection
+        self._size = size
+        self._cursors = collections.OrderedDict()
+        self.countHits = 0
+        self.countMisses = 0
+
+    def close(self):
+        '''Closes all prepared statements.
+        '''
+        for cursor in self._cursors.values():
+            DbPool.closeQuietly(cursor)
+        self._cursors.clear()
+
+    def cursor(self, sql: str):
+        '''Returns the prepared cursor of a statement.
+        @param sql: the SQL statement
+        @return: None: the statement is not preparable (e.g. DDL). Otherwise: the cursor
+        '''
+        rc = self._cursors.get(sql)
+        if rc is not None:
+            self.countHits += 1
+            self._cursors.move_to_end(sql)
+        elif StatementCache._preparable.match(sql):
+            self.countMisses += 1
+            if len(self._cursors) >= self._size:
+                DbPool.closeQuietly(self._cursors.popitem(last=False)[1])
+            rc = self._cursors[sql] = self._connection.cursor(prepared=True)
+        return rc
+
+    @staticmethod
+    def shortFloat(value: float) -> float:
+        '''Returns the shortest decimal number with the same single precision representation.
+        @param value: a FLOAT value as delivered by the binary protocol, e.g. 7.737989902496338
+        @return: the value like the text protocol delivers it, e.g. 7.73799
+        '''
+        rc = value
+        if value is not None:
+            for digits in range(6, 10):
+                rc = float(f'{value:.{digits}g}')
+                if struct.unpack('f', struct.pack('f', rc))[0] == value:
+                    break
+        return rc
+
+    @staticmethod
+    def textValues(cursor, rows):
+        '''Converts the FLOAT columns of a result of a prepared statement into the values of the text protocol.
+        @param cursor: the cursor of the query
+        @param rows: the records of the query
+        @return: the converted records
+        '''
+        columns = set(ix for ix, column in enumerate(cursor.description or ()) if column[1] == StatementCache._typeFloat)
+        rc = rows
+        if len(columns) > 0:
+            rc = list(map(lambda row: tuple(StatementCache.shortFloat(value) if ix in columns else value
+                                            for ix, value in enumerate(row)), rows))
+        return rc
+
+
 class MyDb (SilentLog):
+    '''Database access: MySQL (db.driver=mysql) or an embedded SQLite database (db.driver=sqlite).
+    The SQL statements are written in the MySQL dialect: for SQLite they are translated (see dbTranslate()).
+    '''
+    # the pragmas of a SQLite connection: WAL allows readers concurrent to the writer
+    sqlitePragmas = ('PRAGMA journal_mode=WAL;', 'PRAGMA synchronous=NORMAL;', 'PRAGMA temp_store=MEMORY;',
+                     'PRAGMA cache_size=-20000;', 'PRAGMA mmap_size=268435456;')
+    # ON CONFLICT DO UPDATE without conflict target (see dbTranslate()) needs 3.35, IIF() needs 3.32:
+    sqliteMinimumVersion = (3, 35, 0)
+    _patternDate = re.compile(r'^\d{4}-\d\d-\d\d$')
+    _patternDateTime = re.compile(r'^\d{4}-\d\d-\d\d \d\d:\d\d:\d\d$')
+
     def __init__(self):
         '''Constructor.
         '''
@@ -20,6 +225,18 @@ class MyDb (SilentLog):
         self._connection = None
         self._cursor = None
         self._autocommit = True
+        # "mysql" or "sqlite"
+        self._driver = 'mysql'
+        # the database file of the driver sqlite
+        self._dbFile = None
+        # pooled mode: each statement uses a connection of the pool. 0: one shared connection
+        self._poolSize = 0
+        self._pool = None
+        self._lock = threading.RLock()
+        # the count of statements kept prepared per connection. 0: no statement cache
+        self._statementCacheSize = 64
+        # None: no instrumentation. Otherwise: the QueryStats instance (see db.stats and db.slow.ms)
+        self._stats = None
 
     def _dbConfigOne(self, name: str, configuration: Configuration, defaultValue: str=None) -> str:
         '''Handles one configuration variable.
@@ -42,27 +259,227 @@ class MyDb (SilentLog):
         @return True: all needed data found 
             False: missing some needed configuration
         '''
+        self._driver = configuration.asString('db.driver', self._driver)
+        if self._driver not in ('mysql', 'sqlite'):
+            self.error(f'unknown db.driver: {self._driver}')
+            self._driver = 'mysql'
         self._dbName = self._dbConfigOne('db.name', configuration)
-        self._dbUser = self._dbConfigOne('db.user', configuration)
-        self._dbHost = self._dbConfigOne('db.host', configuration, 'localhost')
-        self._dbCode = self._dbConfigOne('db.code', configuration)
-        found = self._dbName != None and self._dbUser != None and self._dbCode != None
+        self._poolSize = configuration.asInt('db.pool.size', self._poolSize)
+        self._statementCacheSize = configuration.asInt('db.statement.cache', self._statementCacheSize)
+        collect = configuration.asBool('db.stats', False)
+        slowMs = configuration.asInt('db.slow.ms', 0)
+        self._stats = QueryStats(collect, slowMs, self) if collect or slowMs > 0 else None
+        if self._driver == 'sqlite':
+            self._dbFile = self._dbConfigOne('db.file', configuration, f'/opt/sunmonitor/{self._dbName}.sqlite')
+            found = self._dbName != None
+        else:
+            self._dbUser = self._dbConfigOne('db.user', configuration)
+            self._dbHost = self._dbConfigOne('db.host', configuration, 'localhost')
+            self._dbCode = self._dbConfigOne('db.code', configuration)
+            found = self._dbName != None and self._dbUser != None and self._dbCode != None
         return found
 
+    def dbDriver(self) -> str:
+        '''Returns the database driver.
+        @return: "mysql" or "sqlite"
+        '''
+        return self._driver
+
+    def _dbErrors(self):
+        '''Returns the exceptions of the driver signaling a broken connection.
+        @return: a tuple of exception classes
+        '''
+        module = sqlite3 if self._driver == 'sqlite' or mysql is None else mysql.connector
+        rc = (module.OperationalError, module.InterfaceError)
+        return rc
+
+    def _dbNewConnection(self):
+        '''Opens a new connection with the login data from the configuration.
+        @return: the connection
+        '''
+        if self._driver == 'sqlite':
+            rc = self._dbNewSqliteConnection()
+        elif mysql is None:
+            raise ImportError('db.driver=mysql needs the module mysql-connector-python')
+        else:
+            rc = mysql.connector.connect(host=self._host, user=self._dbUser, password=self._dbCode,
+                                         database=self._dbName, autocommit=self._autocommit)
+        return rc
+
+    def _dbNewSqliteConnection(self):
+        '''Opens a connection to the SQLite database: the MySQL functions used by the statements are emulated.
+        @return: the connection
+        '''
+        if sqlite3.sqlite_version_info < MyDb.sqliteMinimumVersion:
+            raise sqlite3.NotSupportedError('db.driver=sqlite needs SQLite '
+                                            + f'{".".join(map(str, MyDb.sqliteMinimumVersion))} or newer, '
+                                            + f'found: {sqlite3.sqlite_version}')
+        rc = sqlite3.connect(self._dbFile, timeout=10, check_same_thread=False,
+                             isolation_level=None if self._autocommit else '',
+                             cached_statements=self._statementCacheSize)
+        for pragma in MyDb.sqlitePragmas:
+            rc.execute(pragma)
+        rc.create_function('unix_timestamp', 1, MyDb._sqliteUnixTimestamp, deterministic=True)
+        rc.create_function('now', 0, lambda: datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S'))
+        try:
+            rc.execute('SELECT floor(1.5);')
+        except sqlite3.OperationalError:
+            # SQLite without math functions:
+            rc.create_function('floor', 1, lambda value: None if value is None else math.floor(value),
+                               deterministic=True)
+        return rc
+
+    @staticmethod
+    def _sqliteUnixTimestamp(value):
+        '''Implements the MySQL function unix_timestamp() for SQLite.
+        @param value: a date or a date and time as text in local time, e.g. "2023-03-28 12:34:56"
+        @return: None or the seconds since the epoch
+        '''
+        rc = None
+        if value is not None:
+            value = str(value)
+            rc = int(time.mktime(time.strptime(value[0:19], '%Y-%m-%d %H:%M:%S' if len(value) > 10 else '%Y-%m-%d')))
+        return rc
+
+    @staticmethod
+    @functools.lru_cache(maxsize=256)
+    def dbTranslate(sql: str) -> str:
+        '''Translates a SQL statement of the MySQL dialect into the SQLite dialect.
+        Handled: placeholders, AUTO_INCREMENT, ON DUPLICATE KEY UPDATE with VALUES(), IF(), LEAST(), GREATEST().
+        @param sql: the statement in MySQL syntax
+        @return: the statement in SQLite syntax
+        '''
+        rc = sql.replace('%s', '?')
+        rc = re.sub(r'\bint PRIMARY KEY AUTO_INCREMENT\b', 'INTEGER PRIMARY KEY', rc, flags=re.I)
+        rc = re.sub(r'\bIF\s*\(', 'IIF(', rc, flags=re.I)
+        rc = re.sub(r'\bLEAST\s*\(', 'MIN(', rc, flags=re.I)
+        rc = re.sub(r'\bGREATEST\s*\(', 'MAX(', rc, flags=re.I)
+        parts = re.split(r'\bON DUPLICATE KEY UPDATE\b', rc, maxsplit=1, flags=re.I)
+        if len(parts) == 2:
+            rc = parts[0] + 'ON CONFLICT DO UPDATE SET' + re.sub(r'\bVALUES\s*\((\w+)\)', r'excluded.\1', parts[1],
+                                                                 flags=re.I)
+        return rc
+
+    @staticmethod
+    def _sqliteRows(rows):
+        '''Converts the date and time values of SQLite (text) into date and datetime instances like MySQL.
+        @param rows: the rows of a query
+        @return: the converted rows
+        '''
+        rc = []
+        for row in rows:
+            if any(map(lambda value: type(value) == str, row)):
+                values = []
+                for value in row:
+                    if type(value) == str:
+                        if len(value) == 10 and MyDb._patternDate.match(value):
+                            value = datetime.date.fromisoformat(value)
+                        elif len(value) == 19 and MyDb._patternDateTime.match(value):
+                            value = datetime.datetime.fromisoformat(value)
+                    values.append(value)
+                row = tuple(values)
+            rc.append(row)
+        return rc
+
+    def _dbRun(self, connection, sql: str, values=None, many: bool=False, cache: bool=True):
+        '''Executes a statement with the syntax of the driver.
+        MySQL: a statement with parameters is executed as prepared statement (see StatementCache).
+        @param connection: the connection to use
+        @param sql: the statement in MySQL syntax
+        @param values: None or the positional parameters (a list of parameter sets if many is True)
+        @param many: True: the statement is executed for each parameter set
+        @param cache: False: the statement cache is not used
+        @return: a tuple (cursor, prepared): prepared: True: the cursor belongs to the statement cache
+        '''
+        prepared = False
+        if self._driver == 'sqlite':
+            # the SQLite module has its own statement cache (see db.statement.cache):
+            rc = connection.cursor()
+            sql = MyDb.dbTranslate(sql)
+            values = () if values is None else values
+            if many:
+                # one transaction instead of one per row:
+                inTransaction = connection.in_transaction
+                if not inTransaction:
+                    rc.execute('BEGIN;')
+                try:
+                    rc.executemany(sql, values)
+                    if not inTransaction:
+                        rc.execute('COMMIT;')
+                except Exception:
+                    if not inTransaction:
+                        rc.execute('ROLLBACK;')
+                    raise
+            else:
+                rc.execute(sql, values)
+        else:
+            rc = None
+            if cache and not many and values is not None and self._statementCacheSize > 0:
+                rc = self._dbStatements(connection).cursor(sql)
+            if rc is not None:
+                prepared = True
+                rc.execute(sql, values)
+            else:
+                rc = connection.cursor()
+                if many:
+                    rc.executemany(sql, values)
+                else:
+                    rc.execute(sql, values)
+        return (rc, prepared)
+
+    def _dbFetch(self, cursor, prepared: bool=False):
+        '''Returns the result of the last query.
+        @param cursor: the cursor of the query
+        @param prepared: True: the cursor is a prepared statement
+        @return: the list of records
+        '''
+        rc = cursor.fetchall()
+        if self._driver == 'sqlite':
+            rc = MyDb._sqliteRows(rc)
+        elif prepared:
+            rc = StatementCache.textValues(cursor, rc)
+        return rc
+
+    def _dbIsConnected(self) -> bool:
+        '''Tests whether the shared connection is usable.
+        @return: True: the connection exists and is connected
+        '''
+        rc = self._connection is not None and (self._driver == 'sqlite' or self._connection.is_connected())
+        return rc
+
+    def _dbStatements(self, connection) -> StatementCache:
+        '''Returns the statement cache of a connection. The cache lives as long as the connection.
+        @param connection: the connection
+        @return: the StatementCache instance of the connection
+        '''
+        rc = getattr(connection, '_myDbStatements', None)
+        if rc is None:
+            rc = connection._myDbStatements = StatementCache(connection, self._statementCacheSize)
+        return rc
+
     def dbConnect(self):
         '''Connects the database with the login data from the configuration.
+        In pooled mode (db.pool.size > 0) the pool is created and the first connection is opened.
         '''
-        self._connection = mysql.connector.connect(host=self._host, user=self._dbUser, password=self._dbCode,
-                                                   database=self._dbName, autocommit=self._autocommit)
-        if self._connection == None:
-            self.error('cannot connect to db')
+        if self._poolSize > 0:
+            if self._pool is None:
+                self._pool = DbPool(self._dbNewConnection, self._poolSize)
+            self._pool.release(self._pool.acquire())
+            self.log(f'connected to {self._dbName} (pool size {self._poolSize})')
         else:
-            self.log(f'connected to {self._dbName}')
+            self._connection = self._dbNewConnection()
+            if self._connection == None:
+                self.error('cannot connect to db')
+            else:
+                self.log(f'connected to {self._dbName}')
 
     def dbClose(self):
-        '''Closes the connection.
+        '''Closes the connection (or the pool).
         '''
         self.debug(f'closing {self._dbName}')
+        if self._pool is not None:
+            self._pool.close()
+            self._pool = None
         self.dbCloseCursor()
         if self._connection != None:
             self._connection.close()
@@ -81,44 +498,336 @@ class MyDb (SilentLog):
         '''Commits the last transaction.
         '''
         self.debug('dbCommit')
-        if not self._autocommit:
+        if not self._autocommit and self._connection is not None:
             try:
                 self._connection.commit()
             except Exception as exc:
                 self.debug(f'commit failed: {exc}')
         self.dbCloseCursor()
 
+    def _dbShared(self):
+        '''Returns the shared connection: opened or reopened if needed. The caller must hold the lock.
+        @return: the connection
+        '''
+        if self._connection is None:
+            self.dbConnect()
+        elif not self._dbIsConnected():
+            self.dbReconnect()
+        return self._connection
+
+    @contextlib.contextmanager
+    def _dbCheckout(self):
+        '''Delivers a connection for one or more statements (context manager):
+        In pooled mode a connection is checked out from the pool and returned at the end.
+        Otherwise the shared connection is used (reopened if needed), serialized by a lock.
+        '''
+        if self._pool is None:
+            with self._lock:
+                yield self._dbShared()
+                if not self._autocommit:
+                    self._connection.commit()
+        else:
+            connection = self._pool.acquire()
+            broken = False
+            try:
+                yield connection
+                if not self._autocommit:
+                    connection.commit()
+            except self._dbErrors():
+                broken = True
+                raise
+            finally:
+                self._pool.release(connection, broken)
+
+    @contextlib.contextmanager
+    def dbSession(self):
+        '''Delivers a cursor for one or more statements (context manager):
+        In pooled mode an own connection is checked out from the pool and returned at the end.
+        Otherwise the shared connection is used, serialized by a lock.
+        The cursor belongs to the driver: the statements must have its syntax.
+        Usage: with db.dbSession() as cursor: cursor.execute(sql)
+        '''
+        with self._dbCheckout() as connection:
+            cursor = connection.cursor()
+            try:
+                yield cursor
+            finally:
+                cursor.close()
+
     def dbExecute(self, sql: str, values=None):
         '''Executes a SQL statement without result: INSERT, UPDATE, DELETE...
         @param sql: the SQL statement
         @param values: None or the positional parameters
+        @return: the count of the affected rows
         '''
         self.debug('dbExecute ' + sql[0:20])
-        if self._cursor == None:
-            if not self._connection.is_connected():
-                self.dbReconnect()
-            self._cursor = self._connection.cursor()
-        self._cursor.execute(sql, values)
-        self.dbCommit()
+        start = None if self._stats is None else time.perf_counter()
+        try:
+            with self._dbCheckout() as connection:
+                (cursor, prepared) = self._dbRun(connection, sql, values)
+                rc = cursor.rowcount
+                if not prepared:
+                    cursor.close()
+        except Exception:
+            if start is not None:
+                self._dbRecord(sql, start, 0, values, None, True)
+            raise
+        if start is not None:
+            self._dbRecord(sql, start, rc, values, None)
+        return rc
+
+    def dbExecuteMany(self, sql: str, rows):
+        '''Executes a SQL statement once for each parameter set, e.g. an INSERT of many rows.
+        An INSERT is sent as one multi-row statement.
+        @param sql: the SQL statement
+        @param rows: a list of positional parameter sets
+        '''
+        self.debug(f'dbExecuteMany {len(rows)} ' + sql[0:20])
+        start = None if self._stats is None else time.perf_counter()
+        try:
+            with self._dbCheckout() as connection:
+                self._dbRun(connection, sql, rows, True)[0].close()
+        except Exception:
+            if start is not None:
+                self._dbRecord(sql, start, 0, rows, None, True, True)
+            raise
+        if start is not None:
+            self._dbRecord(sql, start, len(rows), rows, None, many=True)
+
+    def dbIterate(self, sql: str, values=None, chunkSize: int=1000):
+        '''Executes a query and delivers the records one by one (generator): see dbSelectChunks().
+        @param sql: the SQL statement
+        @param values: None or the positional parameters
+        @param chunkSize: the count of records fetched at once
+        @return: the records
+        '''
+        for chunk in self.dbSelectChunks(sql, values, chunkSize):
+            yield from chunk
+
+    def dbSelectChunks(self, sql: str, values=None, chunkSize: int=1000):
+        '''Executes a query and delivers the records in chunks (generator): only one chunk is held in memory.
+        In pooled mode the query uses an own connection from the pool: other statements may be executed while iterating.
+        Otherwise the shared connection is used, locked until the end of the iteration. MySQL delivers the records
+        of an unbuffered cursor: no other statements may be executed while iterating (use db.pool.size for that).
+        If the iteration is stopped early the connection is closed or reopened (the unread records are not transferred).
+        @param sql: the SQL statement
+        @param values: None or the positional parameters
+        @param chunkSize: the count of records fetched at once
+        @return: lists of records
+        '''
+        self.debug('dbSelectChunks ' + sql[0:20])
+        if self._pool is None:
+            # other threads wait until the iteration is finished:
+            self._lock.acquire()
+            try:
+                connection = self._dbShared()
+            except Exception:
+                self._lock.release()
+                raise
+        else:
+            connection = self._pool.acquire()
+        complete = False
+        # instrumentation: the time of the consumer is not counted
+        seconds = 0.0
+        countRows = 0
+        size = 0
+        try:
+            start = time.perf_counter()
+            (cursor, prepared) = self._dbRun(connection, sql, values)
+            try:
+                while True:
+                    chunk = cursor.fetchmany(chunkSize)
+                    if len(chunk) == 0:
+                        break
+                    if self._stats is not None:
+                        seconds += time.perf_counter() - start
+                        countRows += len(chunk)
+                        if self._stats.collect:
+                            size += QueryStats.sizeOf(chunk)
+                    if self._driver == 'sqlite':
+                        chunk = MyDb._sqliteRows(chunk)
+                    elif prepared:
+                        chunk = StatementCache.textValues(cursor, chunk)
+                    yield chunk
+                    start = time.perf_counter()
+                complete = True
+            finally:
+                if (complete or self._driver == 'sqlite') and not prepared:
+                    cursor.close()
+                if self._stats is not None:
+                    sent = len(sql) + QueryStats.sizeOf(None if values is None else (values,)) if self._stats.collect else 0
+                    self._stats.record(sql, seconds + time.perf_counter() - start, countRows, sent, size, not complete)
+        finally:
+            if self._pool is not None:
+                self._pool.release(connection, not complete)
+            else:
+                try:
+                    if not complete and self._driver != 'sqlite':
+                        # the unread records block the connection:
+                        self.dbReconnect()
+                    elif not self._autocommit:
+                        connection.commit()
+                finally:
+                    self._lock.release()
+
+    def dbMigrate(self, migrations) -> int:
+        '''Upgrades the database schema: the migrations newer than the recorded schema version are executed.
+        The version is stored in the table "schema_version" (one row per applied migration).
+        @param migrations: a list of tuples (version, description, action) ordered by version.
+            action: a SQL statement or a function without parameters
+        @return: the count of the executed migrations
+        '''
+        self.dbExecute('''create table if not exists schema_version (
+  version int PRIMARY KEY,
+  description varchar(128),
+  applied timestamp null
+);''')
+        current = self.dbSchemaVersion()
+        rc = 0
+        for version, description, action in migrations:
+            if version > current:
+                if callable(action):
+                    action()
+                else:
+                    self.dbExecute(action)
+                self.dbExecute('INSERT INTO schema_version (version, description, applied) VALUES (%s, %s, now());',
+                               (version, description))
+                self.log(f'schema version {version}: {description}')
+                rc += 1
+        return rc
+
+    def dbSchemaVersion(self) -> int:
+        '''Returns the version of the database schema.
+        @return: the version of the last applied migration. 0: no migration has been applied
+        '''
+        rows = self.dbSelect('SELECT max(version) FROM schema_version;')
+        rc = 0 if len(rows) == 0 or rows[0][0] is None else rows[0][0]
+        return rc
+
+    def dbTables(self):
+        '''Returns the names of the tables of the database.
+        @return: a set of table names
+        '''
+        if self._driver == 'sqlite':
+            rc = set(map(lambda record: record[0], self.dbSelect("SELECT name FROM sqlite_master WHERE type='table';")))
+        else:
+            rc = set(map(lambda record: record[0], self.dbSelect('show tables;')))
+        return rc
+
+    def addColumnIfNotExists(self, table: str, column: str, definition: str) -> bool:
+        '''Adds a column to an existing table if it does not exist.
+        @param table: the table's name
+        @param column: the column's name
+        @param definition: the column's type, e.g. "varchar(32)"
+        @return: True: the column has been created
+        '''
+        rc = False
+        if self._driver == 'sqlite':
+            records = list(filter(lambda record: record[1] == column, self.dbSelect(f'PRAGMA table_info({table});')))
+        else:
+            records = self.dbSelect(f'SHOW COLUMNS FROM {table} LIKE %s;', (column,))
+        if len(records) == 0:
+            self.dbExecute(f'ALTER TABLE {table} ADD COLUMN {column} {definition};')
+            self.log(f'column {table}.{column} created')
+            rc = True
+        return rc
+
+    def addIndexIfNotExists(self, table: str, name: str, definition: str) -> bool:
+        '''Adds an index to an existing table if it does not exist.
+        @param table: the table's name
+        @param name: the index's name
+        @param definition: the index's definition, e.g. "INDEX day_energy (day_energy)"
+        @return: True: the index has been created
+        '''
+        rc = False
+        if not self.dbHasIndex(table, name):
+            if self._driver == 'sqlite':
+                # "UNIQUE INDEX day_date (day_date)" -> "CREATE UNIQUE INDEX day_date ON days (day_date)"
+                self.dbExecute(re.sub(r'^((?:UNIQUE\s+)?INDEX\s+\w+)\s*(\(.*\))$', rf'CREATE \1 ON {table} \2',
+                                      definition.strip(), flags=re.I | re.S) + ';')
+            else:
+                self.dbExecute(f'ALTER TABLE {table} ADD {definition};')
+            self.log(f'index {table}.{name} created')
+            rc = True
+        return rc
+
+    def dbHasIndex(self, table: str, name: str) -> bool:
+        '''Tests whether an index exists.
+        @param table: the table's name
+        @param name: the index's name
+        @return: True: the index exists
+        '''
+        if self._driver == 'sqlite':
+            records = self.dbSelect("SELECT name FROM sqlite_master WHERE type='index' AND tbl_name=%s AND name=%s;",
+                                    (table, name))
+        else:
+            records = self.dbSelect(f'SHOW INDEX FROM {table} WHERE Key_name=%s;', (name,))
+        rc = len(records) > 0
+        return rc
 
     def dbReconnect(self):
         '''Closes a database connection and reopen that.
         '''
         self.debug('reconnecting...')
-        self._connection.reconnect()
+        if self._driver == 'sqlite':
+            self._connection.close()
+            self._connection = self._dbNewConnection()
+        else:
+            # the prepared statements of the server are lost:
+            self._connection._myDbStatements = None
+            self._connection.reconnect()
+
+    def _dbRecord(self, sql: str, start: float, rows: int, values, result, error: bool=False, many: bool=False):
+        '''Adds one execution to the query statistics.
+        @param sql: the SQL statement
+        @param start: the start time (time.perf_counter())
+        @param rows: the count of the returned or affected rows
+        @param values: None or the parameters
+        @param result: None or the returned records
+        @param error: True: the execution failed
+        @param many: True: values is a list of parameter sets
+        '''
+        seconds = time.perf_counter() - start
+        if self._stats.collect:
+            self._stats.record(sql, seconds, rows,
+                               len(sql) + QueryStats.sizeOf(values if many or values is None else (values,)),
+                               QueryStats.sizeOf(result), error)
+        else:
+            # only the slow queries are logged: the sizes are not needed
+            self._stats.record(sql, seconds, rows, 0, 0, error)
+
+    def dbStats(self) -> QueryStats:
+        '''Returns the query statistics.
+        @return: None: the instrumentation is disabled (db.stats and db.slow.ms). Otherwise: the QueryStats instance
+        '''
+        return self._stats
+
+    def dbStatsReport(self, limit: int=20):
+        '''Returns a report of the query statistics.
+        @param limit: the maximal count of reported statements
+        @return: a list of lines: empty if no statistics are collected
+        '''
+        rc = [] if self._stats is None or not self._stats.collect else self._stats.report(limit)
+        return rc
 
     def dbSelect(self, sql, values=None):
-        '''Executes a SQL statement without result: INSERT, UPDATE, DELETE...
+        '''Executes a SQL statement with result: SELECT...
         @param sql: the SQL statement
         @param values: None or the positional parameters
         @return a list of records
         '''
         self.debug('dbSelect ' + sql[0:20])
-        if self._cursor == None:
-            if not self._connection.is_connected():
-                self.dbConnect()
-            self._cursor = self._connection.cursor()
-        self._cursor.execute(sql, values)
-        rc = self._cursor.fetchall()
-        self.dbCloseCursor()
+        start = None if self._stats is None else time.perf_counter()
+        try:
+            with self._dbCheckout() as connection:
+                (cursor, prepared) = self._dbRun(connection, sql, values)
+                rc = self._dbFetch(cursor, prepared)
+                if not prepared:
+                    cursor.close()
+        except Exception:
+            if start is not None:
+                self._dbRecord(sql, start, 0, values, None, True)
+            raise
+        if start is not None:
+            self._dbRecord(sql, start, len(rc), values, rc)
         return rc
@@ -0,0 +1,173 @@
+'''
+Created on 18.10.2026
+
+@author: wk
+'''
+import bisect
+import datetime
+import functools
+import re
+import threading
+from SilentLog import SilentLog
+
+
+class StatementStats:
+    '''The counters of one statement fingerprint.
+    '''
+    # the upper bounds of the latency histogram in milliseconds (the last bucket takes the rest):
+    bounds = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000)
+
+    def __init__(self, fingerprint: str):
+        '''Constructor.
+        @param fingerprint: the normalized statement (see QueryStats.fingerprint())
+        '''
+        self.fingerprint = fingerprint
+        self.count = 0
+        self.countErrors = 0
+        self.seconds = 0.0
+        self.secondsMax = 0.0
+        self.rows = 0
+        self.bytesSent = 0
+        self.bytesReceived = 0
+        self.histogram = [0] * (len(StatementStats.bounds) + 1)
+
+    def add(self, seconds: float, rows: int, bytesSent: int, bytesReceived: int, error: bool):
+        '''Adds one execution.
+        @param seconds: the duration of the execution
+        @param rows: the count of the returned (or affected) rows
+        @param bytesSent: the size of the statement and the parameters
+        @param bytesReceived: the (estimated) size of the result
+        @param error: True: the execution failed
+        '''
+        self.count += 1
+        self.seconds += seconds
+        self.secondsMax = max(self.secondsMax, seconds)
+        self.rows += rows
+        self.bytesSent += bytesSent
+        self.bytesReceived += bytesReceived
+        if error:
+            self.countErrors += 1
+        self.histogram[bisect.bisect_left(StatementStats.bounds, seconds * 1000)] += 1
+
+    def percentile(self, part: float) -> float:
+        '''Estimates a percentile of the latency from the histogram.
+        @param part: the percentile as fraction, e.g. 0.95
+        @return: the upper bound of the histogram bucket containing the percentile in milliseconds
+            (the maximum for the last bucket)
+        '''
+        rc = 0.0
+        limit = part * self.count
+        current = 0
+        for ix, count in enumerate(self.histogram):
+            current += count
+            if current >= limit and count > 0:
+                rc = float(StatementStats.bounds[ix]) if ix < len(StatementStats.bounds) else self.secondsMax * 1000
+                break
+        return rc
+
+    def asDict(self):
+        '''Returns the counters as dictionary (e.g. for JSON).
+        @return: the dictionary
+        '''
+        rc = {'sql': self.fingerprint, 'count': self.count, 'errors': self.countErrors,
+              'totalMs': round(self.seconds * 1000, 3), 'maxMs': round(self.secondsMax * 1000, 3),
+              'rows': self.rows, 'bytesSent': self.bytesSent, 'bytesReceived': self.bytesReceived,
+              'histogram': dict(zip(list(map(lambda bound: f'<={bound}ms', StatementStats.bounds)) + ['more'],
+                                    self.histogram))}
+        return rc
+
+
+class QueryStats:
+    '''Collects the timing of the SQL statements per fingerprint (the statement without literals)
+    and logs the slow statements. Thread safe.
+    '''
+
+    def __init__(self, collect: bool=True, slowMs: int=0, logger: SilentLog=None):
+        '''Constructor.
+        @param collect: True: the counters per fingerprint are collected
+        @param slowMs: 0 or the minimal duration of a logged statement in milliseconds
+        @param logger: None or the logger of the slow statements
+        '''
+        self.collect = collect
+        self._slowSeconds = slowMs / 1000.0
+        self._logger = logger
+        self._statements = {}
+        self._lock = threading.Lock()
+        self.since = datetime.datetime.now()
+
+    @staticmethod
+    @functools.lru_cache(maxsize=1024)
+    def fingerprint(sql: str) -> str:
+        '''Normalizes a statement: literals are replaced by "?", the white space is collapsed.
+        @param sql: the SQL statement
+        @return: the fingerprint, e.g. "SELECT day_date FROM days WHERE day_date>=? LIMIT ?;"
+        '''
+        rc = re.sub(r"'(?:[^'\\]|\\.|'')*'", '?', sql)
+        rc = rc.replace('%s', '?')
+        rc = re.sub(r'(?<![\w.])-?\d+(?:\.\d+)?(?:[eE][-+]?\d+)?\b', '?', rc)
+        rc = re.sub(r'\(\s*\?(?:\s*,\s*\?)+\s*\)', '(?...)', rc)
+        rc = ' '.join(rc.split())
+        return rc
+
+    @staticmethod
+    def sizeOf(rows) -> int:
+        '''Estimates the size of a result or a parameter set in bytes.
+        @param rows: a list of records (tuples) or None
+        @return: the estimated size
+        '''
+        rc = 0
+        if rows is not None:
+            for row in rows:
+                for value in (row if type(row) in (tuple, list) else (row,)):
+                    rc += len(value) if type(value) in (str, bytes, bytearray) else 8
+        return rc
+
+    def record(self, sql: str, seconds: float, rows: int, bytesSent: int, bytesReceived: int, error: bool=False):
+        '''Adds one execution of a statement.
+        @param sql: the SQL statement
+        @param seconds: the duration of the execution
+        @param rows: the count of the returned (or affected) rows
+        @param bytesSent: the size of the statement and the parameters
+        @param bytesReceived: the (estimated) size of the result
+        @param error: True: the execution failed
+        '''
+        if self.collect:
+            fingerprint = QueryStats.fingerprint(sql)
+            with self._lock:
+                stats = self._statements.get(fingerprint)
+                if stats is None:
+                    stats = self._statements[fingerprint] = StatementStats(fingerprint)
+                stats.add(seconds, rows, bytesSent, bytesReceived, error)
+        if self._slowSeconds > 0 and seconds >= self._slowSeconds and self._logger is not None:
+            self._logger.log(f'slow query: {seconds * 1000:.1f} ms rows: {rows} {" ".join(sql.split())[0:300]}')
+
+    def report(self, limit: int=20):
+        '''Returns a report of the statements with the highest total duration.
+        @param limit: the maximal count of reported statements
+        @return: a list of lines
+        '''
+        with self._lock:
+            statements = sorted(self._statements.values(), key=lambda stats: stats.seconds, reverse=True)[0:limit]
+        rc = [f'query statistics since {self.since.strftime("%Y-%m-%d %H:%M:%S")}: {len(self._statements)} statement(s)']
+        for stats in statements:
+            rc.append(f'{stats.count:8d} x total: {stats.seconds * 1000:10.1f} ms avg: '
+                      + f'{stats.seconds * 1000 / stats.count:8.2f} ms p95: <={stats.percentile(0.95):g} ms '
+                      + f'max: {stats.secondsMax * 1000:.1f} ms rows: {stats.rows} '
+                      + f'bytes: {stats.bytesSent}/{stats.bytesReceived} errors: {stats.countErrors}')
+            rc.append('    ' + stats.fingerprint[0:300])
+        return rc
+
+    def reset(self):
+        '''Removes all counters.
+        '''
+        with self._lock:
+            self._statements = {}
+            self.since = datetime.datetime.now()
+
+    def statements(self):
+        '''Returns the counters of all statements.
+        @return: a list of dictionaries: see StatementStats.asDict()
+        '''
+        with self._lock:
+            rc = list(map(lambda stats: stats.asDict(), self._statements.values()))
+        return rc
@@ -0,0 +1,174 @@
+'''
+Created on 18.10.2026
+
+@author: wk
+'''
+import datetime
+from SilentLog import SilentLog
+
+
+class Retention:
+    '''Maintains the table "events": monthly range partitions and the removal of old events.
+    Each partition contains the events of one month (name: pYYYYMM), the last partition (pmax)
+    takes all later events. Old events are removed by dropping whole partitions: that is cheap
+    compared to a DELETE. Without partitions the old events are deleted in chunks.
+    '''
+
+    def __init__(self, db, logger: SilentLog=None):
+        '''Constructor.
+        @param db: the database access (a MyDb instance)
+        @param logger: None or the error handler. None: db
+        '''
+        self._db = db
+        self._logger = db if logger is None else logger
+
+    @staticmethod
+    def monthStart(date: datetime.date, months: int=0) -> datetime.date:
+        '''Returns the first day of a month.
+        @param date: a day of the month
+        @param months: the count of months to add (may be negative)
+        @return: the first day of the month
+        '''
+        index = date.year * 12 + date.month - 1 + months
+        rc = datetime.date(index // 12, index % 12 + 1, 1)
+        return rc
+
+    @staticmethod
+    def partitionDefinition(month: datetime.date) -> str:
+        '''Returns the definition of the partition of one month.
+        @param month: the first day of the month
+        @return: the definition, e.g. "PARTITION p202303 VALUES LESS THAN (TO_DAYS('2023-04-01'))"
+        '''
+        rc = (f"PARTITION p{month.strftime('%Y%m')} VALUES LESS THAN "
+              + f"(TO_DAYS('{Retention.monthStart(month, 1).strftime('%Y-%m-%d')}'))")
+        return rc
+
+    def partitions(self):
+        '''Returns the monthly partitions of the table "events".
+        @return: a sorted list of the first days of the months with a partition. None: the table is not partitioned
+        '''
+        if self._db.dbDriver() == 'sqlite':
+            return None
+        rows = self._db.dbSelect('''SELECT PARTITION_NAME FROM information_schema.PARTITIONS
+WHERE TABLE_SCHEMA=DATABASE() AND TABLE_NAME='events' AND PARTITION_NAME IS NOT NULL;''')
+        if len(rows) == 0:
+            rc = None
+        else:
+            rc = sorted(map(lambda row: datetime.date(int(row[0][1:5]), int(row[0][5:7]), 1),
+                            filter(lambda row: row[0] != 'pmax', rows)))
+        return rc
+
+    def partitionTable(self, monthsAhead: int=2):
+        '''Converts the table "events" into a partitioned table. That may take a while for a big table.
+        MySQL demands that the partition column is part of the primary key.
+        @param monthsAhead: the count of the partitions created for the next months
+        '''
+        rows = self._db.dbSelect('SELECT min(event_time) FROM events;')
+        today = datetime.date.today()
+        first = Retention.monthStart(today if rows[0][0] is None else rows[0][0].date())
+        definitions = []
+        month = first
+        while month <= Retention.monthStart(today, monthsAhead):
+            definitions.append(Retention.partitionDefinition(month))
+            month = Retention.monthStart(month, 1)
+        definitions.append('PARTITION pmax VALUES LESS THAN MAXVALUE')
+        self._db.dbExecute('DELETE FROM events WHERE event_time IS NULL;')
+        self._db.dbExecute('''ALTER TABLE events MODIFY event_time datetime NOT NULL,
+  DROP PRIMARY KEY, ADD PRIMARY KEY (event_id, event_time);''')
+        self._db.dbExecute('ALTER TABLE events PARTITION BY RANGE (TO_DAYS(event_time)) (\n  '
+                           + ',\n  '.join(definitions) + ');')
+        self._logger.log(f'events: {len(definitions)} partition(s) created')
+
+    def addPartitions(self, monthsAhead: int=2) -> int:
+        '''Creates the missing partitions of the current and the next months by splitting the partition pmax.
+        @param monthsAhead: the count of the partitions needed for the next months
+        @return: the count of the created partitions
+        '''
+        partitions = self.partitions()
+        rc = 0
+        if partitions is not None:
+            today = datetime.date.today()
+            month = Retention.monthStart(today) if len(partitions) == 0 else Retention.monthStart(partitions[-1], 1)
+            definitions = []
+            while month <= Retention.monthStart(today, monthsAhead):
+                definitions.append(Retention.partitionDefinition(month))
+                month = Retention.monthStart(month, 1)
+            if len(definitions) > 0:
+                definitions.append('PARTITION pmax VALUES LESS THAN MAXVALUE')
+                self._db.dbExecute('ALTER TABLE events REORGANIZE PARTITION pmax INTO (\n  '
+                                   + ',\n  '.join(definitions) + ');')
+                rc = len(definitions) - 1
+                self._logger.log(f'events: {rc} partition(s) added')
+        return rc
+
+    def coveredUntil(self, useRollup: bool, archive=None) -> datetime.date:
+        '''Returns the date until the events are covered by the aggregates (table "days", rollup tables)
+        and by the archive: the charts and a recompute of the statistics need the events or the archive.
+        The events of all devices are removed: each device must be covered.
+        @param useRollup: True: the rollup tables must contain the events too
+        @param archive: None or the archive (an Archive instance). None: nothing is covered
+        @return: the first day not covered
+        '''
+        rows = self._db.dbSelect('SELECT max(day_date) FROM days;')
+        rc = datetime.date.min if rows[0][0] is None else rows[0][0] + datetime.timedelta(days=1)
+        rows = self._db.dbSelect('SELECT min(dirty_date) FROM dirty_days;')
+        if rows[0][0] is not None:
+            rc = min(rc, rows[0][0])
+        firstEvents = self._db.dbSelect('SELECT event_device, min(event_time) FROM events GROUP BY event_device;')
+        if useRollup:
+            rollups = dict(map(lambda row: (row[0] or None, row[1]), self._db.dbSelect(
+                'SELECT rollup_device, max(rollup_start) FROM events_1h GROUP BY rollup_device;')))
+            for device, _first in firstEvents:
+                last = rollups.get(device or None)
+                rc = min(rc, datetime.date.min if last is None else last.date())
+        for device, first in firstEvents:
+            rc = min(rc, self.archivedUntil(archive, device or None, first))
+        return rc
+
+    @staticmethod
+    def archivedUntil(archive, device: str, first: datetime.datetime) -> datetime.date:
+        '''Returns the date until the events of a device are stored in the archive without gaps.
+        The archive of all devices ("all") covers each device.
+        @param archive: None or the archive (an Archive instance). None: nothing is archived
+        @param device: None or the device
+        @param first: None or the time of the first event of the device
+        @return: the first day not archived
+        '''
+        if archive is None or first is None:
+            rc = datetime.date.min
+        else:
+            rc = Retention.monthStart(first.date())
+            months = archive.months(None) if device is None else archive.months(device) | archive.months(None)
+            while rc in months:
+                rc = Retention.monthStart(rc, 1)
+        return rc
+
+    def prune(self, cutoff: datetime.date, chunkSize: int=10000) -> int:
+        '''Removes the events older than a given date: the partitions containing only older events are dropped.
+        Without partitions the events are deleted in chunks.
+        @param cutoff: the events before this date are removed
+        @param chunkSize: the count of events deleted with one statement (without partitions)
+        @return: the count of dropped partitions or the count of deleted events
+        '''
+        rc = 0
+        partitions = self.partitions()
+        if partitions is not None:
+            names = list(map(lambda month: 'p' + month.strftime('%Y%m'),
+                             filter(lambda month: Retention.monthStart(month, 1) <= cutoff, partitions)))
+            if len(names) > 0:
+                self._db.dbExecute(f'ALTER TABLE events DROP PARTITION {", ".join(names)};')
+                rc = len(names)
+                self._logger.log(f'events: partition(s) {", ".join(names)} dropped')
+        else:
+            if self._db.dbDriver() == 'sqlite':
+                # SQLite knows no DELETE ... LIMIT (without a special compile option):
+                sql = f'DELETE FROM events WHERE rowid IN (SELECT rowid FROM events WHERE event_time < %s LIMIT {chunkSize});'
+            else:
+                sql = f'DELETE FROM events WHERE event_time < %s LIMIT {chunkSize};'
+            while True:
+                count = self._db.dbExecute(sql, (cutoff.strftime('%Y-%m-%d'),))
+                rc += count
+                if count < chunkSize:
+                    break
+            self._logger.log(f'events: {rc} event(s) before {cutoff} deleted')
+        return rc
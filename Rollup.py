@@ -0,0 +1,171 @@
+'''
+Created on 18.10.2026
+
+@author: wk
+'''
+import datetime
+from SilentLog import SilentLog
+
+
+class Bucket:
+    '''The aggregated events of one time interval of one device.
+    '''
+
+    def __init__(self, eventTime: str, total: float, power: float):
+        '''Constructor.
+        @param eventTime: the time of the first event, e.g. "2023-03-28 12:34:56"
+        @param total: the energy counter of the first event
+        @param power: the power of the first event
+        '''
+        self.count = 1
+        self.powerMin = self.powerMax = self.powerSum = power
+        self.timeFirst = self.timeLast = eventTime
+        self.totalFirst = self.totalLast = total
+
+    def add(self, eventTime: str, total: float, power: float):
+        '''Adds one event. The events may arrive in any order.
+        @param eventTime: the time of the event
+        @param total: the energy counter of the event
+        @param power: the power of the event
+        '''
+        self.count += 1
+        self.powerSum += power
+        self.powerMin = min(self.powerMin, power)
+        self.powerMax = max(self.powerMax, power)
+        if eventTime < self.timeFirst:
+            self.timeFirst = eventTime
+            self.totalFirst = total
+        if eventTime >= self.timeLast:
+            self.timeLast = eventTime
+            self.totalLast = total
+
+
+class Rollup:
+    '''Maintains the rollup tables of the table "events": the events are summarized in time intervals
+    (5 minutes, 1 hour) per device: count, minimum, maximum and sum of the power, first and last energy counter.
+    The tables are updated incrementally (each stored event group) and can be built from the existing events.
+    '''
+    # table name -> interval length in minutes
+    tables = {'events_5m': 5, 'events_1h': 60}
+
+    def __init__(self, db, logger: SilentLog=None):
+        '''Constructor.
+        @param db: the database access (a MyDb instance)
+        @param logger: None or the error handler. None: db
+        '''
+        self._db = db
+        self._logger = db if logger is None else logger
+
+    @staticmethod
+    def aggregate(rows, minutes: int):
+        '''Summarizes events into buckets.
+        @param rows: the events: tuples (event_time, event_total, event_apower, event_device)
+            event_time as string "%Y-%m-%d %H:%M:%S" or datetime
+        @param minutes: the length of the interval of a bucket
+        @return: a dictionary: (start of the interval, device) -> Bucket
+        '''
+        rc = {}
+        for row in rows:
+            eventTime = row[0] if type(row[0]) == str else row[0].strftime('%Y-%m-%d %H:%M:%S')
+            if row[1] is None or row[2] is None:
+                continue
+            key = (Rollup.bucketStart(eventTime, minutes), row[3] or '')
+            bucket = rc.get(key)
+            if bucket is None:
+                rc[key] = Bucket(eventTime, float(row[1]), float(row[2]))
+            else:
+                bucket.add(eventTime, float(row[1]), float(row[2]))
+        return rc
+
+    def backfill(self, firstDate: datetime.date, lastDate: datetime.date, device: str=None, chunkDays: int=7) -> int:
+        '''Builds the rollup tables from the existing events: the rows of the interval are replaced.
+        The rollups are kept where the events are missing (e.g. removed by the retention): the backfill starts
+        at the first event and chunks without events are not touched.
+        @param firstDate: the start of the interval to handle
+        @param lastDate: the end of the interval to handle (excluding)
+        @param device: None: all devices. Otherwise: the device to handle
+        @param chunkDays: the events are read in chunks of this count of days
+        @return: the count of the handled events
+        '''
+        rc = 0
+        condition = '' if device is None else ' AND event_device=%s'
+        rows = self._db.dbSelect('SELECT min(event_time) FROM events' + ('' if device is None else ' WHERE event_device=%s')
+                                 + ';', None if device is None else (device,))
+        current = lastDate if rows[0][0] is None else max(firstDate, rows[0][0].date())
+        while current < lastDate:
+            last = min(lastDate, current + datetime.timedelta(days=chunkDays))
+            params = [current.strftime('%Y-%m-%d'), last.strftime('%Y-%m-%d')]
+            if device is not None:
+                params.append(device)
+            rows = self._db.dbSelect(f'''SELECT event_time, event_total, event_apower, event_device
+FROM events
+WHERE event_time >= %s AND event_time < %s{condition};''', params)
+            if len(rows) > 0:
+                for table in Rollup.tables:
+                    conditionRollup = '' if device is None else ' AND rollup_device=%s'
+                    self._db.dbExecute(f'DELETE FROM {table} WHERE rollup_start >= %s AND rollup_start < %s{conditionRollup};',
+                                       params)
+                self.store(rows)
+                rc += len(rows)
+            self._logger.log(f'rollup {params[0]} - {params[1]}: {len(rows)} event(s)')
+            current = last
+        return rc
+
+    @staticmethod
+    def bucketStart(eventTime: str, minutes: int) -> str:
+        '''Returns the start of the interval containing a given time.
+        @param eventTime: the time, e.g. "2023-03-28 12:34:56"
+        @param minutes: the length of the interval: a divisor of 60 or 60
+        @return: the start of the interval, e.g. "2023-03-28 12:30:00"
+        '''
+        if minutes >= 60:
+            rc = eventTime[0:13] + ':00:00'
+        else:
+            rc = f'{eventTime[0:14]}{int(eventTime[14:16]) // minutes * minutes:02d}:00'
+        return rc
+
+    def createTables(self, existing):
+        '''Creates the missing rollup tables.
+        @param existing: the names of the existing tables
+        '''
+        for table in Rollup.tables:
+            if table not in existing:
+                self._db.dbExecute(f'''create table {table} (
+  rollup_start datetime NOT NULL,
+  rollup_device varchar(32) NOT NULL DEFAULT '',
+  rollup_count int,
+  rollup_powermin float,
+  rollup_powermax float,
+  rollup_powersum double,
+  rollup_timefirst datetime,
+  rollup_totalfirst float,
+  rollup_timelast datetime,
+  rollup_totallast float,
+  PRIMARY KEY (rollup_start, rollup_device)
+);''')
+
+    def store(self, rows):
+        '''Adds events to the rollup tables.
+        @param rows: the events: tuples (event_time, event_total, event_apower, event_device)
+        '''
+        for table, minutes in Rollup.tables.items():
+            buckets = Rollup.aggregate(rows, minutes)
+            if len(buckets) > 0:
+                values = list(map(lambda item: (item[0][0], item[0][1], item[1].count, item[1].powerMin,
+                                                item[1].powerMax, item[1].powerSum, item[1].timeFirst,
+                                                item[1].totalFirst, item[1].timeLast, item[1].totalLast),
+                                  buckets.items()))
+                # MySQL evaluates the assignments from left to right: the total is updated before the time
+                self._db.dbExecuteMany(f'''INSERT INTO {table}
+  (rollup_start, rollup_device, rollup_count, rollup_powermin, rollup_powermax, rollup_powersum,
+  rollup_timefirst, rollup_totalfirst, rollup_timelast, rollup_totallast)
+  VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+  ON DUPLICATE KEY UPDATE
+  rollup_count=rollup_count+VALUES(rollup_count),
+  rollup_powermin=LEAST(rollup_powermin, VALUES(rollup_powermin)),
+  rollup_powermax=GREATEST(rollup_powermax, VALUES(rollup_powermax)),
+  rollup_powersum=rollup_powersum+VALUES(rollup_powersum),
+  rollup_totalfirst=IF(VALUES(rollup_timefirst) < rollup_timefirst, VALUES(rollup_totalfirst), rollup_totalfirst),
+  rollup_timefirst=LEAST(rollup_timefirst, VALUES(rollup_timefirst)),
+  rollup_totallast=IF(VALUES(rollup_timelast) >= rollup_timelast, VALUES(rollup_totallast), rollup_totallast),
+  rollup_timelast=GREATEST(rollup_timelast, VALUES(rollup_timelast))''', values)
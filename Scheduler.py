@@ -0,0 +1,124 @@
+'''
+Created on 18.10.2026
+
+@author: wk
+'''
+import time
+
+
+class Scheduler:
+    '''Delivers ticks in a fixed interval, aligned to the wall clock (e.g. to the minute boundaries).
+    The ticks are computed with the monotonic clock: the duration of the work between two ticks
+    does not shift the schedule. Ticks missed because the work took too long are skipped,
+    the caller gets the latest of the missed ticks (no burst to catch up).
+    '''
+
+    def __init__(self, interval: float, clock=time.monotonic, wallClock=time.time, sleep=time.sleep):
+        '''Constructor.
+        @param interval: the time between two ticks in seconds
+        @param clock: a function returning the time of the monotonic clock (exchangeable for tests)
+        @param wallClock: a function returning the current time (exchangeable for tests)
+        @param sleep: a function waiting a given count of seconds (exchangeable for tests)
+        '''
+        self.interval = interval
+        self._clock = clock
+        self._wallClock = wallClock
+        self._sleep = sleep
+        self._nextTick = None
+        # the delay of the last tick in seconds:
+        self.lateness = 0.0
+        # the time of the last tick (wall clock, without the delay):
+        self.tickTime = None
+        self.countTicks = 0
+        self.countSkipped = 0
+
+    def _firstTick(self) -> float:
+        '''Returns the first tick: the next multiple of the interval of the wall clock.
+        @return: the time of the first tick (monotonic clock)
+        '''
+        now = self._clock()
+        rc = now + (-self._wallClock()) % self.interval
+        return rc
+
+    def setInterval(self, interval: float):
+        '''Changes the interval. The next tick is aligned to the new interval.
+        @param interval: the time between two ticks in seconds
+        '''
+        if interval != self.interval:
+            self.interval = interval
+            self._nextTick = None
+
+    def wait(self) -> float:
+        '''Waits for the next tick.
+        @return: the delay of the tick in seconds
+        '''
+        if self._nextTick is None:
+            self._nextTick = self._firstTick()
+        now = self._clock()
+        while now < self._nextTick:
+            self._sleep(self._nextTick - now)
+            now = self._clock()
+        lateness = now - self._nextTick
+        if lateness >= self.interval:
+            missed = int(lateness // self.interval)
+            self.countSkipped += missed
+            self._nextTick += missed * self.interval
+            lateness = now - self._nextTick
+        self.lateness = lateness
+        self.tickTime = self._wallClock() - lateness
+        self._nextTick += self.interval
+        self.countTicks += 1
+        return lateness
+
+
+class AdaptiveInterval:
+    '''Calculates the poll interval from the volatility of the measured power:
+    If the power changes fast the interval is reduced, if the values are stable the interval is enlarged.
+    The intervals are taken from a list of values dividing a minute or an hour (the ticks stay aligned).
+    '''
+    steps = (1, 2, 5, 10, 15, 20, 30, 60, 120, 300, 600, 900)
+
+    def __init__(self, minimum: int, maximum: int, threshold: float, stableCount: int=3):
+        '''Constructor.
+        @param minimum: the shortest interval in seconds
+        @param maximum: the longest interval in seconds
+        @param threshold: a power change (in W) greater or equal this value between two polls
+            reduces the interval
+        @param stableCount: the interval is enlarged after this count of polls without a relevant change
+        '''
+        self._steps = sorted(set([minimum, maximum] + list(filter(
+            lambda step: step > minimum and step < maximum, AdaptiveInterval.steps))))
+        self._threshold = threshold
+        self._stableCount = stableCount
+        self._countStable = 0
+        self._lastValues = {}
+        # start with the shortest interval: the first values are unknown
+        self._index = 0
+        self.interval = self._steps[0]
+
+    def maximum(self) -> int:
+        '''Returns the longest interval.
+        @return: the longest interval in seconds
+        '''
+        return self._steps[-1]
+
+    def update(self, values) -> int:
+        '''Calculates the interval from the current measurements.
+        @param values: a dictionary with the measured power of each device: name -> power (W)
+        @return: the new interval in seconds
+        '''
+        change = 0.0
+        for name, value in values.items():
+            if name in self._lastValues:
+                change = max(change, abs(value - self._lastValues[name]))
+            self._lastValues[name] = value
+        if change >= self._threshold:
+            self._index = max(0, self._index - 1)
+            self._countStable = 0
+        else:
+            self._countStable += 1
+            if self._countStable >= self._stableCount:
+                self._index = min(len(self._steps) - 1, self._index + 1)
+                self._countStable = 0
+        self.interval = self._steps[self._index]
+        return self.interval
@@ -0,0 +1,135 @@
+'''
+Created on 18.10.2026
+
+@author: wk
+'''
+import http.client
+import json
+import time
+import threading
+from SilentLog import SilentLog
+
+
+class ShellyClient (SilentLog):
+    '''Implements a HTTP client for one Shelly device.
+    The connection is kept alive between the requests. A broken connection is reopened transparently,
+    after a failed connect the next tries are delayed (exponential backoff).
+    The client can be used by more than one thread: the requests are serialized.
+    '''
+    # the errors of a kept alive connection closed by the device: only these lead to a second attempt
+    staleErrors = (http.client.RemoteDisconnected, BrokenPipeError, ConnectionResetError)
+
+    def __init__(self, domain: str, port: int, timeout: int, logger: SilentLog=None,
+                 backoffMin: float=1.0, backoffMax: float=60.0):
+        '''Constructor.
+        @param domain: the domain or the ip of the device
+        @param port: the port of the device's HTTP interface
+        @param timeout: the timeout of a request in seconds
+        @param logger: None or the error handler. None: the instance itself
+        @param backoffMin: the delay (in seconds) after the first failed connect
+        @param backoffMax: the delay is doubled with each failed connect until this limit
+        '''
+        SilentLog.__init__(self, 100, 100)
+        self.domain = domain
+        self.port = port
+        self.timeout = timeout
+        self._logger = self if logger is None else logger
+        self._backoffMin = backoffMin
+        self._backoffMax = backoffMax
+        self._backoff = 0.0
+        self._nextTry = 0.0
+        self._connection = None
+        self._lock = threading.Lock()
+        # the duration of the last successful request in seconds:
+        self.roundTrip = None
+        self.roundTripSum = 0.0
+        self.countRequests = 0
+        self.countSuccess = 0
+        self.countErrors = 0
+        self.countConnects = 0
+
+    def averageRoundTrip(self) -> float:
+        '''Returns the average duration of the successful requests.
+        @return: None: no successful request otherwise: the average round trip time in seconds
+        '''
+        rc = None if self.countSuccess == 0 else self.roundTripSum / self.countSuccess
+        return rc
+
+    def close(self):
+        '''Closes the connection (if open).
+        '''
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+
+    def _failed(self, message: str):
+        '''Handles a failed request: closes the connection and delays the next try.
+        @param message: the error message
+        '''
+        self.close()
+        self.countErrors += 1
+        self._backoff = self._backoffMin if self._backoff == 0 else min(
+            self._backoffMax, 2 * self._backoff)
+        self._nextTry = time.monotonic() + self._backoff
+        self._logger.error(
+            f'HTTP connection failed: {self.domain}:{self.port} {message} (next try in {self._backoff:.0f} sec)')
+
+    def request(self, path: str) -> bytes:
+        '''Requests a resource from the device.
+        @param path: the path of the request, e.g. "/rpc/Switch.GetStatus?id=0"
+        @return: None: error occurred otherwise: the response body
+        '''
+        rc = None
+        with self._lock:
+            if time.monotonic() < self._nextTry:
+                self._logger.error(f'{self.domain}:{self.port}: waiting for reconnect')
+                return rc
+            self.countRequests += 1
+            # a kept alive connection may be closed by the device: in this case we try once more
+            # (never after a timeout: a hanging device must not block for twice the timeout):
+            for attempt in range(2):
+                reused = self._connection is not None
+                if not reused:
+                    self._connection = http.client.HTTPConnection(
+                        self.domain, self.port, timeout=self.timeout)
+                    self.countConnects += 1
+                start = time.monotonic()
+                try:
+                    self._connection.request('GET', path, headers={'Connection': 'keep-alive'})
+                    response = self._connection.getresponse()
+                    data = response.read()
+                    if response.will_close:
+                        self.close()
+                    if response.status != 200:
+                        self.countErrors += 1
+                        self._logger.error(
+                            f'{self.domain}:{self.port}{path}: HTTP status {response.status}')
+                    else:
+                        self.roundTrip = time.monotonic() - start
+                        self.roundTripSum += self.roundTrip
+                        self.countSuccess += 1
+                        self._backoff = 0.0
+                        rc = data
+                    break
+                except (http.client.HTTPException, OSError) as exc:
+                    if reused and attempt == 0 and isinstance(exc, ShellyClient.staleErrors):
+                        self.close()
+                    else:
+                        self._failed(f'{path}: {exc}')
+                        break
+        return rc
+
+    def requestJson(self, path: str):
+        '''Requests a resource from the device and converts it from JSON.
+        @param path: the path of the request, e.g. "/rpc/Switch.GetStatus?id=0"
+        @return: None: error occurred otherwise: the decoded data
+        '''
+        rc = None
+        data = self.request(path)
+        if data is not None:
+            try:
+                rc = json.loads(data)
+            except ValueError as exc:
+                self.countErrors += 1
+                self._logger.error(f'{self.domain}:{self.port}{path}: invalid JSON: {exc}')
+        return rc
@@ -0,0 +1,162 @@
+'''
+Created on 18.10.2026
+
+@author: wk
+'''
+import http.server
+import json
+import copy
+from SilentLog import SilentLog
+
+
+class NotificationHandler(http.server.BaseHTTPRequestHandler):
+    '''Handles the HTTP requests of the listener: each POST request contains one JSON-RPC notification
+    (or a list of notifications).
+    '''
+    # the maximal length of a request body (a notification has less than 2 KiB):
+    maxLength = 65536
+
+    def do_POST(self):
+        '''Handles the POST method.
+        '''
+        listener = self.server.listener
+        try:
+            length = int(self.headers.get('content-length', 0))
+            if length < 0:
+                raise ValueError(f'invalid content-length: {length}')
+            if length > NotificationHandler.maxLength:
+                listener._logger.error(f'notification too large: {length} bytes')
+                self.close_connection = True
+                self.answer(413, b'{"error":"notification too large"}')
+                return
+            body = self.rfile.read(length)
+            data = json.loads(body)
+            messages = data if type(data) == list else [data]
+            for message in messages:
+                listener.handleMessage(message)
+            self.answer(200, b'{}')
+        except (ValueError, TypeError, AttributeError) as exc:
+            listener._logger.error(f'invalid notification: {exc}')
+            self.answer(400, b'{"error":"invalid notification"}')
+
+    def answer(self, status: int, content: bytes):
+        '''Sends the response.
+        @param status: the HTTP status
+        @param content: the response body
+        '''
+        self.send_response(status)
+        self.send_header('content-type', 'application/json')
+        self.send_header('content-length', str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def log_message(self, format, *args):
+        self.server.listener._logger.debug(format % args)
+
+
+class ShellyListener (SilentLog):
+    '''Receives the status notifications pushed by Shelly devices (Gen2: JSON-RPC "NotifyStatus"
+    and "NotifyFullStatus") via HTTP POST.
+    A notification contains only the changed values: the listener merges them into the last known
+    status of the device. If the status is complete it is delivered to the callback in the form
+    of the answer of "Switch.GetStatus".
+    '''
+    # the values needed to store an event:
+    neededKeys = (('apower',), ('voltage',), ('current',), ('aenergy', 'total'), ('temperature', 'tC'))
+
+    def __init__(self, interface: str, port: int, callback, logger: SilentLog=None, timeout: float=1.0):
+        '''Constructor.
+        @param interface: the network interface to listen, e.g. "0.0.0.0"
+        @param port: the port to listen
+        @param callback: a function called for each complete status: callback(src, status, timestamp)
+            src: the id of the device, e.g. "shellyplus1pm-a8032ab12345"
+            status: the status of the switch component, same format as the answer of Switch.GetStatus
+            timestamp: the time of the notification (seconds since the epoch)
+        @param logger: None or the error handler. None: the instance itself
+        @param timeout: the maximal time (seconds) handleRequest() waits for a request
+        '''
+        SilentLog.__init__(self, 100, 100)
+        self._callback = callback
+        self._logger = self if logger is None else logger
+        # (src, component) -> merged status
+        self._states = {}
+        self.countNotifications = 0
+        self.countEvents = 0
+        self._server = http.server.HTTPServer((interface, port), NotificationHandler)
+        self._server.listener = self
+        self._server.timeout = timeout
+
+    def address(self):
+        '''Returns the address of the listener.
+        @return: a tuple (interface, port)
+        '''
+        return self._server.server_address
+
+    def close(self):
+        '''Closes the server socket.
+        '''
+        self._server.server_close()
+
+    @staticmethod
+    def isComplete(status) -> bool:
+        '''Tests whether a status contains all values needed to store an event.
+        @param status: the status to test
+        @return: True: all needed values exist
+        '''
+        rc = True
+        for path in ShellyListener.neededKeys:
+            item = status
+            for key in path:
+                if type(item) != dict or key not in item:
+                    rc = False
+                    break
+                item = item[key]
+            if not rc:
+                break
+        return rc
+
+    def handleMessage(self, message) -> int:
+        '''Handles one JSON-RPC notification.
+        @param message: the decoded notification
+        @return: the count of the delivered events
+        '''
+        rc = 0
+        method = message.get('method')
+        if method in ('NotifyStatus', 'NotifyFullStatus'):
+            self.countNotifications += 1
+            src = message.get('src', '')
+            params = message.get('params', {})
+            timestamp = params.get('ts')
+            for component, values in params.items():
+                if component.startswith('switch:') and type(values) == dict:
+                    key = (src, component)
+                    if method == 'NotifyFullStatus' or key not in self._states:
+                        self._states[key] = {}
+                    status = self._states[key]
+                    ShellyListener.merge(status, values)
+                    if ShellyListener.isComplete(status):
+                        eventTime = timestamp if timestamp is not None else status['aenergy'].get('minute_ts')
+                        if eventTime is None:
+                            self._logger.error(f'{src}: notification without time')
+                        else:
+                            rc += 1
+                            self.countEvents += 1
+                            self._callback(src, copy.deepcopy(status), int(eventTime))
+        return rc
+
+    def handleRequest(self):
+        '''Waits for one request (or the timeout) and handles it.
+        '''
+        self._server.handle_request()
+
+    @staticmethod
+    def merge(target, source):
+        '''Merges a dictionary recursively into another.
+        @param target: IN/OUT: the dictionary to change
+        @param source: the values to merge
+        '''
+        for key, value in source.items():
+            if type(value) == dict and type(target.get(key)) == dict:
+                ShellyListener.merge(target[key], value)
+            else:
+                target[key] = copy.deepcopy(value)
@@ -0,0 +1,336 @@
+#! /usr/bin/python3
+'''
+Created on 18.10.2026
+
+@author: wk
+'''
+import http.server
+import sys
+import json
+import math
+import random
+import threading
+import time
+import concurrent.futures
+from SilentLog import SilentLog
+from ShellyClient import ShellyClient
+
+VERSION = '2026.10.18.00'
+
+
+class VirtualDevice:
+    '''Simulates the measurements of one Shelly device connected to a photovoltaic module.
+    The power follows the irradiance of a clear day, reduced by moving clouds and clipped by the inverter.
+    '''
+
+    def __init__(self, index: int, rng: random.Random, sunrise: float=6.0, sunset: float=20.0):
+        '''Constructor.
+        @param index: the number of the device
+        @param rng: the random generator (seeded: the simulation is repeatable)
+        @param sunrise: the hour of the sunrise (local time)
+        @param sunset: the hour of the sunset (local time)
+        '''
+        self.index = index
+        self._rng = rng
+        self._sunrise = sunrise
+        self._sunset = sunset
+        self.peak = rng.uniform(400, 800)
+        self.clipping = round(min(600.0, self.peak * rng.uniform(0.85, 1.0)), 1)
+        self.total = rng.uniform(0, 50000)
+        self._cloud = 1.0
+        self._lastTime = None
+        self.power = 0.0
+        self.voltage = 230.0
+        self.current = 0.0
+        self.temperature = 40.0
+        self.countResets = 0
+        self._lock = threading.Lock()
+
+    def irradiance(self, hour: float) -> float:
+        '''Returns the relative irradiance of a clear day.
+        @param hour: the local time in hours, e.g. 13.5
+        @return: a value in [0, 1]
+        '''
+        rc = 0.0
+        if hour > self._sunrise and hour < self._sunset:
+            rc = math.sin(math.pi * (hour - self._sunrise) / (self._sunset - self._sunrise)) ** 1.5
+        return rc
+
+    def update(self, now: float, resetRate: float=0.0):
+        '''Calculates the measurements at a given time.
+        @param now: the time of the measurement (seconds since the epoch)
+        @param resetRate: the probability of a counter reset (power loss of the device)
+        '''
+        with self._lock:
+            localTime = time.localtime(now)
+            hour = localTime.tm_hour + localTime.tm_min / 60.0 + localTime.tm_sec / 3600.0
+            # the clouds: a random walk between 0.15 (overcast) and 1.0 (clear sky)
+            self._cloud = min(1.0, max(0.15, self._cloud + self._rng.gauss(0, 0.08)))
+            power = self.peak * self.irradiance(hour) * self._cloud
+            self.power = round(min(self.clipping, power * self._rng.uniform(0.98, 1.02)), 1)
+            self.voltage = round(self._rng.uniform(225.0, 240.0), 1)
+            self.current = round(self.power / self.voltage, 3)
+            self.temperature = round(30.0 + self.power / 20.0 + self._rng.uniform(-1, 1), 1)
+            if self._lastTime is not None and now > self._lastTime:
+                self.total += self.power * (now - self._lastTime) / 3600.0
+            self._lastTime = now
+            if resetRate > 0 and self._rng.random() < resetRate:
+                self.total = 0.0
+                self.countResets += 1
+
+    def statusGen1(self, now: float):
+        '''Returns the status in the format of a Gen1 device ("/status").
+        @param now: the time of the measurement (seconds since the epoch)
+        @return: the status as dictionary
+        '''
+        return {'meters': [{'power': self.power, 'overpower': 0.0, 'is_valid': True, 'timestamp': int(now),
+                            'counters': [0.0, 0.0, 0.0], 'total': int(self.total * 60)}],
+                'temperature': self.temperature, 'overtemperature': False, 'uptime': int(now) % 86400}
+
+    def statusGen2(self, now: float):
+        '''Returns the status in the format of a Gen2 device ("/rpc/Switch.GetStatus?id=0").
+        @param now: the time of the measurement (seconds since the epoch)
+        @return: the status as dictionary
+        '''
+        return {'id': 0, 'source': 'init', 'output': True, 'apower': self.power, 'voltage': self.voltage,
+                'current': self.current,
+                'aenergy': {'total': round(self.total, 3), 'by_minute': [0.0, 0.0, 0.0], 'minute_ts': int(now) // 60 * 60},
+                'temperature': {'tC': self.temperature, 'tF': round(self.temperature * 1.8 + 32, 1)}}
+
+
+class DeviceHandler(http.server.BaseHTTPRequestHandler):
+    '''Answers the HTTP requests of one virtual device.
+    '''
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        '''Handles the GET method.
+        '''
+        simulator = self.server.simulator
+        device = self.server.device
+        simulator.countRequests += 1
+        delay = simulator._rng.uniform(simulator.latencyMin, simulator.latencyMax)
+        fault = simulator._rng.random()
+        if fault < simulator.timeoutRate:
+            # a hanging device: the client should run into its timeout
+            time.sleep(simulator.timeoutDelay)
+        elif delay > 0:
+            time.sleep(delay)
+        now = simulator.clock()
+        device.update(now, simulator.resetRate)
+        if fault >= simulator.timeoutRate and fault < simulator.timeoutRate + simulator.errorRate:
+            self.answer(500, b'{"code":-1,"message":"simulated error"}')
+        elif self.path.startswith('/rpc/Switch.GetStatus'):
+            self.answer(200, json.dumps(device.statusGen2(now)).encode('utf-8'))
+        elif self.path.startswith('/status'):
+            self.answer(200, json.dumps(device.statusGen1(now)).encode('utf-8'))
+        else:
+            self.answer(404, b'{"code":404,"message":"not found"}')
+
+    def answer(self, status: int, content: bytes):
+        '''Sends the response.
+        @param status: the HTTP status
+        @param content: the response body
+        '''
+        try:
+            self.send_response(status)
+            self.send_header('content-type', 'application/json')
+            self.send_header('content-length', str(len(content)))
+            self.end_headers()
+            self.wfile.write(content)
+        except OSError:
+            # the client has closed the connection (timeout)
+            pass
+
+    def log_message(self, format, *args):
+        pass
+
+
+class Simulator (SilentLog):
+    '''Simulates many Shelly devices on localhost: each device is served on its own port.
+    '''
+
+    def __init__(self, countDevices: int, basePort: int=0, seed: int=4711, interface: str='127.0.0.1'):
+        '''Constructor.
+        @param countDevices: the count of the virtual devices
+        @param basePort: the port of the first device, the others follow. 0: free ports chosen by the system
+        @param seed: the start value of the random generator: the simulation is repeatable
+        @param interface: the network interface of the servers
+        '''
+        SilentLog.__init__(self, 100, 100)
+        self._rng = random.Random(seed)
+        self._interface = interface
+        self._basePort = basePort
+        self.devices = [VirtualDevice(ix, random.Random(seed + ix + 1)) for ix in range(countDevices)]
+        self.ports = []
+        self._servers = []
+        self._threads = []
+        self.latencyMin = 0.0
+        self.latencyMax = 0.0
+        self.errorRate = 0.0
+        self.timeoutRate = 0.0
+        self.timeoutDelay = 30.0
+        self.resetRate = 0.0
+        self.timeOffset = 0.0
+        self.countRequests = 0
+
+    def clock(self) -> float:
+        '''Returns the simulated time.
+        @return: the seconds since the epoch
+        '''
+        return time.time() + self.timeOffset
+
+    def start(self):
+        '''Starts one server for each device.
+        '''
+        for device in self.devices:
+            port = 0 if self._basePort == 0 else self._basePort + device.index
+            server = http.server.ThreadingHTTPServer((self._interface, port), DeviceHandler)
+            server.daemon_threads = True
+            server.simulator = self
+            server.device = device
+            thread = threading.Thread(target=server.serve_forever, daemon=True)
+            thread.start()
+            self._servers.append(server)
+            self._threads.append(thread)
+            self.ports.append(server.server_address[1])
+        self.log(f'{len(self.devices)} device(s) on {self._interface}:{self.ports[0]}..{self.ports[-1]}')
+
+    def stop(self):
+        '''Stops all servers.
+        '''
+        for server in self._servers:
+            server.shutdown()
+            server.server_close()
+        self._servers = []
+        self._threads = []
+        self.ports = []
+
+    def monitorConfiguration(self, path: str='/rpc/Switch.GetStatus?id=0') -> str:
+        '''Returns the part of the SunMon configuration polling the virtual devices.
+        @param path: the request path
+        @return: the configuration lines
+        '''
+        names = ' '.join(map(lambda device: f'sim{device.index}', self.devices))
+        rc = f'net.path={path}\nnet.devices={names}\n'
+        for ix, device in enumerate(self.devices):
+            port = self.ports[ix] if ix < len(self.ports) else self._basePort + ix
+            rc += f'device.sim{device.index}.domain={self._interface}\ndevice.sim{device.index}.port={port}\n'
+        return rc
+
+
+def percentile(values, percent: float) -> float:
+    '''Returns a percentile of a list of values.
+    @param values: the sorted values
+    @param percent: the percentile, e.g. 95
+    @return: the value at the percentile
+    '''
+    rc = 0.0
+    if len(values) > 0:
+        rc = values[min(len(values) - 1, int(len(values) * percent / 100.0))]
+    return rc
+
+
+def benchmark(simulator: Simulator, rounds: int, threads: int, path: str='/rpc/Switch.GetStatus?id=0', timeout: int=10):
+    '''Polls all virtual devices concurrently (like the monitor does) and reports throughput and latency.
+    @param simulator: the running simulator
+    @param rounds: the count of polls of each device
+    @param threads: the count of concurrent requests
+    @param path: the request path
+    @param timeout: the timeout of one request in seconds
+    @return: a tuple (countRequests, countErrors, seconds, sortedRoundTrips)
+    '''
+    logger = SilentLog(100, 100)
+    logger.printErrors = False
+    clients = [ShellyClient(simulator._interface, port, timeout, logger, 0.0, 0.0) for port in simulator.ports]
+    roundTrips = []
+    countErrors = 0
+
+    def poll(client: ShellyClient):
+        data = client.requestJson(path)
+        return None if data is None else client.roundTrip
+    start = time.monotonic()
+    with concurrent.futures.ThreadPoolExecutor(max_workers=threads) as pool:
+        for ix in range(rounds):
+            for roundTrip in pool.map(poll, clients):
+                if roundTrip is None:
+                    countErrors += 1
+                else:
+                    roundTrips.append(roundTrip)
+    duration = time.monotonic() - start
+    for client in clients:
+        client.close()
+    return (rounds * len(clients), countErrors, duration, sorted(roundTrips))
+
+
+def usage():
+    print('''Usage: ShellySim.py MODE [OPTIONS]
+MODE:
+  serve: simulates the devices until Ctrl-C
+  config: prints the SunMon configuration of the virtual devices
+  bench: polls the virtual devices and prints throughput and latency
+OPTIONS:
+  --devices=COUNT     count of virtual devices, default: 10
+  --port=PORT         the port of the first device, default: 8100
+  --seed=NUMBER       start value of the random generator, default: 4711
+  --latency=MIN,MAX   the response delay in milliseconds, default: 0,0
+  --errors=RATE       probability of a HTTP error, e.g. 0.01
+  --timeouts=RATE     probability of a hanging request, e.g. 0.01
+  --resets=RATE       probability of a counter reset, e.g. 0.001
+  --time-offset=HOURS the simulated time is shifted, e.g. to simulate noon at night
+  --rounds=COUNT      bench: count of polls of each device, default: 10
+  --threads=COUNT     bench: count of concurrent requests, default: 8
+  --gen1              config, bench: uses the Gen1 path "/status"''')
+
+
+def main(argv):
+    mode = 'serve' if len(argv) == 0 else argv[0]
+    options = {'devices': '10', 'port': '8100', 'seed': '4711', 'latency': '0,0', 'errors': '0', 'timeouts': '0',
+               'resets': '0', 'time-offset': '0', 'rounds': '10', 'threads': '8'}
+    path = '/rpc/Switch.GetStatus?id=0'
+    for arg in argv[1:]:
+        if arg == '--gen1':
+            path = '/status'
+        elif arg.startswith('--') and arg.find('=') > 0 and arg[2:arg.find('=')] in options:
+            options[arg[2:arg.find('=')]] = arg[arg.find('=') + 1:]
+        else:
+            print(f'+++ unknown option: {arg}')
+            usage()
+            return
+    if mode not in ('serve', 'config', 'bench'):
+        print(f'+++ unknown mode: {mode}')
+        usage()
+        return
+    latency = options['latency'].split(',')
+    simulator = Simulator(int(options['devices']), 0 if mode == 'bench' else int(options['port']),
+                          int(options['seed']))
+    simulator.latencyMin = int(latency[0]) / 1000.0
+    simulator.latencyMax = int(latency[-1]) / 1000.0
+    simulator.errorRate = float(options['errors'])
+    simulator.timeoutRate = float(options['timeouts'])
+    simulator.resetRate = float(options['resets'])
+    simulator.timeOffset = float(options['time-offset']) * 3600
+    if mode == 'config':
+        print(simulator.monitorConfiguration(path))
+    elif mode == 'serve':
+        print(f'ShellySim {VERSION}')
+        simulator.start()
+        try:
+            while True:
+                time.sleep(60)
+                simulator.log(f'requests: {simulator.countRequests}')
+        except KeyboardInterrupt:
+            pass
+        simulator.stop()
+    else:
+        simulator.start()
+        count, errors, duration, roundTrips = benchmark(
+            simulator, int(options['rounds']), int(options['threads']), path)
+        simulator.stop()
+        print(f'requests: {count} errors: {errors} duration: {duration:.3f} sec throughput: {count / duration:.1f}/sec')
+        print(f'round trip (ms): p50: {percentile(roundTrips, 50) * 1000:.1f} p95: {percentile(roundTrips, 95) * 1000:.1f}'
+              + f' p99: {percentile(roundTrips, 99) * 1000:.1f} max: {percentile(roundTrips, 100) * 1000:.1f}')
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -10,6 +10,7 @@ import os.path
 import json
 from SilentLog import SilentLog
 from Configuration import Configuration
+from ShellyClient import ShellyClient
 
 VERSION = '2022.08.18'
 
@@ -32,6 +33,8 @@ class Service(SilentLog):
         self.serverInterface = '0.0.0.0'
         self.serverPort = 8080
         self.clientTimeout = 10
+        # the HTTP client of the device: may be shared with other components
+        self.client = None
         if len(argv) > 0 and argv[0].startswith('--config='):
             self._configFile = argv[0][9:]
             argv = argv[1:]
@@ -109,25 +112,21 @@ WantedBy=multi-user.target
         @param verbose: True: print the results
         @return: the JSON data of the current status.
         '''
-        rc = None
-        connection = http.client.HTTPConnection(
-            self.clientIp, self.clientPort, self.clientTimeout)
-        try:
-            connection.request("GET", self._requestPath)
-            response = connection.getresponse()
-            stringData = response.read()
-            rc = stringData
-            data = json.loads(stringData)
-            if verbose:
+        if self.client is None:
+            self.client = ShellyClient(
+                self.clientIp, self.clientPort, self.clientTimeout, self)
+        rc = self.client.request(self._requestPath)
+        if rc is not None and verbose:
+            try:
+                data = json.loads(rc)
                 print('time: {}'.format(data['aenergy']['minute_ts']))
                 for key in ('apower', 'voltage', 'current'):
                     print("{}: {}".format(key, data[key]))
                 print('total: {}'.format(data['aenergy']['total']))
                 print('temperature: {}'.format(data['temperature']['tC']))
-        except:
-            self.error(
-                f'HTTP connection failed: {self.clientIp}:{self.clientPort}{self._requestPath}')
-        connection.close()
+                print(f'round trip: {self.client.roundTrip:.3f} sec')
+            except (ValueError, KeyError, TypeError) as exc:
+                self.error(f'unexpected status data: {exc}')
         return rc
 
 
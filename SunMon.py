@@ -9,6 +9,7 @@ Created on 26.07.2022
 @author: Hamatoma
 '''
 import http.client
+import concurrent.futures
 import sys
 import os.path
 import json
@@ -16,8 +17,23 @@ import datetime
 import re
 import time
 import math
+import itertools
+import signal
 from MyDb import MyDb
 from Configuration import Configuration
+from ShellyClient import ShellyClient
+from Scheduler import Scheduler, AdaptiveInterval
+from ShellyListener import ShellyListener
+from EventImport import EventReader
+from Rollup import Rollup
+from Retention import Retention
+from Archive import Archive
+from Journal import Journal
+try:
+    from VectorStatistics import VectorStatistics
+except ImportError:
+    # NumPy is optional: the statistics are calculated row by row
+    VectorStatistics = None
 
 VERSION = '2023.03.28.00'
 
@@ -32,9 +48,11 @@ def sunriseDistance(latitude: float, date=None):
     if date is None:
         date = datetime.datetime.now().date()
     def rad(x): return x*3.141592/180.0
-    dayNo = int(datetime.datetime.now().date().strftime('%j'))
+    dayNo = int(date.strftime('%j'))
     # | (1/15)*arccos[-tan(L)*tan(23.44*sin(360(D+284)/365))] |.
-    rc =  abs((1/15)*math.acos(-math.tan(rad(latitude))*math.tan(rad(23.44*math.sin(rad(360*(dayNo+284)/365))))))
+    value = -math.tan(rad(latitude))*math.tan(rad(23.44*math.sin(rad(360*(dayNo+284)/365))))
+    # polar day (value < -1): 12 hours, polar night (value > 1): 0 hours
+    rc = abs((1/15)*math.degrees(math.acos(max(-1.0, min(1.0, value)))))
     return rc
 
 class Statistics:
@@ -178,10 +196,121 @@ class Statistics:
         return rc
 
 
+class DayStatistics:
+    '''Maintains the statistics of one day incrementally: the events are added in chronological order.
+    '''
+
+    def __init__(self, eventTime: datetime.datetime, total: float):
+        '''Constructor.
+        @param eventTime: the time of the first event of the day
+        @param total: the energy counter of the first event
+        '''
+        self.day = eventTime.strftime('%Y-%m-%d')
+        self.statistics = Statistics([(eventTime, total)])
+        self.lastTime = eventTime
+        self.countEvents = 0
+        self._checkTimeRange = True
+        self._dayEnergy = 0.0
+        self._minTotal = self._lastTotal = float(total)
+
+    def add(self, eventTime: datetime.datetime, total: float, aPower: float):
+        '''Adds one event to the statistics.
+        @param eventTime: the time of the measurement
+        @param total: the energy counter of the measurement
+        @param aPower: the power of the measurement
+        '''
+        total = float(total)
+        if total < self._lastTotal:
+            # the counter has been reset:
+            self._dayEnergy += self._lastTotal - self._minTotal
+            self._minTotal = 0.0
+        self._lastTotal = total
+        self.lastTime = eventTime
+        self.countEvents += 1
+        timestamp = eventTime.timestamp()
+        self.statistics.populate(timestamp, total, float(aPower))
+        if self._checkTimeRange and not self.statistics.populateTimeRange(total, timestamp):
+            self._checkTimeRange = False
+        self.statistics.populateLastTotal(total)
+
+    def finish(self) -> Statistics:
+        '''Completes the statistics with the data collected so far. More events may be added later.
+        @return: the statistics of the day
+        '''
+        self.statistics.populateFinish([(self.lastTime, self._lastTotal)],
+                                       self._dayEnergy + (self._lastTotal - self._minTotal))
+        return self.statistics
+
+
+class Device:
+    '''Stores the connection data of one Shelly device.
+    '''
+
+    def __init__(self, name: str, domain: str, port: int, requestPath: str, timeout: int, logger: SilentLog=None):
+        '''Constructor.
+        @param name: the name of the device: stored in each event as tag
+        @param domain: the domain or the ip of the device
+        @param port: the port of the device's HTTP interface
+        @param requestPath: the path of the status request
+        @param timeout: the timeout of a request in seconds
+        @param logger: None or the error handler of the HTTP client
+        '''
+        self.name = name
+        self.domain = domain
+        self.port = port
+        self.requestPath = requestPath
+        self.timeout = timeout
+        # the connection is kept alive between the polls:
+        self.client = ShellyClient(domain, port, timeout, logger)
+        # None or the id of the device in pushed notifications, e.g. "shellyplus1pm-a8032ab12345"
+        self.src = None
+        # True: a request is running
+        self.busy = False
+
+
+class Run:
+    '''Stores the state of a sequence of (nearly) unchanged measurements of one device.
+    Only the first and the last measurement of a run are stored.
+    '''
+
+    def __init__(self, eventTime: int, total: float, power: float):
+        '''Constructor.
+        @param eventTime: the timestamp of the first measurement of the run
+        @param total: the energy counter of the first measurement
+        @param power: the power of the first measurement
+        '''
+        self.startTime = eventTime
+        self.power = power
+        self.lastTotal = total
+        # None or the row of the last (not stored) measurement of the run
+        self.pending = None
+
+
 class Monitor (MyDb):
     '''Implements a monitor for a fotovoltaic device:
     Polls the device for status data and store them into a database.
     '''
+    sqlInsertEvent = ('INSERT INTO events (event_time, event_total, event_apower, event_voltage, event_current, event_temperature, event_device, created, createdby)'
+                      + ' VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s);')
+    sqlInsertDay = '''INSERT INTO days
+  (day_date, day_totalmin, day_totalmax, day_energy,
+  day_hour8, day_hour9, day_hour10, day_hour11, day_hour12, day_hour13, day_hour14, day_hour15, day_hour16, day_hour17, day_hour18, day_hourRest, 
+  day_energy10, day_energy25, day_energy50, day_energy100, day_energy200, day_energy300, day_energy400, day_energy500, day_energy590, 
+  created, createdby) 
+  VALUES(%s, %s, %s, %s, 
+  %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s,
+  %s, %s, %s, %s, %s, %s, %s, %s, %s,
+  %s, %s)
+  ON DUPLICATE KEY UPDATE
+  day_totalmin=VALUES(day_totalmin), day_totalmax=VALUES(day_totalmax), day_energy=VALUES(day_energy),
+  day_hour8=VALUES(day_hour8), day_hour9=VALUES(day_hour9), day_hour10=VALUES(day_hour10),
+  day_hour11=VALUES(day_hour11), day_hour12=VALUES(day_hour12), day_hour13=VALUES(day_hour13),
+  day_hour14=VALUES(day_hour14), day_hour15=VALUES(day_hour15), day_hour16=VALUES(day_hour16),
+  day_hour17=VALUES(day_hour17), day_hour18=VALUES(day_hour18), day_hourRest=VALUES(day_hourRest),
+  day_energy10=VALUES(day_energy10), day_energy25=VALUES(day_energy25), day_energy50=VALUES(day_energy50),
+  day_energy100=VALUES(day_energy100), day_energy200=VALUES(day_energy200), day_energy300=VALUES(day_energy300),
+  day_energy400=VALUES(day_energy400), day_energy500=VALUES(day_energy500), day_energy590=VALUES(day_energy590),
+  created=VALUES(created), createdby=VALUES(createdby)'''
 
     def __init__(self):
         '''Constructor.
@@ -197,6 +326,71 @@ class Monitor (MyDb):
         self._from = 5
         self._til = 20
         self._dataStart = datetime.date(2022, 6, 27)
+        # the name of the device summarized in the table "days". None: all events
+        self._dataDevice = None
+        self._devices = []
+        # the ids of the ignored notifications (see deviceBySource()):
+        self._unknownSources = set()
+        self._threads = 8
+        self._pool = None
+        # the events are stored in groups: if the count or the age (in seconds) of the buffered events reaches the limit
+        self._batchSize = 1
+        self._batchAge = 60
+        # the events of a failed INSERT stay in the buffer: at most this count (the oldest are dropped)
+        self._bufferMax = 10000
+        self._flushRetry = 0.0
+        self._events = []
+        self._eventsSince = None
+        # daemon/listen: the events are written into a local journal first, a background thread stores them
+        # into the database. '': no journal
+        self._journalFile = ''
+        self._journalDays = 7
+        self._journalSync = False
+        self._journal = None
+        # change suppression: power changes inside the deadband (W) are not stored, but at least every "gap" seconds
+        self._deadband = 0.0
+        self._deadbandGap = 900
+        # the current run of each device: name -> Run
+        self._runs = {}
+        # adaptive mode: the interval depends on the power changes, the time range on the sunrise
+        self._adaptive = False
+        self._intervalMin = 10
+        self._intervalMax = 300
+        self._adaptiveThreshold = 20
+        self._latitude = 47.811
+        self._noon = 12.5
+        self._windowMargin = 0.5
+        # the power of the last poll per device: name -> power
+        self._lastPowers = {}
+        # listen mode: the status is pushed by the devices
+        self._listenInterface = '0.0.0.0'
+        self._listenPort = 8082
+        # the live statistics of the current day: updated on each event, stored every "interval" seconds
+        self._liveInterval = 300
+        self._liveDay = None
+        self._liveStored = 0
+        self._live = False
+        # the days with new events are recomputed every ... seconds (daemon, listen). 0: only by update-days --dirty
+        self._dirtyInterval = 3600
+        self._dirtyChecked = time.time()
+        # the query statistics (db.stats) are logged every ... seconds (daemon, listen). 0: only at the end
+        self._statsInterval = 3600
+        self._statsDumped = time.time()
+        # maintain: the events older than ... days are removed (0: never), the table events is partitioned by month
+        self._retentionDays = 0
+        self._partitioned = True
+        self._monthsAhead = 2
+        # the events are summarized in the rollup tables (5 minutes, 1 hour)
+        self._useRollup = True
+        self._rollup = None
+        # the stored events not summarized in the rollup tables yet: the tables are updated every ingest.batch.age seconds
+        self._rollupEvents = []
+        self._rollupSince = 0.0
+        # the closed months are archived in compressed files in this directory (mode archive). '': no archive
+        self._archiveDir = ''
+        self._archive = None
+        # the statistics of many days are calculated with NumPy (if available)
+        self._vectorized = VectorStatistics is not None
         self._regExprChange = re.compile(r'insert|update', re.I)
 
     def config(self, configFile: str=None):
@@ -216,21 +410,93 @@ class Monitor (MyDb):
             self._from = config.asInt('service.from', self._from)
             self._til = config.asInt('service.til', self._til)
             self._dataStart = config.asDate('data.start', self._dataStart)
+            self._threads = config.asInt('net.threads', self._threads)
+            self._batchSize = max(1, config.asInt('ingest.batch.size', self._batchSize))
+            self._batchAge = config.asInt('ingest.batch.age', self._batchAge)
+            self._bufferMax = max(1, config.asInt('ingest.buffer.max', self._bufferMax))
+            self._deadband = config.asFloat('ingest.deadband', self._deadband)
+            self._deadbandGap = config.asInt('ingest.deadband.gap', self._deadbandGap)
+            self._adaptive = config.asBool('service.adaptive', self._adaptive)
+            self._intervalMin = config.asInt('service.interval.min', self._intervalMin)
+            self._intervalMax = config.asInt('service.interval.max', self._intervalMax)
+            self._adaptiveThreshold = config.asFloat('service.adaptive.threshold', self._adaptiveThreshold)
+            self._latitude = config.asFloat('location.latitude', self._latitude)
+            self._noon = config.asFloat('location.noon', self._noon)
+            self._windowMargin = config.asFloat('service.adaptive.margin', self._windowMargin)
+            self._listenInterface = config.asString('listen.interface', self._listenInterface)
+            self._listenPort = config.asInt('listen.port', self._listenPort)
+            self._liveInterval = config.asInt('ingest.days.interval', self._liveInterval)
+            self._vectorized = config.asBool('data.vectorized', self._vectorized) and VectorStatistics is not None
+            self._useRollup = config.asBool('data.rollup', self._useRollup)
+            self._dirtyInterval = config.asInt('ingest.dirty.interval', self._dirtyInterval)
+            self._statsInterval = config.asInt('db.stats.interval', self._statsInterval)
+            self._retentionDays = config.asInt('retention.days', self._retentionDays)
+            self._partitioned = config.asBool('retention.partitioned', self._partitioned)
+            self._monthsAhead = config.asInt('retention.months.ahead', self._monthsAhead)
+            self._archiveDir = config.asString('archive.dir', self._archiveDir)
+            self._journalFile = config.asString('journal.file', self._journalFile)
+            self._journalDays = config.asInt('journal.days', self._journalDays)
+            self._journalSync = config.asBool('journal.sync', self._journalSync)
+            self.configDevices(config)
+            self._dataDevice = config.asString('data.device', '') or None
+            if self._dataDevice is None and len(self._devices) > 1:
+                # the energy counters of different devices must not be mixed in the statistics:
+                self._dataDevice = self._devices[0].name
             self.dbConfig(config)
 
+    def configDevices(self, config: Configuration):
+        '''Builds the list of the polled devices from the configuration.
+        Without "net.devices" there is only one device given by the "net.*" variables.
+        @param config: the configuration manager
+        '''
+        self._devices = []
+        if not config.hasKey('net.devices'):
+            self._devices.append(Device(config.asString('net.name', 'main'), self._domain, self._port,
+                                        self._requestPath, self._timeout, self))
+            self._devices[0].src = config.asString('net.src', '') or None
+        else:
+            for name in config.asString('net.devices').replace(',', ' ').split():
+                prefix = f'device.{name}.'
+                if not config.hasKey(prefix + 'domain'):
+                    self.error(f'missing {prefix}domain')
+                else:
+                    self._devices.append(Device(name, config.asString(prefix + 'domain'),
+                                                config.asInt(prefix + 'port', self._port),
+                                                config.asString(prefix + 'path', self._requestPath),
+                                                config.asInt(prefix + 'timeout', self._timeout), self))
+                    self._devices[-1].src = config.asString(prefix + 'src', '') or None
+
     def createTableIfNotExists(self):
-        '''Tests whether the needed tables exist in the database. If not that will be created.
-        '''
-        records = self.dbSelect('show tables;')
-        foundEvents = False
-        foundDays = False
-        for record in records:
-            if record[0] == 'events':
-                foundEvents = True
-            elif record[0] == 'days':
-                foundDays = True
-        if not foundEvents:
-            self.dbExecute('''create table events (
+        '''Creates the needed tables or upgrades them to the current schema version (see migrations()).
+        '''
+        self.dbMigrate(self.migrations())
+
+    def migrations(self):
+        '''Returns the migrations of the database schema.
+        Each migration must be executable on installations which have been upgraded before
+        the migrations had been introduced.
+        @return: a list of tuples (version, description, action): see MyDb.dbMigrate()
+        '''
+        rc = [
+            (1, 'tables events and days', self.migrateBaseTables),
+            (2, 'column events.event_device', self.migrateEventDevice),
+            (3, 'unique index days.day_date', self.migrateDayDate),
+            (4, 'table dirty_days', '''create table if not exists dirty_days (
+  dirty_date date PRIMARY KEY,
+  dirty_changed datetime
+);'''),
+            (5, 'rollup tables', lambda: self.rollup().createTables(self.dbTables())),
+            (6, 'index events.event_time',
+             lambda: self.addIndexIfNotExists('events', 'event_time', 'INDEX event_time (event_time)')),
+            (7, 'index days.day_energy',
+             lambda: self.addIndexIfNotExists('days', 'day_energy', 'INDEX day_energy (day_energy)'))
+        ]
+        return rc
+
+    def migrateBaseTables(self):
+        '''Creates the tables "events" and "days" (first version of the schema).
+        '''
+        self.dbExecute('''create table if not exists events (
   event_id int PRIMARY KEY AUTO_INCREMENT,
   event_time datetime,
   event_apower float,
@@ -241,8 +507,7 @@ class Monitor (MyDb):
   created timestamp null,
   createdby varchar(32)
 );''')
-        if not foundDays:
-            self.dbExecute('''create table days (
+        self.dbExecute('''create table if not exists days (
   day_id int PRIMARY KEY AUTO_INCREMENT,
   day_date date,
   day_totalmin float,
@@ -273,6 +538,24 @@ class Monitor (MyDb):
   createdby varchar(32)
 );''')
 
+    def migrateDayDate(self):
+        '''Creates the unique index of days.day_date.
+        '''
+        if not self.dbHasIndex('days', 'day_date'):
+            # duplicates would prevent the unique index: the newest row of a day is kept
+            # (the derived table is needed by MySQL: it cannot read the table it deletes from)
+            self.dbExecute('''DELETE FROM days WHERE day_date IS NOT NULL AND day_id NOT IN
+  (SELECT day_id FROM (SELECT MAX(day_id) AS day_id FROM days GROUP BY day_date) AS newest);''')
+            self.addIndexIfNotExists('days', 'day_date', 'UNIQUE INDEX day_date (day_date)')
+
+    def migrateEventDevice(self):
+        '''Adds the column events.event_device.
+        '''
+        if self.addColumnIfNotExists('events', 'event_device', 'varchar(32)') and len(self._devices) > 0:
+            # the existing events are assigned to the first device:
+            self.dbExecute('UPDATE events SET event_device=%s WHERE event_device IS NULL;',
+                           (self._devices[0].name,))
+
     def daemon(self, argv):
         '''Starts a never ending HTTP server process.
         @param argv: the command line arguments
@@ -283,14 +566,41 @@ class Monitor (MyDb):
         self.printMessages = self.verbose
         if self.verbose:
             print("verbose mode")
-        while True:
-            date = datetime.datetime.now()
-            hour = int(date.strftime('%H'))
-            if hour >= self._from and hour <= self._til:
-                self.status()
-            elif self.verbose:
-                self.debug("status ignored because of the time range")
-            time.sleep(self._wait)
+        # SIGTERM (systemctl stop) should flush the buffered events:
+        signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+        adaptive = None
+        if self._adaptive:
+            adaptive = AdaptiveInterval(self._intervalMin, self._intervalMax, self._adaptiveThreshold)
+            print(f'adaptive mode: interval {self._intervalMin}..{self._intervalMax} sec')
+        scheduler = Scheduler(self._wait if adaptive is None else adaptive.interval)
+        try:
+            self.startJournal()
+            self.startLiveDay()
+            while True:
+                skipped = scheduler.countSkipped
+                lateness = scheduler.wait()
+                if scheduler.countSkipped > skipped:
+                    self.log(f'{scheduler.countSkipped - skipped} tick(s) skipped, delay: {lateness:.3f} sec')
+                else:
+                    self.debug(f'tick {scheduler.countTicks} delay: {lateness:.3f} sec')
+                if self.isInTimeRange(datetime.datetime.now()):
+                    # below one minute the minute timestamp of the device is not unique: the tick time is used
+                    self.status(round(scheduler.tickTime) if scheduler.interval < 60 else None)
+                    if adaptive is not None:
+                        scheduler.setInterval(adaptive.update(self._lastPowers))
+                else:
+                    if self.verbose:
+                        self.debug("status ignored because of the time range")
+                    if adaptive is not None:
+                        scheduler.setInterval(adaptive.maximum())
+                self.flushEvents(False)
+                self.checkDirtyDays()
+                self.checkStats()
+        finally:
+            self.flushEvents()
+            self.stopJournal()
+            self.storeLiveDay()
+            self.dumpStats()
 
     def example(self):
         '''Creates an example configuration file. 
@@ -302,6 +612,77 @@ net.port=80
 net.timeout=10
 net.path=/rpc/Switch.GetStatus?id=0
 #net.path=/status
+# more than one device: the net.* values are the defaults of the device.<name>.* values
+#net.devices=roof garage
+#device.roof.domain=192.168.2.44
+#device.garage.domain=192.168.2.45
+#device.garage.port=80
+#net.threads=8
+# adaptive mode: the interval depends on the power changes, the time range on the sunrise
+#service.adaptive=true
+#service.interval.min=10
+#service.interval.max=300
+# a power change (W) greater than this value reduces the interval:
+#service.adaptive.threshold=20
+# the hours polled before sunrise and after sunset:
+#service.adaptive.margin=0.5
+#location.latitude=47.811
+# the local noon (standard time), e.g. 12.5 means 12:30:
+#location.noon=12.5
+# mode "listen": the devices push their status (JSON-RPC NotifyStatus via HTTP POST)
+#listen.interface=0.0.0.0
+#listen.port=8082
+# the id of the device in the notifications (notifications of unknown ids are ignored):
+#device.roof.src=shellyplus1pm-a8032ab12345
+# the events are stored in groups of (at most) this size:
+#ingest.batch.size=1
+# the maximum age (in seconds) of a buffered event:
+#ingest.batch.age=60
+# the events of a failed INSERT are kept for the next try, but at most this count:
+#ingest.buffer.max=10000
+# power changes (W) inside this range are not stored (only the first and the last value of each run):
+#ingest.deadband=0
+# the maximum time (seconds) between two stored values of a run:
+#ingest.deadband.gap=900
+# daemon/listen: the events are written into this local journal first and stored into the database by a background
+# thread (no loss if the database is not available):
+#journal.file=/opt/sunmonitor/journal.dat
+# the stored events of the last ... days stay in the journal:
+#journal.days=7
+# each event is flushed to the disk:
+#journal.sync=false
+# daemon/listen: the statistics of today (table "days") are stored every ... seconds. 0: only by update-days
+#ingest.days.interval=300
+# daemon/listen: the past days with new events (e.g. delayed notifications) are recomputed every ... seconds:
+#ingest.dirty.interval=3600
+# update-days: the statistics are calculated with NumPy (if installed):
+#data.vectorized=true
+# the events are summarized in the tables events_5m and events_1h (for the charts of long intervals),
+# daemon/listen: the tables are updated every ingest.batch.age seconds:
+#data.rollup=true
+# maintain: the events older than ... days are removed if they are summarized in days and the rollup tables
+# and stored in the archive (see archive.dir) (0: never):
+#retention.days=0
+# maintain: the table events is partitioned by month (old events are removed by dropping partitions):
+#retention.partitioned=true
+# the count of partitions created in advance:
+#retention.months.ahead=2
+# mode "archive": the closed months are stored in compressed files (read by charts and statistics instead of the events):
+#archive.dir=/opt/sunmonitor/archive
+# the device summarized in the table "days" (default: the first of net.devices):
+#data.device=roof
+# the count of database connections usable concurrently (0: one shared connection):
+#db.pool.size=0
+# the count of statements kept prepared per database connection (0: none):
+#db.statement.cache=64
+# the query statistics are logged every db.stats.interval seconds and at the end, queries slower than db.slow.ms are logged:
+#db.stats=false
+#db.stats.interval=3600
+#db.slow.ms=0
+# the database: mysql or sqlite (embedded, no database server needed):
+#db.driver=mysql
+# the database file if db.driver=sqlite:
+#db.file=/opt/sunmonitor/appsunmonitor.sqlite
 db.name=appsunmonitor
 db.user=sun
 db.code=sun4sun
@@ -323,11 +704,100 @@ data.start=2022-06-27
         @param table: the table's name
         @return: True: there are data in this table
         '''
-        sql = f'SELECT count(*) from {table};'
+        sql = f'SELECT 1 from {table} LIMIT 1;'
         rows = self.dbSelect(sql)
-        rc = rows[0][0] > 0
+        rc = len(rows) > 0
+        return rc
+
+    def isInTimeRange(self, now: datetime.datetime) -> bool:
+        '''Tests whether the devices should be polled at a given time.
+        In adaptive mode the time range is calculated from the sunrise, otherwise given by the configuration.
+        @param now: the time to test
+        @return: True: the devices should be polled
+        '''
+        if not self._adaptive:
+            rc = now.hour >= self._from and now.hour <= self._til
+        else:
+            noon = self._noon + (1 if time.localtime(now.timestamp()).tm_isdst > 0 else 0)
+            hour = now.hour + now.minute / 60.0 + now.second / 3600.0
+            rc = abs(hour - noon) <= sunriseDistance(self._latitude, now.date()) + self._windowMargin
         return rc
 
+    def deviceBySource(self, src: str) -> Device:
+        '''Returns the device sending notifications with a given id.
+        Only configured devices are accepted: a device without configured id is used only if it is the only one.
+        @param src: the id of the device in the notifications, e.g. "shellyplus1pm-a8032ab12345"
+        @return: None (unknown id) or the configured device with this id
+        '''
+        rc = None
+        for device in self._devices:
+            if device.src == src:
+                rc = device
+                break
+        if rc is None and len(self._devices) == 1 and self._devices[0].src is None:
+            rc = self._devices[0]
+        if rc is None and src not in self._unknownSources:
+            # each unknown id is reported once, but the set is limited (any client may send notifications):
+            if len(self._unknownSources) < 100:
+                self._unknownSources.add(src)
+            self.error(f'notification of an unknown device ignored: {src}')
+        return rc
+
+    def importChunk(self, chunk, device: str, dates) -> int:
+        '''Stores a part of the imported events: events with an existing event_time are ignored.
+        @param chunk: a list of tuples (timestamp, total, apower, voltage, current, temperature)
+        @param device: None or the name of the measurement device
+        @param dates: IN/OUT: the set of the dates of the stored events
+        @return: the count of stored events
+        '''
+        changed = datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        events = {}
+        for event in chunk:
+            events[datetime.datetime.fromtimestamp(event[0]).strftime('%Y-%m-%d %H:%M:%S')] = event
+        times = sorted(events)
+        condition = '' if device is None else ' AND event_device=%s'
+        params = (times[0], times[-1]) if device is None else (times[0], times[-1], device)
+        records = self.dbSelect(
+            f'SELECT event_time FROM events WHERE event_time>=%s AND event_time<=%s{condition};', params)
+        existing = set(map(lambda record: record[0].strftime('%Y-%m-%d %H:%M:%S'), records))
+        rows = []
+        for eventTime in times:
+            if eventTime not in existing:
+                event = events[eventTime]
+                rows.append((eventTime, event[1], event[2], event[3], event[4], event[5], device, changed, 'import'))
+                dates.add(eventTime[0:10])
+        if len(rows) > 0:
+            self.dbExecuteMany(Monitor.sqlInsertEvent, rows)
+            self.storeRollup(rows)
+        return len(rows)
+
+    def importFiles(self, files, device: str=None, chunkSize: int=1000):
+        '''Imports measurements from CSV or JSON files into the table "events".
+        The events are stored in chunks with multi-row INSERTs. Events with an existing event_time
+        (of the same device) are ignored. The day statistics of the affected past days are rebuilt.
+        @param files: the names of the files
+        @param device: None or the name of the measurement device
+        @param chunkSize: the count of events stored with one INSERT
+        @return: a tuple (countRead, countNew)
+        '''
+        reader = EventReader(self)
+        dates = set()
+        countNew = 0
+        for filename in files:
+            chunk = []
+            for event in reader.read(filename):
+                chunk.append(event)
+                if len(chunk) >= chunkSize:
+                    countNew += self.importChunk(chunk, device, dates)
+                    chunk = []
+            if len(chunk) > 0:
+                countNew += self.importChunk(chunk, device, dates)
+        self.log(f'read: {reader.countRecords} new: {countNew} errors: {reader.countErrors}')
+        if self._dataDevice is None or device == self._dataDevice:
+            self.markDirtyDays(dates)
+            self.updateDirtyDays()
+        return (reader.countRecords, countNew)
+
     def initDb(self, argv):
         '''Initializes the database handling.
         @param argv: program arguments
@@ -371,30 +841,202 @@ WantedBy=multi-user.target
 
 ''')
 
-    def status(self):
-        '''Requests the status data from a device and stores that into the database.
+    def fetchStatus(self, device: Device):
+        '''Requests the status data from a device.
+        Note: this method runs in a worker thread: no database access!
+        @param device: the device to poll
+        @return: None: error occurred otherwise: the status data (dictionary)
         '''
-        connection = http.client.HTTPConnection(
-            self._domain, self._port, self._timeout)
         try:
-            connection.request("GET", self._requestPath)
-            response = connection.getresponse()
-            stringData = response.read()
-            data = json.loads(stringData)
-            if self.verbose:
-                print('time: {}'.format(data['aenergy']['minute_ts']))
-                for key in ('apower', 'voltage', 'current'):
-                    print("{}: {}".format(key, data[key]))
-                print('total: {}'.format(data['aenergy']['total']))
-                print('temperature: {}'.format(data['temperature']['tC']))
-            self.storeEvent(data['aenergy']['minute_ts'], data['aenergy']['total'], data['apower'],
-                            data['voltage'], data['current'], data['temperature']['tC'])
-        except:
-            self.error(
-                f'HTTP connection failed: {self._domain}:{self._port}{self._requestPath}')
-        connection.close()
-
-    def storeEvent(self, time: datetime.datetime, total: float, power: float, voltage: float, current: float, temperature: float):
+            rc = device.client.requestJson(device.requestPath)
+        finally:
+            device.busy = False
+        return rc
+
+    def flushEvents(self, force: bool=True):
+        '''Stores the buffered events into the table "events" with one multi-row INSERT
+        or appends them to the journal (if configured: the database is used if the journal fails).
+        @param force: False: the events are only stored if the count or the age limit is reached
+            True: the last measurements of the open runs are stored too
+        '''
+        if force:
+            for run in self._runs.values():
+                if run.pending is not None:
+                    self._events.append(run.pending)
+                    run.pending = None
+        dropped = len(self._events) - self._bufferMax
+        if dropped > 0:
+            self._events = self._events[dropped:]
+            self.error(f'event buffer full: {dropped} event(s) dropped')
+        if len(self._events) > 0 and (force or time.time() >= self._flushRetry and (
+                self._journal is not None or len(self._events) >= self._batchSize
+                or time.time() - self._eventsSince >= self._batchAge)):
+            events = self._events
+            self._events = []
+            stored = False
+            if self._journal is not None:
+                # the journal is local and cheap: the batching is done by the drainer
+                try:
+                    self._journal.append(events)
+                    stored = True
+                except Exception as exc:
+                    # e.g. disk full: the events are stored directly into the database
+                    self.error(f'journal: appending {len(events)} event(s) failed: {exc}')
+            if not stored:
+                try:
+                    # with a journal the drainer thread stores events too: the rollup events are not collected
+                    self.storeEvents(events, force or self._journal is not None)
+                except Exception as exc:
+                    # the events stay in the buffer, the next try follows after ingest.batch.age seconds:
+                    self._events = events + self._events
+                    self._flushRetry = time.time() + self._batchAge
+                    self.error(
+                        f'SQL-insert of {len(events)} event(s) failed: {exc}')
+        if self._journal is None:
+            # the collected events of the rollup tables (see storeRollup()):
+            self.storeRollup([], force)
+
+    def storeEvents(self, events, force: bool=True):
+        '''Stores events into the table "events" with one multi-row INSERT and updates the rollup tables
+        and the dirty days. The days maintained by the live statistics (today) are not marked as dirty.
+        @param events: the events as rows of the table "events" (see Monitor.sqlInsertEvent)
+        @param force: False: the rollup tables are updated only if ingest.batch.age is reached (see storeRollup())
+        '''
+        self.dbExecuteMany(Monitor.sqlInsertEvent, events)
+        self.storeRollup(events, force)
+        today = datetime.date.today().strftime('%Y-%m-%d')
+        self.markDirtyDays(filter(lambda date: not self._live or date < today,
+                                  map(lambda row: row[0][0:10],
+                                      filter(lambda row: self._dataDevice is None or row[6] == self._dataDevice,
+                                             events))))
+
+    def storeJournalEvents(self, events):
+        '''Stores the events of the journal: a crash after the INSERT delivers the events again (at-least-once),
+        so events with an existing event_time (of the same device) are ignored, like an import does.
+        @param events: the events as rows of the table "events" (see Monitor.sqlInsertEvent)
+        '''
+        times = list(map(lambda row: row[0], events))
+        records = self.dbSelect('SELECT event_time, event_device FROM events WHERE event_time>=%s AND event_time<=%s;',
+                                (min(times), max(times)))
+        existing = set(map(lambda record: (record[0].strftime('%Y-%m-%d %H:%M:%S'), record[1] or None), records))
+        rows = list(filter(lambda row: (row[0], row[6] or None) not in existing, events))
+        if len(rows) < len(events):
+            self.log(f'journal: {len(events) - len(rows)} event(s) already stored')
+        if len(rows) > 0:
+            self.storeEvents(rows)
+
+    def startJournal(self):
+        '''Opens the journal (if configured: journal.file) and starts the thread storing its events into the database.
+        '''
+        if self._journalFile != '' and self._journal is None:
+            self._journal = Journal(self._journalFile, self, self._journalDays, self._journalSync)
+            if self._journal.pending() > 0:
+                self.log(f'journal: {self._journal.pending()} event(s) not stored yet')
+            self._journal.startDrainer(self.storeJournalEvents, max(100, self._batchSize))
+
+    def stopJournal(self):
+        '''Stops the thread of the journal after storing the pending events (if possible) and closes the journal.
+        '''
+        if self._journal is not None:
+            self._journal.stopDrainer(True, self.storeJournalEvents)
+            self._journal.close()
+            self._journal = None
+
+    def listen(self, argv):
+        '''Starts a never ending process receiving the status pushed by the devices.
+        @param argv: the command line arguments
+        '''
+        print(f'sunmonitor started as listener on {self._listenInterface}:{self._listenPort} (version {VERSION})')
+        self.verbose = len(argv) >= 1 and argv[0] != '-q'
+        self.printMessages = self.verbose
+        signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+        listener = ShellyListener(self._listenInterface, self._listenPort, self.storePushed, self)
+        try:
+            self.startJournal()
+            self.startLiveDay()
+            while True:
+                listener.handleRequest()
+                self.flushEvents(False)
+                self.checkDirtyDays()
+                self.checkStats()
+        finally:
+            self.flushEvents()
+            self.stopJournal()
+            self.storeLiveDay()
+            self.dumpStats()
+            listener.close()
+
+    def poolOfThreads(self) -> concurrent.futures.ThreadPoolExecutor:
+        '''Returns the thread pool used for polling the devices.
+        @return: the thread pool (created on the first call)
+        '''
+        if self._pool is None:
+            self._pool = concurrent.futures.ThreadPoolExecutor(
+                max_workers=max(1, min(self._threads, len(self._devices))), thread_name_prefix='poll')
+        return self._pool
+
+    def status(self, eventTime: int=None):
+        '''Requests the status data from all devices and stores that into the database.
+        The devices are polled concurrently: a hanging device does not delay the storing of the others.
+        @param eventTime: None or the time of the measurements. None: the minute timestamp of the device
+        '''
+        if len(self._devices) == 1:
+            device = self._devices[0]
+            device.busy = True
+            self.storeStatus(device, self.fetchStatus(device), eventTime)
+        else:
+            futures = {}
+            for device in self._devices:
+                if device.busy:
+                    self.error(f'{device.name}: the last request is still running')
+                else:
+                    device.busy = True
+                    futures[self.poolOfThreads().submit(self.fetchStatus, device)] = device
+            timeout = max(map(lambda device: device.timeout, self._devices)) + 1
+            try:
+                for future in concurrent.futures.as_completed(futures, timeout):
+                    self.storeStatus(futures[future], future.result(), eventTime)
+            except concurrent.futures.TimeoutError:
+                for future, device in futures.items():
+                    if not future.done():
+                        self.error(f'{device.name}: timeout')
+
+    def storePushed(self, src: str, data, eventTime: int):
+        '''Stores the status pushed by a device into the database.
+        @param src: the id of the device, e.g. "shellyplus1pm-a8032ab12345"
+        @param data: the status data, same format as the answer of Switch.GetStatus
+        @param eventTime: the time of the notification
+        '''
+        device = self.deviceBySource(src)
+        if device is not None:
+            self.storeStatus(device, data, eventTime)
+
+    def storeStatus(self, device: Device, data, eventTime: int=None):
+        '''Stores the status data of a device into the database.
+        @param device: the polled device
+        @param data: None or the status data delivered by the device
+        @param eventTime: None or the time of the measurement. None: the time is taken from the data
+        '''
+        if data is not None:
+            try:
+                if eventTime is None:
+                    eventTime = data['aenergy']['minute_ts']
+                if self.verbose:
+                    roundTrip = '' if device.client.roundTrip is None else f' round trip: {device.client.roundTrip:.3f} sec'
+                    print(f'device: {device.name}{roundTrip}')
+                    print('time: {}'.format(eventTime))
+                    for key in ('apower', 'voltage', 'current'):
+                        print("{}: {}".format(key, data[key]))
+                    print('total: {}'.format(data['aenergy']['total']))
+                    print('temperature: {}'.format(data['temperature']['tC']))
+                self._lastPowers[device.name] = data['apower']
+                self.storeEvent(eventTime, data['aenergy']['total'], data['apower'],
+                                data['voltage'], data['current'], data['temperature']['tC'], device.name)
+            except (KeyError, TypeError) as exc:
+                self.error(f'{device.name}: unexpected status data: {exc}')
+
+    def storeEvent(self, time: datetime.datetime, total: float, power: float, voltage: float, current: float, temperature: float,
+                   device: str=None):
         '''Stores one row of the table "events".
         @param time: the measurement timestamp
         @param total: the summarized energy since the last switch off
@@ -402,20 +1044,289 @@ WantedBy=multi-user.target
         @param voltage: the current voltage (V)
         @param current: the current current (A)
         @param temperature: the current temperature (C) (of the measurement device)
+        @param device: None or the name of the measurement device
         '''
         now = datetime.datetime.now()
         changed = now.strftime('%Y-%m-%d %H:%M:%S')
-        sql = ('INSERT INTO events (event_time, event_total, event_apower, event_voltage, event_current, event_temperature, created, createdby)'
-               + ' VALUES (%s, %s, %s, %s, %s, %s, %s, %s);')
         time2 = datetime.datetime.fromtimestamp(
             time).strftime('%Y-%m-%d %H:%M:%S')
         val = (time2, total, power, voltage, current,
-               temperature, changed, 'monitor')
-        try:
-            self.dbExecute(sql, val)
-        except Exception as exc:
-            self.error(
-                f'SQL-insert failed: {exc}')
+               temperature, device, changed, 'monitor')
+        if self._deadband <= 0 or not self.suppressEvent(val, time, total, power, device):
+            if len(self._events) == 0:
+                self._eventsSince = now.timestamp()
+            self._events.append(val)
+        if self._live and (self._dataDevice is None or device == self._dataDevice):
+            self.updateLiveDay(datetime.datetime.fromtimestamp(time), total, power)
+        self.flushEvents(False)
+
+    def suppressEvent(self, row, eventTime: int, total: float, power: float, device: str) -> bool:
+        '''Tests whether an event continues the current run of (nearly) unchanged measurements of its device.
+        The event is not stored but remembered as the last measurement of the run.
+        If the run ends its last measurement is put into the event buffer.
+        @param row: the event to store (as row of the table "events")
+        @param eventTime: the timestamp of the measurement
+        @param total: the energy counter of the measurement
+        @param power: the power of the measurement
+        @param device: None or the name of the measurement device
+        @return: True: the event is suppressed
+        '''
+        run = self._runs.get(device)
+        rc = (run is not None and abs(power - run.power) <= self._deadband and total >= run.lastTotal
+              and eventTime - run.startTime < self._deadbandGap)
+        if rc:
+            run.pending = row
+            run.lastTotal = total
+        else:
+            if run is not None and run.pending is not None:
+                if len(self._events) == 0:
+                    self._eventsSince = time.time()
+                self._events.append(run.pending)
+            self._runs[device] = Run(eventTime, total, power)
+        return rc
+
+    def maintain(self):
+        '''Maintains the table "events": creates the partitions of the next months
+        and removes the events older than retention.days (if they are summarized and archived).
+        '''
+        retention = Retention(self)
+        if self._partitioned and self.dbDriver() == 'sqlite':
+            self.log('SQLite has no partitions: retention.partitioned is ignored')
+        elif self._partitioned:
+            if retention.partitions() is None:
+                retention.partitionTable(self._monthsAhead)
+            else:
+                retention.addPartitions(self._monthsAhead)
+        if self._retentionDays > 0:
+            cutoff = datetime.date.today() - datetime.timedelta(days=self._retentionDays)
+            covered = retention.coveredUntil(self._useRollup, self.archive())
+            if self.archive() is None:
+                self.log('retention.days needs the archive (archive.dir): no events removed')
+            elif covered < cutoff:
+                self.log(f'events are summarized and archived until {covered} only: retention limited to that date')
+            cutoff = min(cutoff, covered)
+            if cutoff > datetime.date.min:
+                retention.prune(cutoff)
+
+    def markDirtyDays(self, dates):
+        '''Marks days whose statistics must be recomputed because of new events.
+        @param dates: the dates (format "%Y-%m-%d") of the new events
+        '''
+        dates = sorted(set(dates))
+        if len(dates) > 0:
+            changed = datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+            try:
+                self.dbExecuteMany('''INSERT INTO dirty_days (dirty_date, dirty_changed) VALUES (%s, %s)
+  ON DUPLICATE KEY UPDATE dirty_changed=VALUES(dirty_changed)''', list(map(lambda date: (date, changed), dates)))
+            except Exception as exc:
+                self.error(f'marking the dirty days {dates[0]}..{dates[-1]} failed: {exc}')
+            self.rearchiveMonths(dates)
+
+    def rearchiveMonths(self, dates):
+        '''Archives the archived months with new events (e.g. delayed or imported) again:
+        otherwise the charts and statistics (reading the archive) would miss the new events.
+        @param dates: the dates (format "%Y-%m-%d") of the new events, sorted
+        '''
+        current = Archive.monthStart(datetime.date.today())
+        if self.archive() is not None and dates[0] < current.strftime('%Y-%m-%d'):
+            months = sorted(set(map(lambda date: Archive.monthStart(datetime.date.fromisoformat(date)), dates)))
+            for month in filter(lambda month: month < current, months):
+                for device in self.archive().devices(month):
+                    try:
+                        self.archive().archiveMonth(month, device)
+                    except Exception as exc:
+                        self.error(f'archiving {month.strftime("%Y-%m")} again failed: {exc}')
+
+    def updateDirtyDays(self) -> int:
+        '''Recomputes the statistics of the past days marked as dirty (see markDirtyDays()).
+        Consecutive days are read with one query. A day marked again during the calculation stays dirty.
+        @return: the count of the recomputed days
+        '''
+        today = datetime.datetime.now().strftime('%Y-%m-%d')
+        now = datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        dates = list(map(lambda row: row[0], self.dbSelect(
+            'SELECT dirty_date FROM dirty_days WHERE dirty_date<%s ORDER BY dirty_date;', (today,))))
+        ranges = []
+        for date in dates:
+            if len(ranges) > 0 and ranges[-1][1] == date:
+                ranges[-1][1] = date + datetime.timedelta(days=1)
+            else:
+                ranges.append([date, date + datetime.timedelta(days=1)])
+        rc = 0
+        for first, last in ranges:
+            values = self.computeDays(first, last)
+            if len(values) > 0:
+                self.dbExecuteMany(Monitor.sqlInsertDay, values)
+            rc += len(values)
+            self.dbExecute('DELETE FROM dirty_days WHERE dirty_date>=%s AND dirty_date<%s AND dirty_changed<=%s;',
+                           (first.strftime('%Y-%m-%d'), last.strftime('%Y-%m-%d'), now))
+        if len(dates) > 0:
+            self.log(f'dirty days: {len(dates)} recomputed: {rc}')
+        return rc
+
+    def checkDirtyDays(self):
+        '''Recomputes the dirty days if the interval ingest.dirty.interval is over.
+        '''
+        if self._dirtyInterval > 0 and time.time() - self._dirtyChecked >= self._dirtyInterval:
+            self._dirtyChecked = time.time()
+            try:
+                self.updateDirtyDays()
+            except Exception as exc:
+                self.error(f'recomputing the dirty days failed: {exc}')
+
+    def checkStats(self):
+        '''Logs the query statistics if the interval db.stats.interval is over.
+        '''
+        if self._statsInterval > 0 and time.time() - self._statsDumped >= self._statsInterval:
+            self._statsDumped = time.time()
+            self.dumpStats()
+
+    def dumpStats(self):
+        '''Logs the query statistics (if collected, see db.stats).
+        '''
+        for line in self.dbStatsReport():
+            self.log(line)
+
+    def archive(self) -> Archive:
+        '''Returns the archive of the closed months.
+        @return: None: no archive configured (archive.dir). Otherwise: the Archive instance (created on the first call)
+        '''
+        if self._archive is None and self._archiveDir != '':
+            self._archive = Archive(self._archiveDir, self)
+        return self._archive
+
+    def archiveMonths(self, until: datetime.date, device: str, force: bool=False) -> int:
+        '''Stores the closed months into the archive (mode archive).
+        @param until: a day of the first month which is not archived
+        @param device: None (all devices) or the device
+        @param force: True: the archived months are written again
+        @return: the count of archived months
+        '''
+        rc = 0
+        if self.archive() is None:
+            self.error('missing archive.dir in the configuration')
+        elif until > Archive.monthStart(datetime.date.today()):
+            self.error(f'the month of {until} is not closed')
+        else:
+            rc = self.archive().archive(until, device, force)
+            self.log(f'{rc} month(s) archived')
+        return rc
+
+    def eventRows(self, firstDate: datetime.date, lastDate: datetime.date):
+        '''Returns the events of an interval for the statistics: archived months are read from the archive.
+        @param firstDate: the start of the interval
+        @param lastDate: the end of the interval (excluding)
+        @return: an iterator of the rows (event_time, event_total, event_apower) ordered by time
+        '''
+        segments = [(firstDate, lastDate, False)] if self.archive() is None else self.archive().segments(
+            firstDate, lastDate, self._dataDevice)
+        condition = '' if self._dataDevice is None else ' AND event_device=%s'
+        sql = f'''SELECT event_time, event_total, event_apower
+FROM events
+WHERE 
+  event_time >= %s AND event_time < %s{condition}
+ORDER BY event_time;
+'''
+        for first, last, archived in segments:
+            if archived:
+                yield from self.archive().events(first, last, self._dataDevice)
+            else:
+                params = [first.strftime('%Y-%m-%d'), last.strftime('%Y-%m-%d')]
+                if self._dataDevice is not None:
+                    params.append(self._dataDevice)
+                yield from self.dbIterate(sql, params, 5000)
+
+    def rollup(self) -> Rollup:
+        '''Returns the manager of the rollup tables.
+        @return: the Rollup instance (created on the first call)
+        '''
+        if self._rollup is None:
+            self._rollup = Rollup(self)
+        return self._rollup
+
+    def storeRollup(self, events, force: bool=True):
+        '''Adds stored events to the rollup tables (if configured).
+        The events are collected: the tables are updated once for all events of ingest.batch.age seconds.
+        @param events: the events as rows of the table "events" (see Monitor.sqlInsertEvent)
+        @param force: True: the collected events are stored at once
+        '''
+        if self._useRollup:
+            if len(self._rollupEvents) == 0:
+                self._rollupSince = time.time()
+            self._rollupEvents += events
+            if len(self._rollupEvents) > 0 and (force or time.time() - self._rollupSince >= self._batchAge):
+                events = self._rollupEvents
+                self._rollupEvents = []
+                try:
+                    self.rollup().store(list(map(lambda row: (row[0], row[1], row[2], row[6]), events)))
+                except Exception as exc:
+                    self.error(f'rollup of {len(events)} event(s) failed: {exc}')
+
+    def startLiveDay(self):
+        '''Starts the live statistics of the current day (if configured).
+        Missing days since the last stored day are summarized, the statistics of today
+        are rebuilt from the events already stored (e.g. after a restart) or from the journal.
+        '''
+        if self._liveInterval > 0:
+            today = datetime.date.today()
+            rows = self.dbSelect('SELECT max(day_date) FROM days WHERE day_date<%s;', (today.strftime('%Y-%m-%d'),))
+            first = self._dataStart if len(rows) == 0 or rows[0][0] is None else rows[0][0] + datetime.timedelta(days=1)
+            if first < today:
+                self.updateDays(first, today)
+            if self._journal is not None and self._journal.covers(today):
+                # the journal contains the events not stored yet too:
+                rows = sorted(map(lambda row: (datetime.datetime.strptime(row[0], '%Y-%m-%d %H:%M:%S'), row[1], row[2]),
+                                  self._journal.events(datetime.datetime.combine(today, datetime.time()),
+                                                       device=self._dataDevice)))
+            else:
+                condition = '' if self._dataDevice is None else ' AND event_device=%s'
+                params = [today.strftime('%Y-%m-%d')]
+                if self._dataDevice is not None:
+                    params.append(self._dataDevice)
+                rows = self.dbSelect(f'''SELECT event_time, event_total, event_apower
+FROM events
+WHERE event_time >= %s{condition}
+ORDER BY event_time;''', params)
+            self._liveDay = None
+            for row in rows:
+                self.updateLiveDay(row[0], row[1], row[2], False)
+            self._live = True
+            self.log(f'live statistics: {len(rows)} event(s) of today restored')
+
+    def storeLiveDay(self):
+        '''Stores the live statistics of the current day into the table "days" (replacing an existing row).
+        '''
+        if self._liveDay is not None and self._liveDay.countEvents > 0:
+            values = self.dayValues(self._liveDay.lastTime, self._liveDay.finish())
+            try:
+                self.dbExecute(Monitor.sqlInsertDay, values)
+                self._liveStored = self._liveDay.lastTime.timestamp()
+            except Exception as exc:
+                self.error(f'storing the statistics of {values[0]} failed: {exc}')
+
+    def updateLiveDay(self, eventTime: datetime.datetime, total: float, power: float, store: bool=True):
+        '''Adds one event to the live statistics of the current day.
+        At the change of the day the previous day is stored finally.
+        @param eventTime: the time of the measurement
+        @param total: the energy counter of the measurement
+        @param power: the power of the measurement
+        @param store: False: the statistics are not stored (restoring)
+        '''
+        day = eventTime.strftime('%Y-%m-%d')
+        if self._liveDay is not None and day < self._liveDay.day:
+            # a delayed event of a past day: the day is recomputed as dirty day
+            return
+        if self._liveDay is not None and day != self._liveDay.day:
+            if store:
+                self.storeLiveDay()
+            self._liveDay = None
+        if self._liveDay is None:
+            self._liveDay = DayStatistics(eventTime, total)
+            self._liveStored = eventTime.timestamp()
+        if eventTime >= self._liveDay.lastTime:
+            self._liveDay.add(eventTime, total, power)
+            if store and eventTime.timestamp() - self._liveStored >= self._liveInterval:
+                self.storeLiveDay()
 
     def statusWeather(self, verbose=True):
         self._domainWeather = 'api.openweathermap.org'
@@ -429,95 +1340,163 @@ WantedBy=multi-user.target
         if verbose:
             print('time: {}'.format(data['aenergy']['minute_ts']))
 
+    def statisticsOfDay(self, rows) -> Statistics:
+        '''Calculates the statistics of one day.
+        @param rows: the events of the day ordered by time: (event_time, event_total, event_apower)
+        @return: the Statistics instance
+        '''
+        day = DayStatistics(rows[0][0], rows[0][1])
+        for row in rows:
+            day.add(row[0], row[1], row[2])
+        rc = day.finish()
+        return rc
+
+    def computeDays(self, firstDate: datetime.date, lastDate: datetime.date, existing=None):
+        '''Calculates the rows of the table "days" from the events of an interval.
+        The events of the whole interval are read by one query (streamed) and split into days on the fly:
+        only the events of one day are held in memory. Archived months are read from the archive (see eventRows()).
+        @param firstDate: the start of the interval to handle
+        @param lastDate: the end of the interval to handle (excluding)
+        @param existing: None or a set of days (format "%Y-%m-%d") which should not be calculated
+        @return: a list of parameter sets of Monitor.sqlInsertDay
+        '''
+        existing = set() if existing is None else existing
+        rc = []
+        rows = self.eventRows(firstDate, lastDate)
+        for day, dayRows in itertools.groupby(rows, lambda row: row[0].strftime('%Y-%m-%d')):
+            if day not in existing:
+                dayRows = list(dayRows)
+                if self._vectorized:
+                    statistics = VectorStatistics(Statistics.limitsPower, Statistics.limitsHoursMin,
+                                                  Statistics.limitsHoursMax).populate(
+                        *VectorStatistics.fromRows(dayRows))
+                else:
+                    statistics = self.statisticsOfDay(dayRows)
+                rc.append(self.dayValues(dayRows[-1][0], statistics))
+        return rc
+
+    def recomputeDays(self, firstDate: datetime.date, lastDate: datetime.date, jobs: int=1):
+        '''Rebuilds the table "days" in an interval: existing rows are replaced, days without events are kept.
+        The interval is split into chunks handled by worker processes with their own database connection.
+        @param firstDate: the start of the interval to handle
+        @param lastDate: the end of the interval to handle (excluding)
+        @param jobs: the count of worker processes. 1: no worker processes
+        @return: the count of the stored days
+        '''
+        countDays = max(0, (lastDate - firstDate).days)
+        chunkDays = max(7, math.ceil(countDays / max(1, jobs * 4)))
+        chunks = []
+        current = firstDate
+        while current < lastDate:
+            chunks.append((current, min(lastDate, current + datetime.timedelta(days=chunkDays))))
+            current = chunks[-1][1]
+        rc = 0
+        if jobs <= 1 or len(chunks) <= 1:
+            for first, last in chunks:
+                rc += self.recomputeChunk(first, last)
+        else:
+            with concurrent.futures.ProcessPoolExecutor(max_workers=min(jobs, len(chunks))) as pool:
+                futures = {pool.submit(recomputeWorker, self._configFile, first, last): (first, last)
+                           for first, last in chunks}
+                for future in concurrent.futures.as_completed(futures):
+                    first, last = futures[future]
+                    try:
+                        count = future.result()
+                        rc += count
+                        if self.verbose:
+                            print(f'{first} - {last}: {count} day(s)')
+                    except Exception as exc:
+                        self.error(f'recompute of {first} - {last} failed: {exc}')
+        self.log(f'recomputed: {rc} day(s) in {len(chunks)} chunk(s)')
+        return rc
+
+    def recomputeChunk(self, firstDate: datetime.date, lastDate: datetime.date) -> int:
+        '''Replaces the rows of the table "days" in an interval by newly calculated rows.
+        The rows are replaced by the upsert of Monitor.sqlInsertDay (no DELETE): days without events are kept.
+        @param firstDate: the start of the interval to handle
+        @param lastDate: the end of the interval to handle (excluding)
+        @return: the count of the stored days
+        '''
+        values = self.computeDays(firstDate, lastDate)
+        if len(values) > 0:
+            self.dbExecuteMany(Monitor.sqlInsertDay, values)
+        return len(values)
+
     def updateDays(self, firstDate: datetime.date, lastDate: datetime.date):
         '''Summarizes some data of the table "events" for one day into the table "days".
+        The existing days are read once, the new days are calculated with one query (see computeDays())
+        and stored by one batched INSERT.
         @param firstDate: the start of the interval to handle
         @param lastDate: the end of the interval to handle
         @return: a tuple (countTotal, countNew): countTotal is the count of the days in the interval
             countNew is the count of the created rows (in "days"): only not existing days will be created
         '''
-        current = firstDate + datetime.timedelta(days=0)
-        countNew = 0
-        countTotal = 0
-        while current < lastDate:
-            countTotal += 1
-            sql = '''SELECT count(*) FROM days WHERE day_date=%s;'''
-            currentDay = current.strftime('%Y-%m-%d')
-            recs = self.dbSelect(sql, [currentDay])
-            if recs[0][0] == 0:
-                #if self.verbose:
-                #    print(f'{currentDay}: {len(recs)} record(s)')
-                countNew += 1
-                currentStr = current.strftime('%Y-%m-%d')
-                currentStr2 = currentStr + ' 23:59:59'
-                sql = f'''SELECT event_time, event_total, event_apower
-FROM events
-WHERE 
-  event_time >= '{currentStr}' AND event_time <= '{currentStr2}'
-ORDER BY event_time;
-'''
-                rows = self.dbSelect(sql)
-                if len(rows) >= 1:
-                    statistics = Statistics(rows)
-                    checkTimeRange = True
-                    dayEnergy = 0
-                    minTotal = lastTotal = float(rows[0][1])
-                    for row in rows:
-                        currentDate = row[0]
-                        total = float(row[1])
-                        if total < lastTotal:
-                            dayEnergy += lastTotal - minTotal
-                            minTotal = 0.0
-                        lastTotal = total
-                        aPower = float(row[2])
-                        statistics.populate(
-                            currentDate.timestamp(), total, aPower)
-                        if checkTimeRange and not statistics.populateTimeRange(total, currentDate.timestamp()):
-                            checkTimeRange = False
-                        statistics.populateLastTotal(total)
-                    dayEnergy += total - minTotal
-                    statistics.populateFinish(rows, dayEnergy)
-                    self.updateOneDay(currentDate, statistics)
-            current += datetime.timedelta(days=1)
+        firstStr = firstDate.strftime('%Y-%m-%d')
+        lastStr = lastDate.strftime('%Y-%m-%d')
+        countTotal = max(0, (lastDate - firstDate).days)
+        sql = '''SELECT day_date FROM days WHERE day_date>=%s AND day_date<%s;'''
+        existing = set(map(lambda row: row[0].strftime('%Y-%m-%d'), self.dbSelect(sql, (firstStr, lastStr))))
+        countNew = countTotal - len(existing)
+        values = self.computeDays(firstDate, lastDate, existing)
+        if len(values) > 0:
+            self.dbExecuteMany(Monitor.sqlInsertDay, values)
+            if self.verbose:
+                print(f'updated: {len(values)} day(s) from {values[0][0]} to {values[-1][0]}')
         self.debug(f'total: {countTotal} new: {countNew}')
         return (countTotal, countNew)
 
+    def dayValues(self, currentDate: datetime.datetime, stat: Statistics):
+        '''Returns the values of one row of the table "days".
+        @param currentDate: the date of the day
+        @param stat: the Statistic instance delivering the data
+        @return: the parameters of Monitor.sqlInsertDay
+        '''
+        changed = datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        rc = (currentDate.strftime('%Y-%m-%d'), stat.energyMin, stat.energyMax, stat.energyOfDay,
+              stat.timeValues[Statistics.limitsHoursMin],
+              stat.timeValues[Statistics.limitsHoursMin + 1],
+              stat.timeValues[Statistics.limitsHoursMin + 2],
+              stat.timeValues[Statistics.limitsHoursMin + 3],
+              stat.timeValues[Statistics.limitsHoursMin + 4],
+              stat.timeValues[Statistics.limitsHoursMin + 5],
+              stat.timeValues[Statistics.limitsHoursMin + 6],
+              stat.timeValues[Statistics.limitsHoursMin + 7],
+              stat.timeValues[Statistics.limitsHoursMin + 8],
+              stat.timeValues[Statistics.limitsHoursMin + 9],
+              stat.timeValues[Statistics.limitsHoursMin + 10],
+              stat.timeValues[Statistics.limitsHoursMin + 11],
+              stat.powerValues[0], stat.powerValues[1], stat.powerValues[2], stat.powerValues[3],
+              stat.powerValues[4], stat.powerValues[5], stat.powerValues[6], stat.powerValues[7], stat.powerValues[8],
+              changed, 'statistics')
+        return rc
+
     def updateOneDay(self, currentDate: datetime.datetime, stat: Statistics):
         '''Summarizes some data of the table "events" for one day into the table "days".
         @param currentDate: the date of the day to handle
         @param stat: the Statistic instance to store the data
         '''
-        sql = '''INSERT INTO days
-  (day_date, day_totalmin, day_totalmax, day_energy,
-  day_hour8, day_hour9, day_hour10, day_hour11, day_hour12, day_hour13, day_hour14, day_hour15, day_hour16, day_hour17, day_hour18, day_hourRest, 
-  day_energy10, day_energy25, day_energy50, day_energy100, day_energy200, day_energy300, day_energy400, day_energy500, day_energy590, 
-  created, createdby) 
-  VALUES(%s, %s, %s, %s, 
-  %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s,
-  %s, %s, %s, %s, %s, %s, %s, %s, %s,
-  %s, %s);
-'''
-        time2 = currentDate.strftime('%Y-%m-%d')
-        changed = datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-        values = (time2, stat.energyMin, stat.energyMax, stat.energyOfDay,
-                  stat.timeValues[Statistics.limitsHoursMin],
-                  stat.timeValues[Statistics.limitsHoursMin + 1],
-                  stat.timeValues[Statistics.limitsHoursMin + 2],
-                  stat.timeValues[Statistics.limitsHoursMin + 3],
-                  stat.timeValues[Statistics.limitsHoursMin + 4],
-                  stat.timeValues[Statistics.limitsHoursMin + 5],
-                  stat.timeValues[Statistics.limitsHoursMin + 6],
-                  stat.timeValues[Statistics.limitsHoursMin + 7],
-                  stat.timeValues[Statistics.limitsHoursMin + 8],
-                  stat.timeValues[Statistics.limitsHoursMin + 9],
-                  stat.timeValues[Statistics.limitsHoursMin + 10],
-                  stat.timeValues[Statistics.limitsHoursMin + 11],
-                  stat.powerValues[0], stat.powerValues[1], stat.powerValues[2], stat.powerValues[3],
-                  stat.powerValues[4], stat.powerValues[5], stat.powerValues[6], stat.powerValues[7], stat.powerValues[8],
-                  changed, 'statistics')
-        self.dbExecute(sql, values)
+        values = self.dayValues(currentDate, stat)
+        self.dbExecute(Monitor.sqlInsertDay, values)
         if self.verbose:
-            print(f'updated: {time2}')
+            print(f'updated: {values[0]}')
+
+def recomputeWorker(configFile: str, firstDate: datetime.date, lastDate: datetime.date) -> int:
+    '''Rebuilds the table "days" in an interval: runs in a worker process of Monitor.recomputeDays().
+    @param configFile: the configuration file
+    @param firstDate: the start of the interval to handle
+    @param lastDate: the end of the interval to handle (excluding)
+    @return: the count of the stored days
+    '''
+    monitor = Monitor()
+    monitor.verbose = False
+    monitor.config(configFile)
+    monitor.dbConnect()
+    try:
+        rc = monitor.recomputeChunk(firstDate, lastDate)
+    finally:
+        monitor.dbClose()
+    return rc
+
 
 def main(argv):
     mode = 'status' if len(argv) < 1 else argv[0]
@@ -527,14 +1506,82 @@ def main(argv):
     if mode == 'status':
         monitor.initDb(argv)
         monitor.status()
+        monitor.flushEvents()
     elif mode == 'update-days':
-        monitor.initDb(argv)
+        argv = monitor.initDb(argv)
         #until = datetime.date(2023, 3, 20)
         until = datetime.datetime.now().date()
-        monitor.updateDays(monitor._dataStart, until)
+        action = 'update'
+        jobs = 1
+        first = monitor._dataStart
+        while len(argv) > 0:
+            option = argv[0]
+            argv = argv[1:]
+            if '=' not in option and option in ('--jobs', '--from', '--to') and len(argv) > 0:
+                option += '=' + argv[0]
+                argv = argv[1:]
+            if option in ('--recompute', '--dirty'):
+                action = option[2:]
+            elif option.startswith('--jobs='):
+                jobs = max(1, int(option[7:]))
+            elif option.startswith('--from='):
+                first = datetime.datetime.strptime(option[7:], '%Y-%m-%d').date()
+            elif option.startswith('--to='):
+                until = datetime.datetime.strptime(option[5:], '%Y-%m-%d').date() + datetime.timedelta(days=1)
+            else:
+                monitor.error(f'unknown option: {option}')
+        if action == 'dirty':
+            monitor.updateDirtyDays()
+        elif action == 'recompute':
+            monitor.recomputeDays(first, until, jobs)
+        else:
+            monitor.updateDays(first, until)
     elif mode == 'daemon':
         argv = monitor.initDb(argv)
         monitor.daemon(argv)
+    elif mode == 'import':
+        argv = monitor.initDb(argv)
+        device = monitor._devices[0].name if len(monitor._devices) > 0 else None
+        if len(argv) > 0 and argv[0].startswith('--device='):
+            device = argv[0][9:]
+            argv = argv[1:]
+        if len(argv) == 0:
+            monitor.error('missing file(s) to import')
+        else:
+            monitor.importFiles(argv, device)
+    elif mode == 'rollup':
+        argv = monitor.initDb(argv)
+        first = monitor._dataStart
+        until = datetime.datetime.now().date() + datetime.timedelta(days=1)
+        for option in argv:
+            if option.startswith('--from='):
+                first = datetime.datetime.strptime(option[7:], '%Y-%m-%d').date()
+            elif option.startswith('--to='):
+                until = datetime.datetime.strptime(option[5:], '%Y-%m-%d').date() + datetime.timedelta(days=1)
+            else:
+                monitor.error(f'unknown option: {option}')
+        monitor.rollup().backfill(first, until)
+    elif mode == 'archive':
+        argv = monitor.initDb(argv)
+        until = datetime.date.today()
+        device = monitor._dataDevice
+        force = False
+        for option in argv:
+            if option.startswith('--until='):
+                until = Archive.monthStart(datetime.datetime.strptime(option[8:], '%Y-%m').date(), 1)
+            elif option.startswith('--device='):
+                device = option[9:] or None
+            elif option == '--force':
+                force = True
+            else:
+                monitor.error(f'unknown option: {option}')
+        monitor.archiveMonths(until, device, force)
+    elif mode == 'maintain':
+        monitor.initDb(argv)
+        monitor.maintain()
+    elif mode == 'listen':
+        argv = monitor.initDb(argv)
+        monitor.listen(argv)
     elif mode == 'init-service':
         monitor.initService()
     elif mode == 'example':
@@ -542,7 +1589,9 @@ def main(argv):
         monitor.example()
     else:
         monitor.error(
-            f'unknown mode: {mode} Use status | init-service | example | update-days | daemon')
+            f'unknown mode: {mode} Use status | init-service | example | update-days | daemon | listen | import | rollup | archive | maintain')
+    if mode in ('status', 'update-days', 'import', 'rollup', 'archive', 'maintain'):
+        monitor.dumpStats()
 
 
 if __name__ == '__main__':
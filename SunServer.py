@@ -6,6 +6,7 @@ Created on 27.06.2022
 '''
 import http.server
 import cgi
+import html
 import datetime
 import sys
 import SvgDiagram
@@ -15,6 +16,8 @@ from I18N import I18N
 from Snippets import Snippets
 from Configuration import Configuration
 from SilentLog import SilentLog
+from ChartData import ChartData
+from Archive import Archive
 
 VERSION = '2023.03.28.00'
 
@@ -44,6 +47,19 @@ class Service (MyDb):
         self.interface = '0.0.0.0'
         self.port = 8080
         self.timeZone = 0
+        # None: all events otherwise: only the events of this device are displayed
+        self.dataDevice = None
+        # reconstruction of the values suppressed by the monitor (ingest.deadband):
+        # gaps up to dataGap seconds are filled with interpolated values in the distance of dataInterval seconds
+        self.dataInterval = 60
+        self.dataGap = 0
+        # the width of the chart in pixels (see SvgDiagram.Diagram.diagram()): more rows are not read
+        self.chartPixels = 1000
+        # True: the rollup tables of the monitor (events_5m, events_1h) are used for long time ranges
+        self.useRollup = False
+        # the archive of the closed months written by the monitor (mode archive). '': no archive
+        self.archiveDir = ''
+        self._chartData = None
         self.title = 'Sonnenstatistik'
         self.dayTitle = 'Sonnenstatistik (Tag)'
         self.yearTitle = 'Sonnenstatistik (Jahr)'
@@ -90,22 +106,22 @@ class Service (MyDb):
         '''Builds the HTML table with the "best of" data.
         @return: the HTML text of the table
         '''
-        sql = f'''SELECT 
+        sql = '''SELECT 
   day_date, day_energy
 FROM days
-WHERE day_date >= '{self.bestStartDate}'
+WHERE day_date >= %s
 order by day_energy desc
 limit 20;
 '''
-        rowsGood = self.dbSelect(sql)
-        sql = f'''SELECT 
+        rowsGood = self.dbSelect(sql, (self.bestStartDate,))
+        sql = '''SELECT 
   day_date, day_energy
 FROM days
-WHERE day_date >= '{self.bestStartDate}'
+WHERE day_date >= %s
 order by day_energy
 limit 20;
 '''
-        rowsBad = self.dbSelect(sql)
+        rowsBad = self.dbSelect(sql, (self.bestStartDate,))
         if len(rowsGood) < 1:
             content = self.snippets.asString(
                 'HTML_NOT_AVAILABLE', self.i18n.variables())
@@ -140,34 +156,34 @@ limit 20;
             words = end.split(' ')
             parts = words[0].split('.')
             end2 = f'{parts[2]}-{parts[1]}-{parts[0]} {words[1]}'
-            sql = '''SELECT unix_timestamp(event_time) as seconds,
-  event_apower,event_total,event_current,event_voltage,event_temperature
-FROM events 
-WHERE event_time>=%s AND event_time <=%s AND event_total > 0.0
-ORDER BY event_time, event_id;
-'''
             svg = SvgDiagram.Diagram(self.i18n)
             svg.outputFileType = 'no-body'
-            if service.fieldMode == 1:
-                # title strokeWidth displayType attributes comment
-                svg.setTitles(self._titlesSimple)
-            else:
-                svg.setTitles(self._titlesTotal)
-            rows = self.dbSelect(sql, (start2, end2))
-            if len(rows) <= 1:
+            # title strokeWidth displayType attributes comment
+            titles = self._titlesSimple if service.fieldMode == 1 else self._titlesTotal
+            series = ['apower', 'total', 'current']
+            if service.fieldMode != 1:
+                series += ['voltage', 'temperature']
+            chartData = self.chartData()
+            rollupSeries = list(ChartData.rollupColumns)
+            if chartData.plan(start2, end2, self.chartPixels, rollupSeries)[0] in dict(ChartData.rollupTables):
+                # long ranges: the rollup tables contain only power and energy
+                series = rollupSeries
+            svg.setTitles(titles[0:1 + len(series)])
+            rows = chartData.iterate(start2, end2, self.chartPixels, series)
+            if self.dataGap > 0 and chartData.lastSource == 'events':
+                rows = self.expandRuns(rows)
+            count = 0
+            firstTime = None
+            for row in rows:
+                if firstTime == None:
+                    firstTime = row[0]
+                lastTime = row[0] % 86400 / 3600.0 + self.timeZone
+                svg.addRow((lastTime,) + tuple(row[1:]))
+                count += 1
+            if count <= 1:
                 content = self.snippets.asString('HTML_NOT_AVAILABLE2', self.i18n.variables(), {
                                                  'start': start, 'end': end})
             else:
-                firstTime = None
-                for row in rows:
-                    if firstTime == None:
-                        firstTime = row[0]
-                    lastTime = row[0] % 86400 / 3600.0 + self.timeZone
-                    if service.fieldMode == 1:
-                        svg.addRow((lastTime, row[1], row[2], row[3]))
-                    else:
-                        svg.addRow((lastTime, row[1], row[2],
-                                    row[3], row[4], row[5]))
                 svg.returnToZero()
                 start = datetime.datetime.fromtimestamp(
                     firstTime).strftime('%H:%M:%S')
@@ -177,6 +193,35 @@ ORDER BY event_time, event_id;
                 content = ''.join(svg._output)
         return content
 
+    def chartData(self) -> ChartData:
+        '''Returns the data access of the charts.
+        @return: the ChartData instance (created on the first call)
+        '''
+        if self._chartData is None:
+            archive = None if self.archiveDir == '' else Archive(self.archiveDir, self)
+            self._chartData = ChartData(self, self.dataDevice, self.dataInterval, self.useRollup, archive=archive)
+        return self._chartData
+
+    def expandRuns(self, rows):
+        '''Reconstructs the values not stored because of the change suppression of the monitor:
+        Gaps up to dataGap seconds are filled with interpolated rows in the distance of dataInterval seconds.
+        @param rows: the rows (seconds, apower, total, current, voltage, temperature) ordered by time (an iterable)
+        @return: the rows completed by the reconstructed values (generator)
+        '''
+        last = None
+        for row in rows:
+            if last is not None:
+                gap = row[0] - last[0]
+                if gap <= self.dataGap and gap > 1.5 * self.dataInterval:
+                    count = int(round(gap / self.dataInterval))
+                    for ix in range(1, count):
+                        factor = ix / count
+                        yield tuple(map(lambda pair: pair[0] if pair[0] is None or pair[1] is None
+                                        else float(pair[0]) + (float(pair[1]) - float(pair[0])) * factor,
+                                        zip(last, row)))
+            yield row
+            last = row
+
     @staticmethod
     def secToHour(seconds):
         rc = f'{seconds // 3600:02}:{seconds % 3600 // 60:02}'
@@ -262,6 +307,15 @@ WHERE day_date >= %s AND day_date <= %s
                 'snippets.file', self.fileSnippets)
             self.bestStartDate = conf.asString('best.start.date')
             self.timeZone = conf.asInt('timezone.offset', 0)
+            self.dataDevice = conf.asString('data.device', '') or None
+            if self.dataDevice is None and conf.hasKey('net.devices'):
+                # the energy counters of different devices must not be mixed in one chart:
+                self.dataDevice = (conf.asString('net.devices').replace(',', ' ').split() or [None])[0]
+            self.dataInterval = max(1, conf.asInt('data.interval', self.dataInterval))
+            self.dataGap = conf.asInt('data.gap', self.dataGap)
+            self.chartPixels = conf.asInt('chart.pixels', self.chartPixels)
+            self.useRollup = conf.asBool('data.rollup', self.useRollup)
+            self.archiveDir = conf.asString('archive.dir', self.archiveDir)
             self.dbConfig(conf)
 
     def example(self):
@@ -278,6 +332,23 @@ website.title=My Sun Statistic
 website.day.title=Sun Daily Statistic
 website.year.title=Sun Year Statistic
 best.start.date=2023-01-01
+# only the events of this device are displayed:
+#data.device=roof
+# if the monitor suppresses unchanged values (ingest.deadband): the poll interval and ingest.deadband.gap
+#data.interval=60
+#data.gap=900
+# the width of the charts: long time ranges are summarized in time buckets (one per pixel at most):
+#chart.pixels=1000
+# the rollup tables of the monitor (events_5m, events_1h) are used for the power and the energy:
+#data.rollup=false
+# the archive of the closed months (monitor mode "archive"): the charts of these months are read from the files:
+#archive.dir=/opt/sunmonitor/archive
+# the database: mysql or sqlite (the file db.file written by the monitor):
+#db.driver=mysql
+#db.file=/opt/sunmonitor/appsunmonitor.sqlite
+# the query statistics are displayed under /stats, queries slower than db.slow.ms are logged:
+#db.stats=false
+#db.slow.ms=0
 '''
         content += '''base=/opt/sunmonitor
 i18n.data=~{base}/sunserver.i18n
@@ -335,6 +406,15 @@ snippets.file=~{\base\}/sunserver.snippets.html
             'HTML_DOCUMENT', i18nData, {'BODY': body})
         self._content = self._content.replace('~page.title~', self.title)
 
+    def htmlStatsPage(self):
+        '''Builds the HTML page with the query statistics (see db.stats).
+        '''
+        lines = self.dbStatsReport(50)
+        if len(lines) == 0:
+            lines = ['query statistics are disabled (db.stats=false)']
+        self._content = ('<!DOCTYPE html>\n<html><head><title>SQL</title></head><body><pre>\n'
+                         + html.escape('\n'.join(lines)) + '\n</pre></body></html>\n')
+
     def htmlYearPage(self):
         '''Builds the HTML page of the current year.
         '''
@@ -412,6 +492,8 @@ class SunServer(http.server.BaseHTTPRequestHandler):
                         elif pair[0] == 'end':
                             self.fieldEnd = pair[1]
             self.handleYearPage(service)
+        elif self.path == '/stats':
+            service.htmlStatsPage()
         else:
             service.htmlDayPage()
         self.showPage(service)
@@ -0,0 +1,145 @@
+'''
+Created on 18.10.2026
+
+@author: wk
+'''
+import time
+import numpy
+
+
+class VectorStatistics:
+    '''Calculates the statistics of one day like the class Statistics (module SunMon), but vectorized:
+    the measurements are given as NumPy arrays. The results are identical to those of Statistics,
+    including the quirks of the hour interpolation.
+    Attributes (same names as Statistics): energyMin, energyMax, energyOfDay, timeValues, powerValues
+    '''
+
+    def __init__(self, limitsPower, limitsHoursMin: int, limitsHoursMax: int):
+        '''Constructor.
+        @param limitsPower: the lower bounds of the power bands (W), ascending
+        @param limitsHoursMin: the first observed hour
+        @param limitsHoursMax: the last observed hour: the energy produced later is summarized
+        '''
+        self._limitsPower = numpy.array(limitsPower, dtype=numpy.float64)
+        self._limitsHoursMin = limitsHoursMin
+        self._limitsHoursMax = limitsHoursMax
+        self.energyMin = 1E99
+        self.energyMax = 0
+        self.energyOfDay = None
+        self.powerValues = [0 for x in limitsPower]
+        self.timeValues = [0 for x in range(24 + 1)]
+
+    @staticmethod
+    def localSeconds(timestamps):
+        '''Converts timestamps into local time (seconds since the epoch as if the local time were UTC).
+        The UTC offset is fetched once per quarter of an hour (daylight saving time changes at such bounds).
+        @param timestamps: the timestamps (seconds since the epoch) as NumPy array
+        @return: an integer array with the local times
+        '''
+        seconds = numpy.floor(timestamps).astype(numpy.int64)
+        quarters, inverse = numpy.unique(seconds // 900, return_inverse=True)
+        offsets = numpy.array([time.localtime(int(quarter) * 900).tm_gmtoff for quarter in quarters],
+                              dtype=numpy.int64)
+        rc = seconds + offsets[inverse]
+        return rc
+
+    @staticmethod
+    def fromRows(rows):
+        '''Converts database rows into NumPy arrays.
+        @param rows: the rows (event_time, event_total, event_apower) with event_time as datetime
+        @return: a tuple (timestamps, totals, powers)
+        '''
+        count = len(rows)
+        timestamps = numpy.fromiter((row[0].timestamp() for row in rows), dtype=numpy.float64, count=count)
+        totals = numpy.fromiter((float(row[1]) for row in rows), dtype=numpy.float64, count=count)
+        powers = numpy.fromiter((float(row[2]) for row in rows), dtype=numpy.float64, count=count)
+        return (timestamps, totals, powers)
+
+    @staticmethod
+    def splitDays(timestamps):
+        '''Splits measurements ordered by time into days (local time).
+        @param timestamps: the timestamps (seconds since the epoch) as NumPy array, ascending
+        @return: a list of index pairs (start, end) of each day
+        '''
+        rc = []
+        if len(timestamps) > 0:
+            days = VectorStatistics.localSeconds(timestamps) // 86400
+            bounds = numpy.concatenate(([0], numpy.flatnonzero(days[1:] != days[:-1]) + 1, [len(timestamps)]))
+            rc = list(zip(bounds[:-1].tolist(), bounds[1:].tolist()))
+        return rc
+
+    def populate(self, timestamps, totals, powers):
+        '''Calculates the statistics of one day.
+        @param timestamps: the timestamps (seconds since the epoch) as NumPy array, ascending
+        @param totals: the energy counter of each measurement
+        @param powers: the power of each measurement
+        @return: the instance (for chaining)
+        '''
+        timestamps = numpy.asarray(timestamps, dtype=numpy.float64)
+        totals = numpy.asarray(totals, dtype=numpy.float64)
+        powers = numpy.asarray(powers, dtype=numpy.float64)
+        # the duration of each measurement: the first has the duration 1
+        durations = numpy.ones(len(timestamps))
+        durations[1:] = numpy.maximum(1, timestamps[1:] - timestamps[:-1])
+        inBand = powers[:, None] >= self._limitsPower[None, :]
+        # cumsum() adds in the same order as the reference (identical rounding):
+        sums = numpy.cumsum(numpy.where(inBand, durations[:, None], 0.0), axis=0)[-1]
+        self.powerValues = [0 if not inBand[:, ix].any() else float(sums[ix]) for ix in range(len(sums))]
+        self.energyMin = min(1E99, float(totals.min()))
+        self.energyMax = max(0, float(totals.max()))
+        resets = numpy.flatnonzero(totals[1:] < totals[:-1]) + 1
+        dayEnergy = 0
+        minTotal = float(totals[0])
+        for ix in resets.tolist():
+            dayEnergy += float(totals[ix - 1]) - minTotal
+            minTotal = 0.0
+        dayEnergy += float(totals[-1]) - minTotal
+        valueLastLimit = self.populateTimeRange(timestamps, totals, resets)
+        self.timeValues[self._limitsHoursMax + 1] = max(0, float(totals[-1]) - valueLastLimit)
+        self.energyOfDay = dayEnergy
+        return self
+
+    def populateTimeRange(self, timestamps, totals, resets) -> float:
+        '''Calculates the energy of the observed hours (self.timeValues).
+        Only the measurements changing the state (hour bounds, counter resets) are inspected.
+        @param timestamps: the timestamps of the measurements
+        @param totals: the energy counter of each measurement
+        @param resets: the indexes of the measurements with a reset counter
+        @return: the energy counter at the last hour bound
+        '''
+        seconds = VectorStatistics.localSeconds(timestamps) % 86400
+        hours = seconds // 3600
+        isReset = numpy.zeros(len(totals), dtype=bool)
+        isReset[resets] = True
+        nextHour = max(int(hours[0]) + 1, self._limitsHoursMin)
+        valueLastLimit = float(totals[0])
+        ix = 0
+        while True:
+            candidates = numpy.flatnonzero(isReset[ix + 1:] | (hours[ix + 1:] >= nextHour))
+            if len(candidates) == 0:
+                break
+            ix += 1 + int(candidates[0])
+            total = float(totals[ix])
+            lastTotal = float(totals[ix - 1])
+            currentHour = int(hours[ix])
+            done = bool(isReset[ix])
+            if done:
+                self.timeValues[currentHour if currentHour >= nextHour else currentHour + 1] = \
+                    max(0, lastTotal - valueLastLimit)
+            if currentHour >= nextHour:
+                currentSec = int(seconds[ix])
+                lastCurrentSec = int(seconds[ix - 1])
+                if done:
+                    totalBound = 0
+                elif currentSec - lastCurrentSec != 0:
+                    totalBound = lastTotal + (total - lastTotal) * (
+                        currentHour * 3600 - lastCurrentSec) / (currentSec - lastCurrentSec)
+                else:
+                    totalBound = total
+                if not done:
+                    self.timeValues[currentHour] = max(0, totalBound - valueLastLimit)
+                valueLastLimit = totalBound
+                nextHour += 1
+                if nextHour > self._limitsHoursMax:
+                    break
+        return valueLastLimit
@@ -0,0 +1,200 @@
+'''
+Created on 18.10.2026
+
+@author: wk
+'''
+import unittest
+import datetime
+import os
+import shutil
+from Archive import Archive, ArchiveFile, BitReader, BitWriter, Codec
+from ChartData import ChartData
+
+
+class FakeDb:
+    '''Delivers the events of March 2023 instead of reading the database.
+    '''
+
+    def __init__(self, rows):
+        self.rows = rows
+        self.statements = []
+        self.lines = []
+
+    def dbSelect(self, sql: str, values=None):
+        self.statements.append((sql, values))
+        return [(self.rows[0][0],)]
+
+    def dbIterate(self, sql: str, values=None, chunkSize: int=1000):
+        self.statements.append((sql, values))
+        return iter(list(filter(lambda row: values[0] <= row[0].strftime('%Y-%m-%d') < values[1], self.rows)))
+
+    def log(self, message: str):
+        self.lines.append(message)
+
+    def debug(self, message: str):
+        pass
+
+
+class ArchiveTest(unittest.TestCase):
+    directory = '/tmp/sunmon_archive_test'
+
+    def setUp(self):
+        shutil.rmtree(ArchiveTest.directory, ignore_errors=True)
+
+    @staticmethod
+    def events(count: int=3000):
+        '''Returns the events of one month (one per minute with some gaps), ordered by time.
+        '''
+        rc = []
+        eventTime = datetime.datetime(2023, 3, 1, 0, 0)
+        for ix in range(count):
+            eventTime += datetime.timedelta(seconds=60 if ix % 100 != 0 else 3600 + ix % 7)
+            power = None if ix % 500 == 7 else round(ix % 97 * 12.5, 1)
+            rc.append((eventTime, 5000.0 + ix // 10 * 0.1, power, 230.4 + ix % 3, 0.125, 41.0))
+        return rc
+
+    def testBits(self):
+        writer = BitWriter()
+        writer.write(1, 1)
+        writer.write(0x1234, 16)
+        writer.write(-1, 64)
+        writer.write(5, 3)
+        reader = BitReader(writer.data())
+        self.assertEqual(1, reader.read(1))
+        self.assertEqual(0x1234, reader.read(16))
+        self.assertEqual((1 << 64) - 1, reader.read(64))
+        self.assertEqual(5, reader.read(3))
+        self.assertEqual(11, len(writer.data()))
+
+    def testTimes(self):
+        times = list(range(1680000000, 1680000000 + 60 * 1000, 60))
+        data = Codec.encodeTimes(times)
+        # 64 bits + 1 delta-of-delta of 9 bits + 998 single bits:
+        self.assertEqual((64 + 10 + 998 + 7) // 8, len(data))
+        self.assertEqual(times, Codec.decodeTimes(data, len(times)))
+        times = [5, 3, -10, 70, 2 ** 40, 1000, 1000, 1001, -2 ** 50]
+        self.assertEqual(times, Codec.decodeTimes(Codec.encodeTimes(times), len(times)))
+        self.assertEqual([], Codec.decodeTimes(Codec.encodeTimes([]), 0))
+
+    def testFloats(self):
+        values = [5000.0, 5000.0, 5000.1, 5000.2, None, 0.0, -0.0, 1E300, 5E-324, -17.25, None, None, 230.4]
+        data = Codec.encodeFloats(values)
+        self.assertEqual(list(map(repr, values)), list(map(repr, Codec.decodeFloats(data, len(values)))))
+        constant = [42.5] * 1000
+        self.assertEqual((64 + 999 + 7) // 8, len(Codec.encodeFloats(constant)))
+
+    def testFile(self):
+        os.makedirs(ArchiveTest.directory)
+        filename = ArchiveTest.directory + '/test.time'
+        times = list(range(1000, 1000 + 60 * 2500, 60))
+        ArchiveFile.write(filename, 0, times, None, 1000)
+        file = ArchiveFile(filename)
+        self.assertEqual(2500, file.count)
+        self.assertEqual([(1000, 1000), (61000, 1000), (121000, 500)],
+                         list(map(lambda block: (block[0], block[1]), file.blocks)))
+        self.assertEqual(times[1000:2000], file.decode(1))
+        file.close()
+        with open(filename, 'wb') as fp:
+            fp.write(b'no archive file at all')
+        self.assertRaises(ValueError, ArchiveFile, filename)
+
+    def testArchiveMonth(self):
+        rows = ArchiveTest.events()
+        db = FakeDb(rows)
+        archive = Archive(ArchiveTest.directory, db, blockSize=256)
+        self.assertEqual(1, archive.archive(datetime.date(2023, 4, 15), 'roof'))
+        self.assertEqual(['roof'], db.statements[1][1][2:])
+        self.assertEqual({datetime.date(2023, 3, 1)}, archive.months('roof'))
+        self.assertEqual(set(), archive.months(None))
+        # already archived:
+        self.assertEqual(0, archive.archive(datetime.date(2023, 4, 15), 'roof'))
+        month = archive.month(datetime.date(2023, 3, 1), 'roof')
+        self.assertEqual(3000, month.count)
+        self.assertTrue(os.path.exists(ArchiveTest.directory + '/roof/2023-03.temperature'))
+        # all values of all series:
+        archived = list(archive.rows(datetime.datetime(2023, 3, 1), datetime.datetime(2023, 3, 31, 23, 59, 59),
+                                     'roof', list(Archive.series)))
+        self.assertEqual(list(map(lambda row: (Archive.toSeconds(row[0]),) + row[1:], rows)), archived)
+        # a range in the middle: only the overlapping blocks are decoded
+        first, last = rows[1000][0], rows[1499][0]
+        archived = list(archive.rows(first, last, 'roof', ['apower']))
+        self.assertEqual(list(map(lambda row: (Archive.toSeconds(row[0]), row[2]), rows[1000:1500])), archived)
+        events = list(archive.events(datetime.date(2023, 3, 2), datetime.date(2023, 3, 3), 'roof'))
+        self.assertEqual(list(map(lambda row: row[0:3],
+                                  filter(lambda row: row[0].day == 2, rows))), events)
+
+    def testCovers(self):
+        archive = Archive(ArchiveTest.directory, FakeDb(ArchiveTest.events()))
+        archive.archiveMonth(datetime.date(2023, 3, 1), None)
+        self.assertTrue(archive.covers(datetime.datetime(2023, 3, 5), datetime.datetime(2023, 3, 31, 23), None))
+        self.assertFalse(archive.covers(datetime.datetime(2023, 3, 5), datetime.datetime(2023, 4, 1), None))
+        self.assertFalse(archive.covers(datetime.datetime(2023, 3, 5), datetime.datetime(2023, 3, 6), 'roof'))
+        self.assertEqual([(datetime.date(2023, 2, 20), datetime.date(2023, 3, 1), False),
+                          (datetime.date(2023, 3, 1), datetime.date(2023, 4, 1), True),
+                          (datetime.date(2023, 4, 1), datetime.date(2023, 4, 3), False)],
+                         archive.segments(datetime.date(2023, 2, 20), datetime.date(2023, 4, 3), None))
+
+    def testMerge(self):
+        archived = [(1, 'a'), (3, 'a'), (3, 'b'), (7, 'a')]
+        events = [(0, 'e'), (3, 'e'), (4, 'e'), (9, 'e')]
+        self.assertEqual([(0, 'e'), (1, 'a'), (3, 'a'), (3, 'b'), (4, 'e'), (7, 'a'), (9, 'e')],
+                         list(Archive.merge(archived, events)))
+        self.assertEqual(events, list(Archive.merge([], events)))
+        # a delayed event is merged into an archived month:
+        rows = ArchiveTest.events()
+        db = FakeDb(rows[1:])
+        archive = Archive(ArchiveTest.directory, db)
+        archive.archiveMonth(datetime.date(2023, 3, 1), 'roof')
+        db.rows = rows[0:2]
+        self.assertEqual(3000, archive.archiveMonth(datetime.date(2023, 3, 1), 'roof'))
+        self.assertEqual(['roof'], archive.devices(datetime.date(2023, 3, 1)))
+        self.assertEqual([], archive.devices(datetime.date(2023, 4, 1)))
+        archived = list(archive.rows(datetime.datetime(2023, 3, 1), datetime.datetime(2023, 3, 31, 23, 59, 59),
+                                     'roof', list(Archive.series)))
+        self.assertEqual(list(map(lambda row: (Archive.toSeconds(row[0]),) + row[1:], rows)), archived)
+
+    def testChartData(self):
+        rows = ArchiveTest.events()
+        db = FakeDb(rows)
+        archive = Archive(ArchiveTest.directory, db)
+        archive.archiveMonth(datetime.date(2023, 3, 1), None)
+        chart = ChartData(db, archive=archive)
+        data = chart.query('2023-03-02 00:00', '2023-03-02 23:59', 2000, ['apower', 'total'])
+        self.assertEqual('archive', chart.lastSource)
+        expected = list(filter(lambda row: row[0].day == 2, rows))
+        self.assertEqual(len(expected), len(data))
+        self.assertEqual((int(expected[0][0].timestamp()), expected[0][2], expected[0][1]), data[0])
+        data = list(chart.iterate('2023-03-02 00:00', '2023-03-02 23:59', 20, ['apower', 'total']))
+        self.assertEqual(3600, chart.lastBucket)
+        self.assertEqual(24, len(data))
+        hour = list(filter(lambda row: row[0].hour == 5, expected))
+        powers = list(filter(lambda value: value is not None, map(lambda row: row[2], hour)))
+        self.assertEqual((int(hour[0][0].replace(minute=0, second=0).timestamp()), sum(powers) / len(powers),
+                          max(map(lambda row: row[1], hour))), data[5])
+        # outside of the archive:
+        chart.query('2023-04-02 00:00', '2023-04-02 23:59', 2000)
+        self.assertEqual('events', chart.lastSource)
+
+    def testChartDataMixed(self):
+        rows = ArchiveTest.events()
+        db = FakeDb(rows)
+        archive = Archive(ArchiveTest.directory, db)
+        archive.archiveMonth(datetime.date(2023, 3, 1), None)
+        chart = ChartData(db, archive=archive)
+        # March is archived, April is read from the database:
+        data = chart.query('2023-03-02 00:00', '2023-04-01 23:59', 1000, ['apower', 'total'])
+        self.assertEqual('archive+group', chart.lastSource)
+        self.assertEqual(['2023-04-01 00:00:00', '2023-04-01 23:59:00'], db.statements[-1][1])
+        bucket = chart.lastBucket
+        buckets = set(map(lambda row: int(row[0].timestamp()) // bucket * bucket,
+                          filter(lambda row: row[0].day >= 2 and row[2] is not None, rows)))
+        self.assertEqual(len(buckets) + 1, len(data))
+        self.assertEqual(min(buckets), data[0][0])
+        self.assertEqual((rows[0][0],), data[-1])
+        data = list(chart.iterate('2023-03-02 00:00', '2023-04-01 23:59', 1000, ['apower', 'total']))
+        self.assertEqual('archive+group', chart.lastSource)
+        self.assertEqual(len(buckets), len(data))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,82 @@
+'''
+Created on 18.10.2026
+
+@author: wk
+'''
+import unittest
+from ChartData import ChartData
+
+
+class FakeDb:
+    '''Records the SQL statements instead of executing them.
+    '''
+
+    def __init__(self):
+        self.statements = []
+
+    def dbSelect(self, sql: str, values=None):
+        self.statements.append((sql, values))
+        return [(1680000000, 100.0, 5000.0)]
+
+    def dbIterate(self, sql: str, values=None):
+        self.statements.append((sql, values))
+        return iter([(1680000000, 100.0, 5000.0)])
+
+    def debug(self, message: str):
+        pass
+
+
+class ChartDataTest(unittest.TestCase):
+
+    def testBucket(self):
+        chart = ChartData(FakeDb())
+        # one day, 1000 pixels: 86.4 sec per pixel
+        self.assertEqual(0, chart.bucket(86400, 1000))
+        # one week: 604.8 sec per pixel
+        self.assertEqual(600, chart.bucket(7 * 86400, 1000))
+        # one year: 31536 sec per pixel
+        self.assertEqual(21600, chart.bucket(365 * 86400, 1000))
+        self.assertEqual(60, ChartData(FakeDb(), sampleInterval=10).bucket(86400, 1000))
+
+    def testPlan(self):
+        chart = ChartData(FakeDb(), 'roof')
+        (source, bucket, sql, params) = chart.plan('2023-03-28 4:00', '2023-03-28 22:00', 1000, ['apower', 'total'])
+        self.assertEqual('events', source)
+        self.assertEqual(0, bucket)
+        self.assertIn('event_apower,event_total', sql)
+        self.assertEqual(['2023-03-28 4:00', '2023-03-28 22:00', 'roof'], params)
+        (source, bucket, sql, params) = chart.plan('2023-03-01 00:00:00', '2023-03-31 23:59:59', 1000)
+        self.assertEqual('group', source)
+        self.assertEqual(1800, bucket)
+        self.assertIn('GROUP BY', sql)
+        self.assertIn('AVG(event_voltage)', sql)
+        self.assertIn('MAX(event_total)', sql)
+
+    def testRollup(self):
+        db = FakeDb()
+        chart = ChartData(db, useRollup=True)
+        (source, bucket, sql, params) = chart.plan('2023-03-01 00:00', '2023-03-31 23:59', 1000, ['apower', 'total'])
+        self.assertEqual('events_5m', source)
+        (source, bucket, sql, params) = chart.plan('2022-01-01 00:00', '2022-12-31 23:59', 1000, ['apower', 'total'])
+        self.assertEqual('events_1h', source)
+        self.assertEqual(21600, bucket)
+        self.assertIn('FROM events_1h', sql)
+        # the rollup tables do not contain the voltage:
+        (source, bucket, sql, params) = chart.plan('2022-01-01 00:00', '2022-12-31 23:59', 1000, ['voltage'])
+        self.assertEqual('group', source)
+        rows = chart.query('2022-01-01 00:00', '2022-12-31 23:59', 1000, ['apower', 'total'])
+        self.assertEqual(1, len(rows))
+        self.assertEqual('events_1h', chart.lastSource)
+        self.assertEqual(1, len(db.statements))
+
+
+    def testIterate(self):
+        db = FakeDb()
+        chart = ChartData(db, None, 60, True)
+        rows = chart.iterate('2023-01-01 00:00:00', '2023-12-31 23:59:59', 1000, ['apower'])
+        self.assertEqual('events_1h', chart.lastSource)
+        self.assertEqual([(1680000000, 100.0, 5000.0)], list(rows))
+        self.assertEqual(1, len(db.statements))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -29,6 +29,7 @@ nix=FAlse
 first=1.9.2022
 next=2022-07-23
 wrong=2022-13-33
+latitude=47.811
 ''')
 
     def testAsString(self):
@@ -52,6 +53,14 @@ wrong=2022-13-33
         self.assertEqual(config.asString('key.sub.key'), 'abc')
         self.assertEqual(config.asString('word-subword'), 'xyz')
 
+    def testAsFloat(self):
+        config = Configuration(ConfigurationTest.configurationFile)
+        self.assertEqual(config.asFloat('latitude'), 47.811)
+        self.assertEqual(config.asFloat('key'), 123.0)
+        self.assertEqual(config.asFloat('missing', 1.5), 1.5)
+        self.assertEqual(config.asFloat('key.sub.key', 2.5), 2.5)
+        self.assertEqual(config.errorsAsString(), '+++ key.sub.key is not a number: abc')
+
     def testHasKey(self):
         config = Configuration(ConfigurationTest.configurationFile)
         self.assertTrue(config.hasKey('key.sub.key'))
@@ -0,0 +1,107 @@
+'''
+Created on 18.10.2026
+
+@author: wk
+'''
+import unittest
+import datetime
+import io
+import json
+from EventImport import EventReader
+
+
+class EventReaderTest(unittest.TestCase):
+
+    def testToTimestamp(self):
+        timestamp = int(datetime.datetime(2023, 3, 28, 12, 34, 56).timestamp())
+        self.assertEqual(timestamp, EventReader.toTimestamp('2023-03-28 12:34:56'))
+        self.assertEqual(timestamp, EventReader.toTimestamp('2023-03-28T12:34:56.123'))
+        self.assertEqual(timestamp - 56, EventReader.toTimestamp('2023-03-28 12:34'))
+        self.assertEqual(1680000000, EventReader.toTimestamp(1680000000))
+        self.assertEqual(1680000000, EventReader.toTimestamp('1680000000123'))
+
+    def testFlatten(self):
+        self.assertEqual({'apower': 1, 'aenergy.total': 2, 'temperature.tc': 3},
+                         EventReader.flatten({'apower': 1, 'aenergy': {'total': 2}, 'temperature': {'tC': 3}}))
+
+    def testCsv(self):
+        fn = '/tmp/eventimport_test.csv'
+        with open(fn, 'w') as fp:
+            fp.write('''time;apower;total;voltage;current;temperature
+2023-03-28 12:00:00;120.5;5000.25;230.1;0.52;40.5
+2023-03-28 12:01:00;121.5;5002.25;;;
+wrong;1;2;3;4;5
+1680004860;122.5;5004.25;231;0.53;41
+''')
+        reader = EventReader()
+        reader.printErrors = False
+        events = list(reader.read(fn))
+        self.assertEqual(3, len(events))
+        self.assertEqual(int(datetime.datetime(2023, 3, 28, 12, 0, 0).timestamp()), events[0][0])
+        self.assertEqual((5000.25, 120.5, 230.1, 0.52, 40.5), events[0][1:])
+        self.assertEqual((5002.25, 121.5, None, None, None), events[1][1:])
+        self.assertEqual(1680004860, events[2][0])
+        self.assertEqual(1, reader.countErrors)
+
+    def testJsonLines(self):
+        fn = '/tmp/eventimport_test.jsonl'
+        with open(fn, 'w') as fp:
+            fp.write('''{"apower": 10.5, "voltage": 230, "current": 0.1, "aenergy": {"total": 100.5, "minute_ts": 1680000000}, "temperature": {"tC": 30.5}}
+
+{"apower": 11.5, "voltage": 231, "current": 0.2, "aenergy": {"total": 101.5, "minute_ts": 1680000060}, "temperature": {"tC": 31.5}}
+''')
+        events = list(EventReader().read(fn))
+        self.assertEqual([(1680000000, 100.5, 10.5, 230.0, 0.1, 30.5),
+                          (1680000060, 101.5, 11.5, 231.0, 0.2, 31.5)], events)
+
+    def testJsonLinesError(self):
+        fn = '/tmp/eventimport_test.jsonl'
+        with open(fn, 'w') as fp:
+            fp.write('''{"event_time": "2023-03-28 12:00:00", "event_total": 7}
+{"event_time": "2023-03-28 12:01:00", "event_tot
+{"event_time": "2023-03-28 12:02:00", "event_total": 9}
+''')
+        reader = EventReader()
+        reader.printErrors = False
+        # the invalid line is skipped:
+        events = list(reader.read(fn))
+        self.assertEqual([7.0, 9.0], list(map(lambda event: event[1], events)))
+        self.assertEqual(1, reader.countErrors)
+        self.assertIn(f'{fn}-2:', reader.errorsAsString())
+
+    def testJsonArray(self):
+        fn = '/tmp/eventimport_test.json'
+        with open(fn, 'w') as fp:
+            fp.write(''' [{"event_time": "2023-03-28 12:00:00", "event_total": 7, "event_apower": 1},
+{"event_time": "2023-03-28 12:01:00", "event_total": 8, "event_apower": 2}]''')
+        events = list(EventReader().read(fn))
+        self.assertEqual(2, len(events))
+        self.assertEqual((8.0, 2.0, None, None, None), events[1][1:])
+
+    def testIterateArray(self):
+        items = [{'event_time': 1680000000 + ix * 60, 'event_total': 100.5 + ix, 'text': 'x' * (ix % 13)}
+                 for ix in range(500)]
+        data = ' [\n' + ',\n'.join(map(json.dumps, items)) + '\n] '
+        # the items cross the buffer boundaries:
+        self.assertEqual(items, list(EventReader.iterateArray(io.StringIO(data), 7)))
+        self.assertEqual([1, 22, -3.5, 'a,b', [1, [2]], None],
+                         list(EventReader.iterateArray(io.StringIO('[1,22 , -3.5,"a,b",[1,[2]],null]'), 3)))
+        self.assertEqual([], list(EventReader.iterateArray(io.StringIO('[ ]'), 1)))
+        self.assertRaises(ValueError, list, EventReader.iterateArray(io.StringIO('[{"a": 1}, {"b": '), 4))
+        self.assertRaises(ValueError, list, EventReader.iterateArray(io.StringIO('[{"a": 1}'), 4))
+        self.assertRaises(ValueError, list, EventReader.iterateArray(io.StringIO('{"a": 1}'), 4))
+
+    def testJsonArrayError(self):
+        fn = '/tmp/eventimport_test.json'
+        with open(fn, 'w') as fp:
+            fp.write('''[{"event_time": "2023-03-28 12:00:00", "event_total": 7},
+{"event_time": "2023-03-28 12:01:00", "event_total": 8}, {"event_time": ''')
+        reader = EventReader()
+        reader.printErrors = False
+        # the events before the error are delivered:
+        self.assertEqual(2, len(list(reader.read(fn))))
+        self.assertEqual(1, reader.countErrors)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,179 @@
+'''
+Created on 18.10.2026
+
+@author: wk
+'''
+import unittest
+import datetime
+import os
+import shutil
+import threading
+from Journal import Journal
+
+
+class FakeLogger:
+    '''Collects the messages.
+    '''
+
+    def __init__(self):
+        self.lines = []
+        self.errors = []
+
+    def log(self, message: str):
+        self.lines.append(message)
+
+    def error(self, message: str):
+        self.errors.append(message)
+
+
+class FakeStore:
+    '''Stores the replayed events in memory, fails on demand.
+    '''
+
+    def __init__(self):
+        self.rows = []
+        self.calls = 0
+        self.failing = False
+        self.stored = threading.Event()
+
+    def store(self, rows):
+        self.calls += 1
+        if self.failing:
+            raise Exception('database not available')
+        self.rows.extend(rows)
+        self.stored.set()
+
+
+class JournalTest(unittest.TestCase):
+    directory = '/tmp/sunmon_journal_test'
+    filename = directory + '/journal.dat'
+
+    def setUp(self):
+        shutil.rmtree(JournalTest.directory, ignore_errors=True)
+
+    @staticmethod
+    def events(day: str, count: int, device: str='roof'):
+        rc = []
+        for ix in range(count):
+            eventTime = f'{day} {8 + ix // 60:02d}:{ix % 60:02d}:00'
+            rc.append((eventTime, 5000.0 + ix, 100.0 + ix, 230.5, None if ix == 1 else 0.4, 40.0, device,
+                       eventTime, 'monitor'))
+        return rc
+
+    def testRecord(self):
+        row = ('2023-03-28 12:34:56', 5000.25, 123.5, None, 0.5, 41.0, 'roof', '2023-03-28 12:35:00', 'monitor')
+        data = Journal.encode(row)
+        self.assertEqual(Journal.record.size, len(data))
+        self.assertEqual(row, Journal.decode(data))
+        self.assertEqual(None, Journal.decode(data[0:-1] + b'x'))
+        self.assertEqual(None, Journal.decode(bytes(Journal.record.size)))
+        row = ('2023-03-28 12:34:56', 1.0, 2.0, 3.0, 4.0, 5.0, None, '2023-03-28 12:35:00', 'monitor')
+        self.assertEqual(row, Journal.decode(Journal.encode(row)))
+        # multi-byte names are truncated on a character boundary:
+        row = ('2023-03-28 12:34:56', 1.0, 2.0, 3.0, 4.0, 5.0, 'Dachs' + 14 * 'ü', '2023-03-28 12:35:00', 'x' + 6 * 'ü')
+        self.assertEqual(row[0:6] + ('Dachs' + 13 * 'ü', row[7], 'x' + 5 * 'ü'), Journal.decode(Journal.encode(row)))
+
+    def testAppendAndReopen(self):
+        journal = Journal(JournalTest.filename, growRecords=16)
+        journal.append(JournalTest.events('2023-03-27', 10))
+        journal.append(JournalTest.events('2023-03-28', 20) + JournalTest.events('2023-03-27', 1, 'late'))
+        self.assertEqual(31, journal.count)
+        self.assertEqual(32, journal.capacity())
+        journal.close()
+        journal = Journal(JournalTest.filename, growRecords=16)
+        self.assertEqual(31, journal.pending())
+        self.assertEqual({'2023-03-27': 0, '2023-03-28': 10}, journal._index)
+        rows = journal.events(datetime.datetime(2023, 3, 28, 8, 5), datetime.datetime(2023, 3, 28, 8, 9))
+        self.assertEqual(JournalTest.events('2023-03-28', 10)[5:10], rows)
+        # the late event of the previous day is found too:
+        rows = journal.events(datetime.datetime(2023, 3, 27), datetime.datetime(2023, 3, 27, 23, 59), 'late')
+        self.assertEqual(JournalTest.events('2023-03-27', 1, 'late'), rows)
+        journal.close()
+        # the index is rebuilt from the records:
+        os.unlink(JournalTest.filename + '.idx')
+        journal = Journal(JournalTest.filename, growRecords=16)
+        self.assertEqual({'2023-03-27': 0, '2023-03-28': 10}, journal._index)
+        journal.close()
+
+    def testRecovery(self):
+        journal = Journal(JournalTest.filename)
+        journal.append(JournalTest.events('2023-03-28', 5))
+        # a crash before the header update: the checksums of the records are valid
+        journal.count = 3
+        journal.writeHeader()
+        journal.close()
+        logger = FakeLogger()
+        journal = Journal(JournalTest.filename, logger)
+        self.assertEqual(5, journal.count)
+        self.assertEqual(['journal: 2 record(s) recovered'], logger.lines)
+        journal.close()
+        with open(JournalTest.filename, 'r+b') as fp:
+            fp.write(b'XXXX')
+        self.assertRaises(ValueError, Journal, JournalTest.filename)
+
+    def testReplay(self):
+        store = FakeStore()
+        journal = Journal(JournalTest.filename, FakeLogger())
+        journal.append(JournalTest.events('2023-03-28', 25))
+        self.assertEqual(25, journal.replay(store.store, 10))
+        self.assertEqual(3, store.calls)
+        self.assertEqual(JournalTest.events('2023-03-28', 25), store.rows)
+        self.assertEqual(0, journal.pending())
+        self.assertEqual(0, journal.replay(store.store))
+        journal.append(JournalTest.events('2023-03-29', 2))
+        store.failing = True
+        self.assertRaises(Exception, journal.replay, store.store)
+        self.assertEqual(2, journal.pending())
+        journal.close()
+        journal = Journal(JournalTest.filename)
+        self.assertEqual(25, journal.drained)
+        journal.close()
+
+    def testDrainer(self):
+        store = FakeStore()
+        logger = FakeLogger()
+        journal = Journal(JournalTest.filename, logger)
+        store.failing = True
+        journal.append(JournalTest.events('2023-03-28', 3))
+        journal.startDrainer(store.store, 100, 1)
+        # the database is down: the events stay in the journal
+        self.assertFalse(store.stored.wait(0.3))
+        self.assertEqual(3, journal.pending())
+        store.failing = False
+        self.assertTrue(store.stored.wait(5))
+        journal.stopDrainer(True, store.store)
+        self.assertEqual(0, journal.pending())
+        self.assertEqual(3, len(store.rows))
+        self.assertTrue(journal.countFailures >= 1)
+        self.assertTrue(len(logger.errors) >= 1)
+        journal.close()
+
+    def testCompact(self):
+        store = FakeStore()
+        journal = Journal(JournalTest.filename, keepDays=1, growRecords=16)
+        today = datetime.date.today()
+        days = list(map(lambda days: (today - datetime.timedelta(days=days)).strftime('%Y-%m-%d'), (3, 2, 1, 0)))
+        for day in days:
+            journal.append(JournalTest.events(day, 5))
+        # as if the journal were created before these days:
+        journal.start = 0
+        # nothing is removed before the replay:
+        self.assertEqual(0, journal.compact())
+        journal.replay(store.store)
+        journal.append(JournalTest.events(days[-1], 1, 'new'))
+        self.assertEqual(10, journal.compact())
+        self.assertEqual(11, journal.count)
+        self.assertEqual(1, journal.pending())
+        self.assertEqual({days[2]: 0, days[3]: 5}, journal._index)
+        self.assertTrue(journal.covers(today - datetime.timedelta(days=1)))
+        self.assertFalse(journal.covers(today - datetime.timedelta(days=2)))
+        self.assertEqual(JournalTest.events(days[-1], 5) + JournalTest.events(days[-1], 1, 'new'),
+                         journal.events(datetime.datetime.combine(today, datetime.time())))
+        journal.close()
+        journal = Journal(JournalTest.filename)
+        self.assertEqual((11, 10), (journal.count, journal.drained))
+        journal.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,259 @@
+'''
+Created on 18.10.2026
+
+@author: wk
+'''
+import unittest
+import sqlite3
+import datetime
+import os.path
+import threading
+from MyDb import MyDb, DbPool, StatementCache
+from QueryStats import QueryStats
+
+
+class FakeCursor:
+    '''Records the statements of a fake connection.
+    '''
+
+    def __init__(self, connection):
+        self._connection = connection
+        self.rowcount = 0
+        self.description = (('id', 3),)
+
+    def execute(self, sql: str, values=None):
+        self._connection.statements.append((sql, values))
+        self.rowcount = 1
+
+    def executemany(self, sql: str, rows):
+        self._connection.statements.append((sql, rows))
+        self.rowcount = len(rows)
+
+    def fetchall(self):
+        return [(self._connection.id,)]
+
+    def close(self):
+        pass
+
+
+class FakeConnection:
+    '''A connection without database.
+    '''
+
+    def __init__(self, id: int):
+        self.id = id
+        self.alive = True
+        self.closed = False
+        self.statements = []
+        self.countCursors = 0
+
+    def cursor(self, prepared: bool=False):
+        self.countCursors += 1
+        return FakeCursor(self)
+
+    def ping(self, reconnect: bool=False):
+        if not self.alive:
+            raise OSError('gone away')
+
+    def close(self):
+        self.closed = True
+
+
+class MyDbTest(unittest.TestCase):
+
+    def setUp(self):
+        self._connections = []
+        self._now = 0.0
+
+    def connect(self):
+        rc = FakeConnection(len(self._connections) + 1)
+        self._connections.append(rc)
+        return rc
+
+    def testPoolReuse(self):
+        pool = DbPool(self.connect, 2, 30, lambda: self._now)
+        first = pool.acquire()
+        pool.release(first)
+        self.assertIs(first, pool.acquire())
+        second = pool.acquire()
+        self.assertIsNot(first, second)
+        self.assertEqual(2, pool.countConnects)
+        with self.assertRaises(TimeoutError):
+            pool.acquire(0.01)
+        pool.release(second)
+        pool.release(first)
+        pool.close()
+        self.assertTrue(first.closed and second.closed)
+
+    def testPoolHealthCheck(self):
+        pool = DbPool(self.connect, 2, 30, lambda: self._now)
+        first = pool.acquire()
+        pool.release(first)
+        first.alive = False
+        # idle for a short time: no check
+        self._now = 10
+        self.assertIs(first, pool.acquire())
+        pool.release(first)
+        self._now = 100
+        second = pool.acquire()
+        self.assertIsNot(first, second)
+        self.assertTrue(first.closed)
+        self.assertEqual(1, pool.countReplaced)
+
+    def testPoolBroken(self):
+        pool = DbPool(self.connect, 1, 30, lambda: self._now)
+        first = pool.acquire()
+        pool.release(first, True)
+        self.assertTrue(first.closed)
+        self.assertIsNot(first, pool.acquire())
+
+    def testPoolThreads(self):
+        pool = DbPool(self.connect, 3)
+        inUse = []
+        maximum = [0]
+        lock = threading.Lock()
+
+        def work():
+            for ix in range(50):
+                connection = pool.acquire()
+                with lock:
+                    self.assertNotIn(connection, inUse)
+                    inUse.append(connection)
+                    maximum[0] = max(maximum[0], len(inUse))
+                with lock:
+                    inUse.remove(connection)
+                pool.release(connection)
+        threads = [threading.Thread(target=work) for ix in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertLessEqual(maximum[0], 3)
+        self.assertLessEqual(pool.countConnects, 3)
+
+    def testPooledStatements(self):
+        db = MyDb()
+        db._pool = DbPool(self.connect, 2)
+        self.assertEqual([(1,)], db.dbSelect('select 1;'))
+        self.assertEqual(1, db.dbExecute('delete from x where y=%s;', (3,)))
+        db.dbExecuteMany('insert into x values (%s);', [(1,), (2,)])
+        self.assertEqual(1, len(self._connections))
+        self.assertEqual(3, len(self._connections[0].statements))
+        with db.dbSession() as cursor:
+            cursor.execute('select 2;')
+            with db.dbSession() as cursor2:
+                cursor2.execute('select 3;')
+        self.assertEqual(2, len(self._connections))
+        db.dbClose()
+        self.assertTrue(self._connections[1].closed)
+
+    def testSelectChunks(self):
+        fn = '/tmp/mydb_test.sqlite'
+        for suffix in ('', '-wal', '-shm'):
+            if os.path.exists(fn + suffix):
+                os.unlink(fn + suffix)
+        db = MyDb()
+        db._driver = 'sqlite'
+        db._dbFile = fn
+        db.dbConnect()
+        db.dbExecute('create table t (t_id int PRIMARY KEY AUTO_INCREMENT, t_time datetime);')
+        db.dbExecuteMany('INSERT INTO t (t_time) VALUES (%s);',
+                         list(map(lambda ix: (f'2023-03-28 12:00:{ix:02d}',), range(25))))
+        # the shared connection is used, no connection per query:
+        connections = []
+        newConnection = db._dbNewConnection
+        db._dbNewConnection = lambda: connections.append(1) or newConnection()
+        chunks = list(db.dbSelectChunks('SELECT t_id, t_time FROM t ORDER BY t_id;', None, 10))
+        self.assertEqual([10, 10, 5], list(map(len, chunks)))
+        self.assertEqual((25, datetime.datetime(2023, 3, 28, 12, 0, 24)), chunks[-1][-1])
+        # statements while iterating, early stop:
+        for row in db.dbIterate('SELECT t_id FROM t WHERE t_id<=%s ORDER BY t_id;', (20,), 3):
+            db.dbExecute('UPDATE t SET t_time=NULL WHERE t_id=%s;', (row[0],))
+            if row[0] == 5:
+                break
+        self.assertEqual([(5,)], db.dbSelect('SELECT COUNT(*) FROM t WHERE t_time IS NULL;'))
+        self.assertEqual([], connections)
+        db.dbClose()
+
+    def testSqliteVersion(self):
+        db = MyDb()
+        db._driver = 'sqlite'
+        db._dbFile = '/tmp/mydb_test.sqlite'
+        minimum = MyDb.sqliteMinimumVersion
+        try:
+            MyDb.sqliteMinimumVersion = (sqlite3.sqlite_version_info[0] + 1, 0, 0)
+            self.assertRaises(sqlite3.NotSupportedError, db._dbNewSqliteConnection)
+        finally:
+            MyDb.sqliteMinimumVersion = minimum
+
+    def testStatementCache(self):
+        db = MyDb()
+        db._statementCacheSize = 2
+        db._pool = DbPool(self.connect, 1)
+        for ix in range(3):
+            db.dbExecute('UPDATE x SET y=%s;', (ix,))
+        db.dbSelect('SELECT y FROM x WHERE y=%s;', (1,))
+        db.dbSelect('SELECT z FROM x WHERE y=%s;', (1,))
+        db.dbExecute('ALTER TABLE x ADD COLUMN w int;', ())
+        db.dbSelect('SELECT y FROM x;')
+        connection = self._connections[0]
+        cache = connection._myDbStatements
+        self.assertEqual((2, 3), (cache.countHits, cache.countMisses))
+        # 3 prepared cursors (one evicted), 2 statements not preparable:
+        self.assertEqual(5, connection.countCursors)
+        self.assertEqual(['SELECT y FROM x WHERE y=%s;', 'SELECT z FROM x WHERE y=%s;'], list(cache._cursors))
+
+    def testShortFloat(self):
+        self.assertEqual(7.73799, StatementCache.shortFloat(7.737989902496338))
+        self.assertEqual(5244.2, StatementCache.shortFloat(5244.2001953125))
+        self.assertEqual(0.0, StatementCache.shortFloat(0.0))
+        self.assertIsNone(StatementCache.shortFloat(None))
+
+        class Cursor:
+            description = (('day_date', 10), ('day_energy', 4), ('sum', 5))
+        self.assertEqual([(1, 260.1, 260.100006103515625)],
+                         StatementCache.textValues(Cursor(), [(1, 260.100006103515625, 260.100006103515625)]))
+
+    def testStats(self):
+        db = MyDb()
+        db._pool = DbPool(self.connect, 1)
+        self.assertEqual([], db.dbStatsReport())
+        db._stats = QueryStats()
+        db.dbSelect('SELECT id FROM x WHERE y=%s;', (1,))
+        db.dbSelect('SELECT id FROM x WHERE y=%s;', (2,))
+        db.dbExecute('UPDATE x SET y=3;')
+        db.dbExecuteMany('INSERT INTO x (y) VALUES (%s);', [(1,), (2,), (3,)])
+        statements = dict(map(lambda item: (item['sql'], item), db.dbStats().statements()))
+        self.assertEqual((2, 2), (statements['SELECT id FROM x WHERE y=?;']['count'],
+                                  statements['SELECT id FROM x WHERE y=?;']['rows']))
+        self.assertEqual(16, statements['SELECT id FROM x WHERE y=?;']['bytesReceived'])
+        self.assertEqual(3, statements['INSERT INTO x (y) VALUES (?);']['rows'])
+        self.assertEqual(1, statements['UPDATE x SET y=?;']['count'])
+        self.assertEqual(7, len(db.dbStatsReport()))
+        # only slow queries are logged: the sizes are not estimated
+        db._stats = QueryStats(False, 10000)
+        sizeOf = QueryStats.sizeOf
+        try:
+            QueryStats.sizeOf = staticmethod(lambda value: self.fail('sizeOf() called'))
+            db.dbSelect('SELECT id FROM x WHERE y=%s;', (1,))
+            db.dbExecuteMany('INSERT INTO x (y) VALUES (%s);', [(1,), (2,), (3,)])
+        finally:
+            QueryStats.sizeOf = sizeOf
+        self.assertEqual([], db.dbStatsReport())
+
+    def testTranslate(self):
+        self.assertEqual('SELECT a FROM t WHERE b=? AND c<?;', MyDb.dbTranslate('SELECT a FROM t WHERE b=%s AND c<%s;'))
+        self.assertEqual('create table t (\n  t_id INTEGER PRIMARY KEY,\n  t_x float);',
+                         MyDb.dbTranslate('create table t (\n  t_id int PRIMARY KEY AUTO_INCREMENT,\n  t_x float);'))
+        self.assertEqual('INSERT INTO t (a, b) VALUES (?, ?) ON CONFLICT DO UPDATE SET '
+                         + 'b=IIF(excluded.a < a, excluded.b, b), a=MIN(a, excluded.a)',
+                         MyDb.dbTranslate('INSERT INTO t (a, b) VALUES (%s, %s) ON DUPLICATE KEY UPDATE '
+                                          + 'b=IF(VALUES(a) < a, VALUES(b), b), a=LEAST(a, VALUES(a))'))
+
+    def testSqliteRows(self):
+        self.assertEqual([(datetime.date(2023, 3, 28), datetime.datetime(2023, 3, 28, 12, 34, 56), 'roof', 2.5)],
+                         MyDb._sqliteRows([('2023-03-28', '2023-03-28 12:34:56', 'roof', 2.5)]))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,74 @@
+'''
+Created on 18.10.2026
+
+@author: wk
+'''
+import unittest
+from QueryStats import QueryStats, StatementStats
+
+
+class FakeLogger:
+
+    def __init__(self):
+        self.messages = []
+
+    def log(self, message: str):
+        self.messages.append(message)
+
+
+class QueryStatsTest(unittest.TestCase):
+
+    def testFingerprint(self):
+        self.assertEqual('SELECT day_date FROM days WHERE day_date >= ? order by day_energy limit ?;',
+                         QueryStats.fingerprint('''SELECT day_date FROM days
+WHERE day_date >= '2023-01-01'
+order by day_energy limit 20;'''))
+        self.assertEqual('INSERT INTO t (a, b) VALUES (?...);',
+                         QueryStats.fingerprint('INSERT INTO t (a, b) VALUES (%s, %s);'))
+        self.assertEqual('SELECT FLOOR(unix_timestamp(rollup_start)/?)*? FROM events_5m;',
+                         QueryStats.fingerprint('SELECT FLOOR(unix_timestamp(rollup_start)/300)*300 FROM events_5m;'))
+
+    def testRecord(self):
+        logger = FakeLogger()
+        stats = QueryStats(True, 100, logger)
+        for ms in (0.5, 3, 3, 40, 150):
+            stats.record("SELECT a FROM t WHERE b='x';", ms / 1000, 2, 30, 16)
+        stats.record('DELETE FROM t WHERE b=1;', 0.002, 0, 20, 0, True)
+        self.assertEqual(1, len(logger.messages))
+        self.assertIn("slow query: 150.0 ms rows: 2 SELECT a FROM t WHERE b='x';", logger.messages[0])
+        statements = stats.statements()
+        self.assertEqual(2, len(statements))
+        select = list(filter(lambda item: item['sql'].startswith('SELECT'), statements))[0]
+        self.assertEqual((5, 10, 150, 80, 0), (select['count'], select['rows'], select['bytesSent'],
+                                               select['bytesReceived'], select['errors']))
+        self.assertEqual(2, select['histogram']['<=5ms'])
+        report = stats.report()
+        self.assertEqual(5, len(report))
+        self.assertIn('SELECT a FROM t WHERE b=?;', report[2])
+        self.assertIn('errors: 1', report[3])
+        stats.reset()
+        self.assertEqual([], stats.statements())
+
+    def testPercentile(self):
+        stats = StatementStats('x')
+        for ms in (1, 1, 1, 1, 1, 1, 1, 1, 1, 40):
+            stats.add(ms / 1000, 0, 0, 0, False)
+        self.assertEqual(1.0, stats.percentile(0.5))
+        self.assertEqual(50.0, stats.percentile(0.95))
+        stats.add(9, 0, 0, 0, False)
+        self.assertEqual(9000.0, stats.percentile(1.0))
+
+    def testSlowOnly(self):
+        logger = FakeLogger()
+        stats = QueryStats(False, 10, logger)
+        stats.record('SELECT 1;', 0.02, 1, 9, 8)
+        self.assertEqual([], stats.statements())
+        self.assertEqual(1, len(logger.messages))
+
+    def testSizeOf(self):
+        self.assertEqual(0, QueryStats.sizeOf(None))
+        self.assertEqual(5 + 8 + 8, QueryStats.sizeOf([('roof1', 2.5), (None,)]))
+
+
+if __name__ == '__main__':
+    unittest.main()
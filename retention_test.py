@@ -0,0 +1,124 @@
+'''
+Created on 18.10.2026
+
+@author: wk
+'''
+import unittest
+import datetime
+from Retention import Retention
+
+
+class FakeDb:
+    '''Records the SQL statements and delivers prepared results.
+    '''
+
+    def __init__(self, results=None):
+        self.statements = []
+        # the first words of the statement -> rows
+        self.results = {} if results is None else results
+        self.deleted = []
+        self.driver = 'mysql'
+
+    def dbDriver(self) -> str:
+        return self.driver
+
+    def dbExecute(self, sql: str, values=None):
+        self.statements.append((sql, values))
+        return self.deleted.pop(0) if sql.startswith('DELETE') and len(self.deleted) > 0 else 0
+
+    def dbSelect(self, sql: str, values=None):
+        self.statements.append((sql, values))
+        for key, rows in self.results.items():
+            if key in sql:
+                return rows
+        return []
+
+    def log(self, message: str):
+        pass
+
+
+class FakeArchive:
+    '''Delivers the archived months.
+    '''
+
+    def __init__(self, months):
+        # device -> the archived months
+        self._months = months
+
+    def months(self, device: str):
+        return self._months.get(device, set())
+
+
+class RetentionTest(unittest.TestCase):
+
+    def testMonthStart(self):
+        self.assertEqual(datetime.date(2023, 3, 1), Retention.monthStart(datetime.date(2023, 3, 28)))
+        self.assertEqual(datetime.date(2024, 1, 1), Retention.monthStart(datetime.date(2023, 12, 31), 1))
+        self.assertEqual(datetime.date(2022, 11, 1), Retention.monthStart(datetime.date(2023, 1, 5), -2))
+        self.assertEqual("PARTITION p202312 VALUES LESS THAN (TO_DAYS('2024-01-01'))",
+                         Retention.partitionDefinition(datetime.date(2023, 12, 1)))
+
+    def testPartitionTable(self):
+        db = FakeDb({'information_schema': [], 'min(event_time)': [(datetime.datetime(2023, 1, 15, 8, 0),)]})
+        retention = Retention(db)
+        self.assertIsNone(retention.partitions())
+        retention.partitionTable(2)
+        sql = db.statements[-1][0]
+        self.assertIn('PARTITION BY RANGE (TO_DAYS(event_time))', sql)
+        self.assertIn('PARTITION p202301 ', sql)
+        self.assertIn('PARTITION pmax VALUES LESS THAN MAXVALUE', sql)
+        self.assertIn('PRIMARY KEY (event_id, event_time)', db.statements[-2][0])
+
+    def testAddPartitions(self):
+        today = datetime.date.today()
+        db = FakeDb({'information_schema': [('p' + Retention.monthStart(today, -1).strftime('%Y%m'),), ('pmax',)]})
+        self.assertEqual(3, Retention(db).addPartitions(2))
+        sql = db.statements[-1][0]
+        self.assertIn('REORGANIZE PARTITION pmax', sql)
+        self.assertIn('PARTITION p' + Retention.monthStart(today, 2).strftime('%Y%m'), sql)
+        db = FakeDb({'information_schema': [('p' + Retention.monthStart(today, 2).strftime('%Y%m'),), ('pmax',)]})
+        self.assertEqual(0, Retention(db).addPartitions(2))
+
+    def testPrune(self):
+        db = FakeDb({'information_schema': [('p202301',), ('p202302',), ('p202303',), ('pmax',)]})
+        self.assertEqual(2, Retention(db).prune(datetime.date(2023, 3, 15)))
+        self.assertEqual('ALTER TABLE events DROP PARTITION p202301, p202302;', db.statements[-1][0])
+        db = FakeDb()
+        db.deleted = [10, 10, 3]
+        self.assertEqual(23, Retention(db).prune(datetime.date(2023, 3, 15), 10))
+        self.assertEqual(('2023-03-15',), db.statements[-1][1])
+
+    def testCoveredUntil(self):
+        db = FakeDb({'max(day_date)': [(datetime.date(2023, 3, 27),)], 'dirty_date': [(datetime.date(2023, 3, 20),)],
+                     'GROUP BY rollup_device': [('', datetime.datetime(2023, 3, 28, 10, 0))],
+                     'GROUP BY event_device': [(None, datetime.datetime(2023, 1, 5, 10, 0))]})
+        archive = FakeArchive({None: {datetime.date(2023, 1, 1), datetime.date(2023, 2, 1), datetime.date(2023, 3, 1)}})
+        self.assertEqual(datetime.date(2023, 3, 20), Retention(db).coveredUntil(True, archive))
+        db.results['dirty_date'] = [(None,)]
+        self.assertEqual(datetime.date(2023, 3, 28), Retention(db).coveredUntil(True, archive))
+        db.results['GROUP BY rollup_device'] = []
+        self.assertEqual(datetime.date.min, Retention(db).coveredUntil(True, archive))
+        self.assertEqual(datetime.date(2023, 3, 28), Retention(db).coveredUntil(False, archive))
+        # the archive must contain the months too:
+        self.assertEqual(datetime.date.min, Retention(db).coveredUntil(False, None))
+        self.assertEqual(datetime.date(2023, 1, 1), Retention(db).coveredUntil(
+            False, FakeArchive({None: {datetime.date(2023, 2, 1)}})))
+
+    def testCoveredUntilDevices(self):
+        db = FakeDb({'max(day_date)': [(datetime.date(2023, 3, 27),)], 'dirty_date': [(None,)],
+                     'GROUP BY rollup_device': [('roof', datetime.datetime(2023, 3, 28, 10, 0)),
+                                                ('garage', datetime.datetime(2023, 2, 10, 10, 0))],
+                     'GROUP BY event_device': [('roof', datetime.datetime(2023, 1, 5, 10, 0)),
+                                               ('garage', datetime.datetime(2023, 1, 7, 10, 0))]})
+        # only roof is archived: the events of garage must stay
+        archive = FakeArchive({'roof': {datetime.date(2023, 1, 1), datetime.date(2023, 2, 1), datetime.date(2023, 3, 1)}})
+        self.assertEqual(datetime.date(2023, 1, 1), Retention(db).coveredUntil(False, archive))
+        archive._months['garage'] = {datetime.date(2023, 1, 1)}
+        self.assertEqual(datetime.date(2023, 2, 1), Retention(db).coveredUntil(False, archive))
+        # the archive of all devices covers each device, the rollups of garage end at 2023-02-10:
+        archive._months[None] = {datetime.date(2023, 2, 1), datetime.date(2023, 3, 1)}
+        self.assertEqual(datetime.date(2023, 3, 28), Retention(db).coveredUntil(False, archive))
+        self.assertEqual(datetime.date(2023, 2, 10), Retention(db).coveredUntil(True, archive))
+
+if __name__ == "__main__":
+    unittest.main()
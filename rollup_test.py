@@ -0,0 +1,100 @@
+'''
+Created on 18.10.2026
+
+@author: wk
+'''
+import unittest
+import datetime
+from Rollup import Rollup
+
+
+class FakeDb:
+    '''Records the SQL statements instead of executing them.
+    '''
+
+    def __init__(self):
+        self.statements = []
+        self.rows = []
+        # the first words of the statement -> rows
+        self.results = {}
+
+    def dbExecute(self, sql: str, values=None):
+        self.statements.append((sql, values))
+
+    def dbExecuteMany(self, sql: str, rows):
+        self.statements.append((sql, rows))
+
+    def dbSelect(self, sql: str, values=None):
+        self.statements.append((sql, values))
+        for key, rows in self.results.items():
+            if key in sql:
+                return rows
+        return self.rows
+
+    def log(self, message: str):
+        pass
+
+
+class RollupTest(unittest.TestCase):
+
+    def testBucketStart(self):
+        self.assertEqual('2023-03-28 12:30:00', Rollup.bucketStart('2023-03-28 12:34:56', 5))
+        self.assertEqual('2023-03-28 12:05:00', Rollup.bucketStart('2023-03-28 12:05:00', 5))
+        self.assertEqual('2023-03-28 12:00:00', Rollup.bucketStart('2023-03-28 12:04:59', 5))
+        self.assertEqual('2023-03-28 12:00:00', Rollup.bucketStart('2023-03-28 12:59:59', 60))
+
+    def testAggregate(self):
+        rows = [('2023-03-28 12:01:00', 100.0, 50.0, 'roof'),
+                ('2023-03-28 12:00:00', 99.0, 40.0, 'roof'),
+                (datetime.datetime(2023, 3, 28, 12, 4, 59), 101.0, 70.0, 'roof'),
+                ('2023-03-28 12:05:00', 102.0, 10.0, 'roof'),
+                ('2023-03-28 12:01:00', 7.0, 1.0, None),
+                ('2023-03-28 12:02:00', None, 1.0, None)]
+        buckets = Rollup.aggregate(rows, 5)
+        self.assertEqual(3, len(buckets))
+        bucket = buckets[('2023-03-28 12:00:00', 'roof')]
+        self.assertEqual(3, bucket.count)
+        self.assertEqual(40.0, bucket.powerMin)
+        self.assertEqual(70.0, bucket.powerMax)
+        self.assertEqual(160.0, bucket.powerSum)
+        self.assertEqual('2023-03-28 12:00:00', bucket.timeFirst)
+        self.assertEqual(99.0, bucket.totalFirst)
+        self.assertEqual('2023-03-28 12:04:59', bucket.timeLast)
+        self.assertEqual(101.0, bucket.totalLast)
+        self.assertEqual(1, buckets[('2023-03-28 12:05:00', 'roof')].count)
+        self.assertEqual(1, buckets[('2023-03-28 12:00:00', '')].count)
+        buckets = Rollup.aggregate(rows, 60)
+        self.assertEqual(2, len(buckets))
+        self.assertEqual(4, buckets[('2023-03-28 12:00:00', 'roof')].count)
+
+    def testStoreAndBackfill(self):
+        db = FakeDb()
+        rollup = Rollup(db)
+        rollup.store([('2023-03-28 12:01:00', 100.0, 50.0, 'roof'), ('2023-03-28 12:06:00', 101.0, 60.0, 'roof')])
+        self.assertEqual(2, len(db.statements))
+        self.assertIn('events_5m', db.statements[0][0])
+        self.assertEqual(2, len(db.statements[0][1]))
+        self.assertIn('events_1h', db.statements[1][0])
+        self.assertEqual([('2023-03-28 12:00:00', 'roof', 2, 50.0, 60.0, 110.0, '2023-03-28 12:01:00', 100.0,
+                           '2023-03-28 12:06:00', 101.0)], db.statements[1][1])
+        db.statements.clear()
+        db.rows = [(datetime.datetime(2023, 3, 28, 12, 0, 0), 100.0, 50.0, 'roof')]
+        db.results['min(event_time)'] = [(datetime.datetime(2023, 3, 14, 8, 0, 0),)]
+        self.assertEqual(3, rollup.backfill(datetime.date(2023, 3, 1), datetime.date(2023, 3, 30), None, 7))
+        deletes = list(filter(lambda statement: statement[0].startswith('DELETE'), db.statements))
+        # the backfill starts at the first event: 3 chunks
+        self.assertEqual(6, len(deletes))
+        self.assertEqual(['2023-03-14', '2023-03-21'], deletes[0][1])
+        self.assertEqual(['2023-03-28', '2023-03-30'], deletes[-1][1])
+        # the events are removed (retention): the rollups are kept
+        db.statements.clear()
+        db.rows = []
+        self.assertEqual(0, rollup.backfill(datetime.date(2023, 3, 1), datetime.date(2023, 3, 30)))
+        self.assertEqual([], list(filter(lambda statement: statement[0].startswith('DELETE'), db.statements)))
+        db.results['min(event_time)'] = [(None,)]
+        self.assertEqual(0, rollup.backfill(datetime.date(2023, 3, 1), datetime.date(2023, 3, 30), 'roof'))
+        self.assertEqual(('roof',), db.statements[-1][1])
+
+
+if __name__ == "__main__":
+    unittest.main()
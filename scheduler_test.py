@@ -0,0 +1,99 @@
+'''
+Created on 18.10.2026
+
+@author: wk
+'''
+import unittest
+from Scheduler import Scheduler, AdaptiveInterval
+
+
+class FakeClock:
+    def __init__(self, wallStart: float):
+        self.monotonic = 1000.0
+        self.wallOffset = wallStart - self.monotonic
+        self.sleeps = []
+
+    def clock(self) -> float:
+        return self.monotonic
+
+    def wallClock(self) -> float:
+        return self.monotonic + self.wallOffset
+
+    def sleep(self, seconds: float):
+        self.sleeps.append(seconds)
+        self.monotonic += seconds
+
+    def work(self, seconds: float):
+        self.monotonic += seconds
+
+
+class SchedulerTest(unittest.TestCase):
+
+    def testAligned(self):
+        clock = FakeClock(3600 * 100 + 17.5)
+        scheduler = Scheduler(60, clock.clock, clock.wallClock, clock.sleep)
+        self.assertEqual(0.0, scheduler.wait())
+        self.assertEqual(0.0, clock.wallClock() % 60)
+        self.assertEqual([42.5], clock.sleeps)
+        # the work does not shift the schedule:
+        clock.work(12.25)
+        self.assertEqual(0.0, scheduler.wait())
+        self.assertEqual(0.0, clock.wallClock() % 60)
+        self.assertEqual(47.75, clock.sleeps[1])
+
+    def testSubMinute(self):
+        clock = FakeClock(3600 * 100 + 1)
+        scheduler = Scheduler(5, clock.clock, clock.wallClock, clock.sleep)
+        for ix in range(10):
+            scheduler.wait()
+            self.assertEqual(0.0, clock.wallClock() % 5)
+            self.assertEqual(clock.wallClock(), scheduler.tickTime)
+            clock.work(0.5)
+        self.assertEqual(10, scheduler.countTicks)
+
+    def testSkipMissed(self):
+        clock = FakeClock(3600 * 100)
+        scheduler = Scheduler(10, clock.clock, clock.wallClock, clock.sleep)
+        scheduler.wait()
+        start = clock.clock()
+        # the work takes longer than 3 intervals:
+        clock.work(34)
+        lateness = scheduler.wait()
+        self.assertEqual(4, lateness)
+        self.assertEqual(2, scheduler.countSkipped)
+        self.assertEqual(4, scheduler.lateness)
+        self.assertEqual(clock.wallClock() - 4, scheduler.tickTime)
+        # the next tick is on the grid again:
+        scheduler.wait()
+        self.assertEqual(start + 40, clock.clock())
+
+    def testSetInterval(self):
+        clock = FakeClock(3600 * 100 + 3)
+        scheduler = Scheduler(60, clock.clock, clock.wallClock, clock.sleep)
+        scheduler.wait()
+        clock.work(1)
+        scheduler.setInterval(15)
+        scheduler.wait()
+        self.assertEqual(75.0, clock.wallClock() % 3600)
+
+
+    def testAdaptiveInterval(self):
+        adaptive = AdaptiveInterval(10, 300, 20, 2)
+        self.assertEqual([10, 15, 20, 30, 60, 120, 300], adaptive._steps)
+        self.assertEqual(10, adaptive.update({'a': 100}))
+        self.assertEqual(15, adaptive.update({'a': 105}))
+        self.assertEqual(15, adaptive.update({'a': 110}))
+        self.assertEqual(20, adaptive.update({'a': 110}))
+        # a new device is not a change:
+        self.assertEqual(20, adaptive.update({'a': 110, 'b': 0}))
+        # a fast change of one device:
+        self.assertEqual(15, adaptive.update({'a': 110, 'b': 50}))
+        self.assertEqual(10, adaptive.update({'a': 200, 'b': 50}))
+        for ix in range(20):
+            adaptive.update({'a': 200, 'b': 50})
+        self.assertEqual(300, adaptive.interval)
+        self.assertEqual(300, adaptive.maximum())
+
+
+if __name__ == "__main__":
+    unittest.main()
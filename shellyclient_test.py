@@ -0,0 +1,96 @@
+'''
+Created on 18.10.2026
+
+@author: wk
+'''
+import unittest
+import http.server
+import threading
+import json
+import time
+from ShellyClient import ShellyClient
+
+
+class StatusHandler(http.server.BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        if self.path.startswith('/slow'):
+            time.sleep(1.0)
+        content = json.dumps({'apower': 12.5, 'path': self.path}).encode('utf-8')
+        self.send_response(200)
+        self.send_header('content-type', 'application/json')
+        self.send_header('content-length', str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+        if self.path.startswith('/drop'):
+            # closes the kept alive connection without telling the client:
+            self.close_connection = True
+
+    def log_message(self, format, *args):
+        pass
+
+
+class ShellyClientTest(unittest.TestCase):
+
+    def setUp(self):
+        self._server = http.server.ThreadingHTTPServer(('127.0.0.1', 0), StatusHandler)
+        self._port = self._server.server_address[1]
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+
+    def tearDown(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def testKeepAlive(self):
+        client = ShellyClient('127.0.0.1', self._port, 5)
+        for ix in range(3):
+            data = client.requestJson(f'/status?ix={ix}')
+            self.assertEqual(12.5, data['apower'])
+            self.assertEqual(f'/status?ix={ix}', data['path'])
+        self.assertEqual(1, client.countConnects)
+        self.assertEqual(3, client.countSuccess)
+        self.assertIsNotNone(client.roundTrip)
+        self.assertIsNotNone(client.averageRoundTrip())
+        client.close()
+
+    def testReconnect(self):
+        client = ShellyClient('127.0.0.1', self._port, 5)
+        self.assertIsNotNone(client.request('/status'))
+        # the device closes the kept alive connection:
+        self.assertIsNotNone(client.request('/drop'))
+        time.sleep(0.1)
+        self.assertIsNotNone(client.request('/status'))
+        self.assertEqual(2, client.countConnects)
+        self.assertFalse(client.hasErrors())
+        client.close()
+
+    def testNoRetryAfterTimeout(self):
+        client = ShellyClient('127.0.0.1', self._port, 0.4)
+        client.printErrors = False
+        self.assertIsNotNone(client.request('/status'))
+        start = time.monotonic()
+        self.assertIsNone(client.request('/slow'))
+        # one timeout only, no second attempt on the reused connection:
+        self.assertLess(time.monotonic() - start, 0.75)
+        self.assertEqual(1, client.countConnects)
+        self.assertEqual(1, client.countErrors)
+        client.close()
+
+    def testBackoff(self):
+        client = ShellyClient('127.0.0.1', self._port, 5, backoffMin=100)
+        client.printErrors = False
+        self.tearDown()
+        self.assertIsNone(client.request('/status'))
+        self.assertEqual(1, client.countErrors)
+        self.assertEqual(100, client._backoff)
+        # no connect while waiting:
+        self.assertIsNone(client.request('/status'))
+        self.assertEqual(1, client.countConnects)
+        self.assertIn('waiting for reconnect', client.errorsAsString())
+        self.setUp()
+
+
+if __name__ == "__main__":
+    unittest.main()
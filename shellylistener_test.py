@@ -0,0 +1,121 @@
+'''
+Created on 18.10.2026
+
+@author: wk
+'''
+import unittest
+import threading
+import http.client
+import json
+from ShellyListener import ShellyListener
+
+
+class FakePublisher:
+    '''Sends notifications like a Shelly device.
+    '''
+
+    def __init__(self, port: int, src: str='shellyplus1pm-a8032ab12345'):
+        self._port = port
+        self._src = src
+
+    def publish(self, method: str, params) -> int:
+        message = {'src': self._src, 'dst': 'sunmon', 'method': method, 'params': params}
+        return self.post(json.dumps(message))
+
+    def post(self, body: str) -> int:
+        connection = http.client.HTTPConnection('127.0.0.1', self._port, timeout=5)
+        connection.request('POST', '/', body, {'content-type': 'application/json'})
+        response = connection.getresponse()
+        response.read()
+        connection.close()
+        return response.status
+
+
+class ShellyListenerTest(unittest.TestCase):
+
+    def setUp(self):
+        self._events = []
+        self._listener = ShellyListener('127.0.0.1', 0, self.store)
+        self._listener.printErrors = False
+        self._publisher = FakePublisher(self._listener.address()[1])
+
+    def tearDown(self):
+        self._listener.close()
+
+    def store(self, src: str, status, timestamp: int):
+        self._events.append((src, status, timestamp))
+
+    def send(self, method: str, params) -> int:
+        '''Publishes one notification and lets the listener handle it.
+        '''
+        thread = threading.Thread(target=self._listener.handleRequest)
+        thread.start()
+        rc = self._publisher.publish(method, params)
+        thread.join()
+        return rc
+
+    def testFullStatusAndDelta(self):
+        self.assertEqual(200, self.send('NotifyFullStatus', {'ts': 1660000000.25, 'switch:0': {
+            'id': 0, 'output': True, 'apower': 105.5, 'voltage': 230.1, 'current': 0.51,
+            'aenergy': {'total': 1234.5, 'minute_ts': 1659999960}, 'temperature': {'tC': 45.2, 'tF': 113.4}}}))
+        self.assertEqual(1, len(self._events))
+        src, status, timestamp = self._events[0]
+        self.assertEqual('shellyplus1pm-a8032ab12345', src)
+        self.assertEqual(1660000000, timestamp)
+        self.assertEqual(105.5, status['apower'])
+        self.assertEqual(1234.5, status['aenergy']['total'])
+        # only the changed values:
+        self.send('NotifyStatus', {'ts': 1660000030.0, 'switch:0': {'id': 0, 'apower': 220.0}})
+        self.assertEqual(2, len(self._events))
+        src, status, timestamp = self._events[1]
+        self.assertEqual(220.0, status['apower'])
+        self.assertEqual(230.1, status['voltage'])
+        self.assertEqual(45.2, status['temperature']['tC'])
+        self.assertEqual(1660000030, timestamp)
+
+    def testIncomplete(self):
+        self.send('NotifyStatus', {'ts': 1660000000.0, 'switch:0': {'id': 0, 'apower': 12.0}})
+        self.assertEqual(0, len(self._events))
+        self.send('NotifyStatus', {'ts': 1660000010.0, 'switch:0': {
+            'voltage': 229.0, 'current': 0.1, 'aenergy': {'total': 10.0}, 'temperature': {'tC': 30.0}}})
+        self.assertEqual(1, len(self._events))
+        self.assertEqual(12.0, self._events[0][1]['apower'])
+
+    def testOtherMessages(self):
+        self.assertEqual(200, self.send('NotifyEvent', {'ts': 1660000000.0, 'events': []}))
+        self.send('NotifyStatus', {'ts': 1660000000.0, 'sys': {'uptime': 100}})
+        self.assertEqual(0, len(self._events))
+        self.assertEqual(1, self._listener.countNotifications)
+
+    def testInvalid(self):
+        thread = threading.Thread(target=self._listener.handleRequest)
+        thread.start()
+        self.assertEqual(400, self._publisher.post('no json'))
+        thread.join()
+        self.assertTrue(self._listener.hasErrors())
+
+    def request(self, body: bytes, length: str) -> int:
+        '''Sends a POST request with a given content-length and lets the listener handle it.
+        '''
+        thread = threading.Thread(target=self._listener.handleRequest)
+        thread.start()
+        connection = http.client.HTTPConnection('127.0.0.1', self._listener.address()[1], timeout=5)
+        connection.putrequest('POST', '/')
+        connection.putheader('content-length', length)
+        connection.endheaders(body)
+        response = connection.getresponse()
+        response.read()
+        connection.close()
+        thread.join()
+        return response.status
+
+    def testContentLength(self):
+        self.assertEqual(400, self.request(b'{}', 'abc'))
+        self.assertEqual(400, self.request(b'{}', '-1'))
+        self.assertEqual(413, self.request(b'[' + 70000 * b' ' + b']', '70002'))
+        self.assertIn('too large', self._listener.errorsAsString())
+        self.assertEqual(200, self.request(b'[]', '2'))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,86 @@
+'''
+Created on 18.10.2026
+
+@author: wk
+'''
+import unittest
+import random
+import time
+from ShellySim import Simulator, VirtualDevice, benchmark, percentile
+from ShellyClient import ShellyClient
+
+
+class ShellySimTest(unittest.TestCase):
+
+    def testIrradiance(self):
+        device = VirtualDevice(0, random.Random(1), 6.0, 20.0)
+        self.assertEqual(0.0, device.irradiance(5.0))
+        self.assertEqual(0.0, device.irradiance(21.0))
+        self.assertAlmostEqual(1.0, device.irradiance(13.0))
+        self.assertLess(device.irradiance(8.0), device.irradiance(11.0))
+
+    def testUpdate(self):
+        device = VirtualDevice(0, random.Random(1))
+        noon = time.mktime((2023, 6, 21, 13, 0, 0, 0, 0, -1))
+        device.update(noon)
+        total = device.total
+        self.assertGreater(device.power, 0.0)
+        self.assertLessEqual(device.power, device.clipping)
+        device.update(noon + 60)
+        self.assertGreater(device.total, total)
+        device.update(noon + 120, 1.0)
+        self.assertEqual(0.0, device.total)
+        self.assertEqual(1, device.countResets)
+
+    def testRepeatable(self):
+        noon = time.mktime((2023, 6, 21, 13, 0, 0, 0, 0, -1))
+        values = []
+        for ix in range(2):
+            device = Simulator(3, seed=99).devices[2]
+            for minute in range(10):
+                device.update(noon + 60 * minute)
+            values.append((device.power, device.total))
+        self.assertEqual(values[0], values[1])
+
+    def testServe(self):
+        simulator = Simulator(3)
+        simulator.printMessages = False
+        simulator.start()
+        try:
+            self.assertEqual(3, len(simulator.ports))
+            client = ShellyClient('127.0.0.1', simulator.ports[1], 5)
+            data = client.requestJson('/rpc/Switch.GetStatus?id=0')
+            for key in ('apower', 'voltage', 'current'):
+                self.assertIn(key, data)
+            self.assertIn('total', data['aenergy'])
+            self.assertIn('minute_ts', data['aenergy'])
+            self.assertIn('tC', data['temperature'])
+            data = client.requestJson('/status')
+            self.assertIn('power', data['meters'][0])
+            self.assertIn('total', data['meters'][0])
+            self.assertEqual(1, client.countConnects)
+            client.close()
+            self.assertIn('device.sim2.port=', simulator.monitorConfiguration())
+        finally:
+            simulator.stop()
+
+    def testErrors(self):
+        simulator = Simulator(2)
+        simulator.printMessages = False
+        simulator.errorRate = 1.0
+        simulator.start()
+        try:
+            count, errors, duration, roundTrips = benchmark(simulator, 2, 2)
+            self.assertEqual(4, count)
+            self.assertEqual(4, errors)
+            simulator.errorRate = 0.0
+            simulator.latencyMin = simulator.latencyMax = 0.02
+            count, errors, duration, roundTrips = benchmark(simulator, 2, 2)
+            self.assertEqual(0, errors)
+            self.assertGreaterEqual(percentile(roundTrips, 50), 0.02)
+        finally:
+            simulator.stop()
+
+
+if __name__ == "__main__":
+    unittest.main()
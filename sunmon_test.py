@@ -7,7 +7,12 @@ import unittest
 import datetime
 import time
 import os.path
-from SunMon import Monitor, Statistics, sunriseDistance
+import shutil
+from SunMon import Monitor, Statistics, Device, sunriseDistance
+from ChartData import ChartData
+from Retention import Retention
+from Archive import Archive
+from Journal import Journal
 
 
 class SimpleRandom:
@@ -41,6 +46,9 @@ def gRandom():
 
 
 class SunMonTest(unittest.TestCase):
+    '''Tests with the MySQL database "appsuntest" (see setUp()).
+    Tests without database server belong to SunMonMockTest or SunMonSqliteTest.
+    '''
     configFile = '/tmp/sunmon_test.conf'
     testDay = datetime.datetime(2022, 2, 3, 0, 0)
 
@@ -95,110 +103,6 @@ service.interval=60
         self.clearDays(monitor)
         monitor.dbClose()
 
-    def testStatisticsPopulateMinMax(self):
-        # Format of one row: (event_time, event_total)
-        d1 = SunMonTest.testDay.strftime('%Y-%m-%d')
-        rows1 = ([f'{d1} 10:33:00', 550.0], [f'{d1} 10:35:00', 100.3], [
-                 f'{d1} 10:34:00', 200.3], [f'{d1} 10:36:00', 150.3])
-        rows = list(map(lambda x: (datetime.datetime.strptime(
-            x[0], '%Y-%m-%d %H:%M:%S'), x[1]), rows1))
-        stat = Statistics(rows)
-        for row in rows:
-            stat.populateMinMax(row[1])
-        self.assertEqual(stat.energyMin, 100.3)
-        self.assertEqual(stat. energyMax, 550.0)
-        stat = Statistics(rows)
-        for row in rows[1:]:
-            total = row[1]
-            stat.populateMinMax(total)
-            stat.populateLastTotal(total)
-        self.assertEqual(stat.energyMin, 100.3)
-        self.assertEqual(stat.energyMax, 200.3)
-
-    def testStatisticspopulatePowerRange(self):
-        # Format of one row: (event_time, event_total)
-        d1 = SunMonTest.testDay.strftime('%Y-%m-%d')
-        rows1 = ([f'{d1} 10:33:00', 590.0], [f'{d1} 10:35:00', 100.3], [f'{d1} 10:39:00', 200.3],
-                 [f'{d1} 10:41:00', 150.3], [
-                     f'{d1} 10:42:00', 89.2], [f'{d1} 10:43:00', 44.2],
-                 [f'{d1} 10:44:00', 26.4], [f'{d1} 10:48:00', 18.5], [
-                     f'{d1} 10:49:00', 10.3],
-                 [f'{d1} 10:50:00', 5.1], [f'{d1} 10:54:00', 404.2], [f'{d1} 10:59:00', 0.3])
-        rows = list(map(lambda x: (datetime.datetime.strptime(
-            x[0], '%Y-%m-%d %H:%M:%S'), x[1]), rows1))
-        stat = Statistics(rows)
-        startTime = rows[0][0].timestamp() - 1
-        lastTime = startTime
-        for row in rows:
-            current = row[0].timestamp()
-            timeDiff = int(current - lastTime)
-            lastTime = current
-            print(f'diff: {timeDiff} apower: {row[1]}')
-            stat.populatePowerRange(row[1], timeDiff)
-        self.assertEqual(stat.powerValues, [
-                         1201, 901, 781, 721, 481, 241, 241, 1, 1])
-
-    def testStatisticsPopulateTimeRange(self):
-        # Format of one row: (event_time, event_total)
-        d1 = SunMonTest.testDay.strftime('%Y-%m-%d')
-        rows1 = ([f'{d1} 07:31:11', 5009.0], [f'{d1} 07:32:12', 5014.2], [f'{d1} 08:39:01', 5020.3],
-                 [f'{d1} 09:41:00', 5150.3], [f'{d1} 10:42:00',
-                                              5189.2], [f'{d1} 11:43:00', 5244.2],
-                 [f'{d1} 12:44:00', 260.1], [
-                     f'{d1} 13:48:00', 900], [f'{d1} 15:49:00', 1500],
-                 [f'{d1} 16:50:00', 2000], [f'{d1} 17:54:00', 2100], [f'{d1} 18:59:00', 2101])
-        rows = list(map(lambda x: (datetime.datetime.strptime(
-            x[0], '%Y-%m-%d %H:%M:%S'), x[1]), rows1))
-        stat = Statistics(rows)
-        for row in rows:
-            total = row[1]
-            timestamp = row[0].timestamp()
-            stat.populateTimeRange(total, timestamp)
-            stat.populateMinMax(total)
-            if stat.lastDebugMessage != None:
-                print('                         ' + stat.lastDebugMessage)
-            stat.populateLastTotal(total)
-            print(f'{row[0]} {timestamp} total: {total}')
-        stat.populateFinish(rows)
-        for ix in range(Statistics.limitsHoursMin, Statistics.limitsHoursMax + 3):
-            print(f'hour: {ix}: {stat.timeValues[ix]}')
-        self.assertEqual(5244.2 - 5009.0 + 2101, stat.energyOfDay)
-        self.assertEqual(260.1, stat.energyMin)
-        self.assertEqual(5244.2, stat.energyMax)
-        values = list(map(lambda x: int(
-            x * 10) / 10.0, stat.timeValues[Statistics.limitsHoursMin:Statistics.limitsHoursMax + 2]))
-        self.assertEqual(values, [7.7, 47.5, 98.1, 43.0,
-                                  38.7, 420.0, 0.0, 836.9, 333.1, 425.4, 84.4, 0.9])
-
-    def testStatisticsPopulate(self):
-        # Format of one row: (event_time, event_total)
-        d1 = SunMonTest.testDay.strftime('%Y-%m-%d')
-        rows1 = ([f'{d1} 07:31:11', 5009.0, 13.7], [f'{d1} 07:32:12', 5014.2, 35.2], [f'{d1} 08:39:01', 5020.3, 98.3],
-                 [f'{d1} 09:41:00', 5150.3, 22.7], [f'{d1} 10:42:00',
-                                                    5189.2, 302.9], [f'{d1} 11:43:00', 5244.2, 401.8],
-                 [f'{d1} 12:44:00', 260.1, 299.7], [f'{d1} 13:48:00',
-                                                    900, 592.2], [f'{d1} 15:49:00', 1500, 144.7],
-                 [f'{d1} 16:50:00', 2000, 149.5], [f'{d1} 17:54:00', 2100, 322.7], [f'{d1} 18:59:00', 2101, 449.8])
-        rows = list(map(lambda x: (datetime.datetime.strptime(
-            x[0], '%Y-%m-%d %H:%M:%S'), x[1], x[2]), rows1))
-        stat = Statistics(rows)
-        doRange = True
-        for row in rows:
-            total = row[1]
-            timestamp = row[0].timestamp()
-            stat.populate(row)
-            if doRange and not stat.populateTimeRange(total, timestamp):
-                doRange = False
-            stat.populateLastTotal(total)
-        stat.populateFinish(rows)
-        values = list(map(lambda x: int(
-            x * 10) / 10.0, stat.timeValues[Statistics.limitsHoursMin:Statistics.limitsHoursMax + 2]))
-        self.assertEqual(values, [7.7, 47.5, 98.1, 43.0,
-                                  38.7, 420.0, 0.0, 836.9, 333.1, 425.4, 84.4, 0.9])
-        self.assertEqual(5244.2 - 5009.0 + 2101, stat.energyOfDay)
-        self.assertEqual(5244.2, stat.energyMax)
-        self.assertEqual(260.1, stat.energyMin)
-
     def testUpdateOneDay(self):
         # Format of one row: (event_time, event_total)
         d1 = SunMonTest.testDay.strftime('%Y-%m-%d')
@@ -304,8 +208,621 @@ WHERE day_date='{d1}';
         self.assertEqual(1800, row[24])
         monitor.dbClose()
 
+
+class SunMonMockTest(unittest.TestCase):
+    '''Tests without database server: the database access is replaced by functions recording the statements.
+    '''
+
+    def testStatisticsPopulateMinMax(self):
+        # Format of one row: (event_time, event_total)
+        d1 = SunMonTest.testDay.strftime('%Y-%m-%d')
+        rows1 = ([f'{d1} 10:33:00', 550.0], [f'{d1} 10:35:00', 100.3], [
+                 f'{d1} 10:34:00', 200.3], [f'{d1} 10:36:00', 150.3])
+        rows = list(map(lambda x: (datetime.datetime.strptime(
+            x[0], '%Y-%m-%d %H:%M:%S'), x[1]), rows1))
+        stat = Statistics(rows)
+        for row in rows:
+            stat.populateMinMax(row[1])
+        self.assertEqual(stat.energyMin, 100.3)
+        self.assertEqual(stat. energyMax, 550.0)
+        stat = Statistics(rows)
+        for row in rows[1:]:
+            total = row[1]
+            stat.populateMinMax(total)
+            stat.populateLastTotal(total)
+        self.assertEqual(stat.energyMin, 100.3)
+        self.assertEqual(stat.energyMax, 200.3)
+
+    def testStatisticspopulatePowerRange(self):
+        # Format of one row: (event_time, event_total)
+        d1 = SunMonTest.testDay.strftime('%Y-%m-%d')
+        rows1 = ([f'{d1} 10:33:00', 590.0], [f'{d1} 10:35:00', 100.3], [f'{d1} 10:39:00', 200.3],
+                 [f'{d1} 10:41:00', 150.3], [
+                     f'{d1} 10:42:00', 89.2], [f'{d1} 10:43:00', 44.2],
+                 [f'{d1} 10:44:00', 26.4], [f'{d1} 10:48:00', 18.5], [
+                     f'{d1} 10:49:00', 10.3],
+                 [f'{d1} 10:50:00', 5.1], [f'{d1} 10:54:00', 404.2], [f'{d1} 10:59:00', 0.3])
+        rows = list(map(lambda x: (datetime.datetime.strptime(
+            x[0], '%Y-%m-%d %H:%M:%S'), x[1]), rows1))
+        stat = Statistics(rows)
+        startTime = rows[0][0].timestamp() - 1
+        lastTime = startTime
+        for row in rows:
+            current = row[0].timestamp()
+            timeDiff = int(current - lastTime)
+            lastTime = current
+            print(f'diff: {timeDiff} apower: {row[1]}')
+            stat.populatePowerRange(row[1], timeDiff)
+        self.assertEqual(stat.powerValues, [
+                         1201, 901, 781, 721, 481, 241, 241, 1, 1])
+
+    def testStatisticsPopulateTimeRange(self):
+        # Format of one row: (event_time, event_total)
+        d1 = SunMonTest.testDay.strftime('%Y-%m-%d')
+        rows1 = ([f'{d1} 07:31:11', 5009.0], [f'{d1} 07:32:12', 5014.2], [f'{d1} 08:39:01', 5020.3],
+                 [f'{d1} 09:41:00', 5150.3], [f'{d1} 10:42:00',
+                                              5189.2], [f'{d1} 11:43:00', 5244.2],
+                 [f'{d1} 12:44:00', 260.1], [
+                     f'{d1} 13:48:00', 900], [f'{d1} 15:49:00', 1500],
+                 [f'{d1} 16:50:00', 2000], [f'{d1} 17:54:00', 2100], [f'{d1} 18:59:00', 2101])
+        rows = list(map(lambda x: (datetime.datetime.strptime(
+            x[0], '%Y-%m-%d %H:%M:%S'), x[1]), rows1))
+        stat = Statistics(rows)
+        for row in rows:
+            total = row[1]
+            timestamp = row[0].timestamp()
+            stat.populateTimeRange(total, timestamp)
+            stat.populateMinMax(total)
+            if stat.lastDebugMessage != None:
+                print('                         ' + stat.lastDebugMessage)
+            stat.populateLastTotal(total)
+            print(f'{row[0]} {timestamp} total: {total}')
+        # the energy of the day is calculated outside (see DayStatistics): counter reset at 12:44
+        stat.populateFinish(rows, 5244.2 - 5009.0 + 2101)
+        for ix in range(Statistics.limitsHoursMin, Statistics.limitsHoursMax + 3):
+            print(f'hour: {ix}: {stat.timeValues[ix]}')
+        self.assertEqual(5244.2 - 5009.0 + 2101, stat.energyOfDay)
+        self.assertEqual(260.1, stat.energyMin)
+        self.assertEqual(5244.2, stat.energyMax)
+        values = list(map(lambda x: int(
+            x * 10) / 10.0, stat.timeValues[Statistics.limitsHoursMin:Statistics.limitsHoursMax + 2]))
+        self.assertEqual(values, [7.7, 47.5, 98.1, 43.0,
+                                  38.7, 420.0, 0.0, 836.9, 333.1, 425.4, 84.4, 0.9])
+
+    def testStatisticsPopulate(self):
+        # Format of one row: (event_time, event_total)
+        d1 = SunMonTest.testDay.strftime('%Y-%m-%d')
+        rows1 = ([f'{d1} 07:31:11', 5009.0, 13.7], [f'{d1} 07:32:12', 5014.2, 35.2], [f'{d1} 08:39:01', 5020.3, 98.3],
+                 [f'{d1} 09:41:00', 5150.3, 22.7], [f'{d1} 10:42:00',
+                                                    5189.2, 302.9], [f'{d1} 11:43:00', 5244.2, 401.8],
+                 [f'{d1} 12:44:00', 260.1, 299.7], [f'{d1} 13:48:00',
+                                                    900, 592.2], [f'{d1} 15:49:00', 1500, 144.7],
+                 [f'{d1} 16:50:00', 2000, 149.5], [f'{d1} 17:54:00', 2100, 322.7], [f'{d1} 18:59:00', 2101, 449.8])
+        rows = list(map(lambda x: (datetime.datetime.strptime(
+            x[0], '%Y-%m-%d %H:%M:%S'), x[1], x[2]), rows1))
+        stat = Statistics(rows)
+        doRange = True
+        for row in rows:
+            total = row[1]
+            timestamp = row[0].timestamp()
+            stat.populate(timestamp, total, row[2])
+            if doRange and not stat.populateTimeRange(total, timestamp):
+                doRange = False
+            stat.populateLastTotal(total)
+        # the energy of the day is calculated outside (see DayStatistics): counter reset at 12:44
+        stat.populateFinish(rows, 5244.2 - 5009.0 + 2101)
+        values = list(map(lambda x: int(
+            x * 10) / 10.0, stat.timeValues[Statistics.limitsHoursMin:Statistics.limitsHoursMax + 2]))
+        self.assertEqual(values, [7.7, 47.5, 98.1, 43.0,
+                                  38.7, 420.0, 0.0, 836.9, 333.1, 425.4, 84.4, 0.9])
+        self.assertEqual(5244.2 - 5009.0 + 2101, stat.energyOfDay)
+        self.assertEqual(5244.2, stat.energyMax)
+        self.assertEqual(260.1, stat.energyMin)
+
+    def testConfigDevices(self):
+        fn = '/tmp/sunmon_test_devices.conf'
+        with open(fn, 'w') as fp:
+            fp.write('''net.domain=localhost
+net.port=8081
+net.timeout=10
+net.devices=roof, garage
+device.roof.domain=192.168.2.44
+device.garage.domain=192.168.2.45
+device.garage.port=80
+device.garage.timeout=3
+db.name=appsuntest
+db.user=sun
+db.code=sun4sun
+''')
+        monitor = Monitor()
+        monitor.config(fn)
+        self.assertEqual(2, len(monitor._devices))
+        roof = monitor._devices[0]
+        self.assertEqual('roof', roof.name)
+        self.assertEqual('192.168.2.44', roof.domain)
+        self.assertEqual(8081, roof.port)
+        self.assertEqual(10, roof.timeout)
+        garage = monitor._devices[1]
+        self.assertEqual('garage', garage.name)
+        self.assertEqual(80, garage.port)
+        self.assertEqual(3, garage.timeout)
+        # the statistics summarize the first device:
+        self.assertEqual('roof', monitor._dataDevice)
+        with open(fn, 'w') as fp:
+            fp.write('''net.domain=localhost
+db.name=appsuntest
+''')
+        monitor = Monitor()
+        monitor.config(fn)
+        self.assertEqual(1, len(monitor._devices))
+        self.assertEqual('localhost', monitor._devices[0].domain)
+
+    def testDeviceBySource(self):
+        monitor = Monitor()
+        monitor.verbose = False
+        roof = Device('roof', 'localhost', 80, '/', 1, monitor)
+        monitor._devices = [roof]
+        # the only device without id accepts all notifications:
+        self.assertIs(roof, monitor.deviceBySource('shellyplus1pm-a8032ab12345'))
+        garage = Device('garage', 'localhost', 80, '/', 1, monitor)
+        garage.src = 'shellyplus1pm-a8032ab99999'
+        monitor._devices.append(garage)
+        self.assertIs(garage, monitor.deviceBySource('shellyplus1pm-a8032ab99999'))
+        for ix in range(200):
+            self.assertIsNone(monitor.deviceBySource(f'intruder{ix}'))
+        self.assertIsNone(monitor.deviceBySource('intruder1'))
+        # no devices are created, the ignored ids are limited:
+        self.assertEqual(2, len(monitor._devices))
+        self.assertEqual(100, len(monitor._unknownSources))
+        monitor._events = []
+        monitor.storePushed('intruder1', {'apower': 50.0}, 1675414800)
+        self.assertEqual([], monitor._events)
+
+    def testStatusTickTime(self):
+        monitor = Monitor()
+        monitor.verbose = False
+        monitor._batchSize = 1000
+        monitor._devices = [Device('roof', 'localhost', 80, '/', 1, monitor)]
+        data = {'aenergy': {'total': 1000.0, 'minute_ts': 1675414800}, 'apower': 50.0, 'voltage': 230.0,
+                'current': 0.2, 'temperature': {'tC': 40.0}}
+        monitor.fetchStatus = lambda device: data
+        # sub-minute intervals: the tick time is used, not the minute timestamp of the device
+        monitor.status(1675414810)
+        monitor.status(1675414820)
+        monitor.status()
+        times = list(map(lambda row: row[0], monitor._events))
+        self.assertEqual(list(map(lambda seconds: datetime.datetime.fromtimestamp(seconds).strftime('%Y-%m-%d %H:%M:%S'),
+                                  (1675414810, 1675414820, 1675414800))), times)
+
+    def testSuppressEvent(self):
+        monitor = Monitor()
+        monitor._deadband = 5
+        monitor._batchSize = 1000
+        start = SunMonTest.testDay.timestamp() + 10 * 3600
+        values = ((0, 10), (0, 10), (0, 10), (1, 10), (50, 10.5),
+                  (52, 11), (54, 11.5), (100, 12), (0, 0))
+        for ix in range(len(values)):
+            monitor.storeEvent(start + 60 * ix, values[ix][1], values[ix][0], 230, 0.0, 40, 'roof')
+        self.assertEqual([0, 1, 50, 54, 100, 0], list(map(lambda row: row[2], monitor._events)))
+        self.assertEqual('2022-02-03 10:03:00', monitor._events[1][0])
+        # the open run is finished by the forced flush:
+        monitor.storeEvent(start + 600, 0.5, 1, 230, 0.0, 40, 'roof')
+        self.assertEqual(6, len(monitor._events))
+        self.assertIsNotNone(monitor._runs['roof'].pending)
+
+    def testUpdateDaysSinglePass(self):
+        monitor = Monitor()
+        monitor.verbose = False
+        start = SunMonTest.testDay + datetime.timedelta(hours=8)
+        events = []
+        for day in range(3):
+            for minute in range(0, 600, 15):
+                events.append((start + datetime.timedelta(days=day, minutes=minute), 1000 * day + minute, 100.0))
+        statements = []
+        inserted = []
+
+        def select(sql, values=None):
+            statements.append(sql)
+            return [(SunMonTest.testDay.date(),)] if 'FROM days' in sql else events
+        monitor.dbSelect = select
+        monitor.dbIterate = lambda sql, values=None, chunkSize=1000: iter(select(sql, values))
+        monitor.dbExecuteMany = lambda sql, rows: inserted.extend(rows)
+        (countTotal, countNew) = monitor.updateDays(SunMonTest.testDay.date(),
+                                                    SunMonTest.testDay.date() + datetime.timedelta(days=4))
+        self.assertEqual(4, countTotal)
+        self.assertEqual(3, countNew)
+        self.assertEqual(2, len(statements))
+        self.assertEqual(['2022-02-04', '2022-02-05'], list(map(lambda row: row[0], inserted)))
+        self.assertEqual(1000, inserted[0][1])
+        self.assertEqual(1585, inserted[0][2])
+
+    def testLiveDay(self):
+        monitor = Monitor()
+        monitor._live = True
+        monitor._liveInterval = 3600
+        monitor.flushEvents = lambda force=True: None
+        stored = []
+        monitor.dbExecute = lambda sql, values=None: stored.append(values) if 'INSERT' in sql else None
+        start = SunMonTest.testDay + datetime.timedelta(hours=8)
+        events = []
+        for minute in range(0, 24 * 60, 10):
+            eventTime = start + datetime.timedelta(minutes=minute)
+            events.append((eventTime, 1000 + minute, 100.0 + minute % 60))
+            monitor.storeEvent(eventTime.timestamp(), events[-1][1], events[-1][2], 230, 0.5, 40, 'roof')
+        # 9:00 ... 23:00 and 1:00 ... 7:00: every hour, 0:00: the final values of the first day
+        self.assertEqual(23, len(stored))
+        self.assertEqual('2022-02-03', stored[15][0])
+        self.assertEqual('2022-02-04', stored[16][0])
+        rows = list(filter(lambda row: row[0] < SunMonTest.testDay + datetime.timedelta(days=1), events))
+        expected = monitor.dayValues(rows[-1][0], monitor.statisticsOfDay(rows))
+        self.assertEqual(expected[0:-2], stored[15][0:-2])
+
+    def testRecomputeDays(self):
+        monitor = Monitor()
+        monitor.verbose = False
+        chunks = []
+
+        def recompute(firstDate, lastDate):
+            chunks.append((firstDate, lastDate))
+            return (lastDate - firstDate).days
+        monitor.recomputeChunk = recompute
+        self.assertEqual(365, monitor.recomputeDays(datetime.date(2023, 1, 1), datetime.date(2024, 1, 1), 1))
+        self.assertEqual(4, len(chunks))
+        self.assertEqual(datetime.date(2023, 1, 1), chunks[0][0])
+        self.assertEqual(datetime.date(2024, 1, 1), chunks[-1][1])
+        for ix in range(1, len(chunks)):
+            self.assertEqual(chunks[ix - 1][1], chunks[ix][0])
+        # the days are replaced by the upsert only: nothing is deleted
+        monitor = Monitor()
+        statements = []
+        monitor.dbExecute = lambda sql, values=None: statements.append((sql, values))
+        monitor.dbExecuteMany = lambda sql, rows: statements.append((sql, rows))
+        monitor.computeDays = lambda first, last, existing=None: [('2023-01-02',)]
+        self.assertEqual(1, monitor.recomputeChunk(datetime.date(2023, 1, 1), datetime.date(2023, 1, 8)))
+        self.assertEqual([(Monitor.sqlInsertDay, [('2023-01-02',)])], statements)
+
+    def testDirtyDays(self):
+        monitor = Monitor()
+        monitor.verbose = False
+        monitor._useRollup = False
+        statements = []
+        monitor.dbExecute = lambda sql, values=None: statements.append((sql, values))
+        monitor.dbExecuteMany = lambda sql, rows: statements.append((sql, rows))
+        monitor._events = [('2022-02-03 10:00:00', 10.0, 5.0, 230, 0.1, 40, 'roof', None, 'monitor'),
+                           ('2022-02-05 10:00:00', 12.0, 5.0, 230, 0.1, 40, 'roof', None, 'monitor'),
+                           ('2022-02-03 10:01:00', 11.0, 5.0, 230, 0.1, 40, 'roof', None, 'monitor')]
+        monitor.flushEvents()
+        self.assertEqual(2, len(statements))
+        self.assertIn('dirty_days', statements[1][0])
+        self.assertEqual(['2022-02-03', '2022-02-05'], list(map(lambda row: row[0], statements[1][1])))
+        statements.clear()
+        dirty = [(datetime.date(2022, 2, 3),), (datetime.date(2022, 2, 4),), (datetime.date(2022, 2, 6),)]
+        ranges = []
+        monitor.dbSelect = lambda sql, values=None: dirty
+        monitor.computeDays = lambda first, last, existing=None: ranges.append((first, last)) or [(first,)]
+        self.assertEqual(2, monitor.updateDirtyDays())
+        self.assertEqual([(datetime.date(2022, 2, 3), datetime.date(2022, 2, 5)),
+                          (datetime.date(2022, 2, 6), datetime.date(2022, 2, 7))], ranges)
+        deletes = list(filter(lambda statement: statement[0].startswith('DELETE'), statements))
+        self.assertEqual(('2022-02-03', '2022-02-05'), deletes[0][1][0:2])
+
+    def testIngestStatements(self):
+        monitor = Monitor()
+        monitor.verbose = False
+        monitor._live = True
+        monitor._liveInterval = 3600
+        monitor.dbExecute = lambda sql, values=None: None
+        statements = []
+        monitor.dbExecuteMany = lambda sql, rows: statements.append((sql.split('(')[0].strip(), len(rows)))
+        start = datetime.datetime.now().replace(hour=10, minute=0, second=0, microsecond=0)
+        for ix in range(5):
+            monitor.storeEvent((start + datetime.timedelta(seconds=10 * ix)).timestamp(), 100.0 + ix, 50.0, 230, 0.2,
+                               40, 'roof')
+        # one INSERT per event, today is not dirty, the rollup tables are not updated before ingest.batch.age:
+        self.assertEqual(5 * [('INSERT INTO events', 1)], statements)
+        statements.clear()
+        monitor._rollupSince -= monitor._batchAge
+        monitor.flushEvents(False)
+        self.assertEqual([('INSERT INTO events_5m', 1), ('INSERT INTO events_1h', 1)], statements)
+        statements.clear()
+        # a delayed event of yesterday:
+        yesterday = start - datetime.timedelta(days=1)
+        monitor.storeEvent(yesterday.timestamp(), 90.0, 50.0, 230, 0.2, 40, 'roof')
+        monitor.flushEvents()
+        self.assertEqual([('INSERT INTO events', 1), ('INSERT INTO dirty_days', 1), ('INSERT INTO events_5m', 1),
+                          ('INSERT INTO events_1h', 1)], statements)
+        self.assertEqual(start.strftime('%Y-%m-%d'), monitor._liveDay.day)
+
+    def testMigrations(self):
+        monitor = Monitor()
+        statements = []
+        monitor.dbExecute = lambda sql, values=None: statements.append((sql, values))
+
+        def select(sql, values=None):
+            if 'max(version)' in sql:
+                return [(5,)]
+            elif sql.startswith('SHOW INDEX'):
+                return [('days', 0, 'day_date')] if values[0] == 'day_date' else []
+            return []
+        monitor.dbSelect = select
+        self.assertEqual(2, monitor.dbMigrate(monitor.migrations()))
+        self.assertIn('schema_version', statements[0][0])
+        self.assertEqual('ALTER TABLE events ADD INDEX event_time (event_time);', statements[1][0])
+        self.assertEqual((6, 'index events.event_time'), statements[2][1])
+        self.assertEqual('ALTER TABLE days ADD INDEX day_energy (day_energy);', statements[3][0])
+        self.assertEqual(7, monitor.migrations()[-1][0])
+        versions = list(map(lambda migration: migration[0], monitor.migrations()))
+        self.assertEqual(sorted(set(versions)), versions)
+
     def testSunRiseDistance(self):
-        self.assertEqual(0.0, sunriseDistance(47.811, datetime.date(2023, 1, 1)))
+        self.assertAlmostEqual(4.14, sunriseDistance(47.811, datetime.date(2023, 1, 1)), 2)
+        self.assertAlmostEqual(7.91, sunriseDistance(47.811, datetime.date(2023, 6, 21)), 2)
+        # polar day and polar night:
+        self.assertAlmostEqual(12.0, sunriseDistance(80.0, datetime.date(2023, 6, 21)), 2)
+        self.assertAlmostEqual(0.0, sunriseDistance(80.0, datetime.date(2023, 12, 21)), 2)
+
+
+class SunMonSqliteTest(unittest.TestCase):
+    '''Runs the monitor with an embedded SQLite database (no database server needed).
+    '''
+    configFile = '/tmp/sunmon_sqlite_test.conf'
+    dbFile = '/tmp/sunmon_sqlite_test.sqlite'
+
+    def setUp(self):
+        for suffix in ('', '-wal', '-shm'):
+            if os.path.exists(SunMonSqliteTest.dbFile + suffix):
+                os.unlink(SunMonSqliteTest.dbFile + suffix)
+        with open(SunMonSqliteTest.configFile, 'w') as fp:
+            fp.write(f'''# configuration of the unit test
+net.domain=localhost
+db.driver=sqlite
+db.name=appsuntest
+db.file={SunMonSqliteTest.dbFile}
+service.interval=60
+''')
+        self._monitor = Monitor()
+        self._monitor.verbose = False
+        self._monitor.config(SunMonSqliteTest.configFile)
+        self._monitor.dbConnect()
+        self._monitor.createTableIfNotExists()
+
+    def tearDown(self):
+        self._monitor.dbClose()
+
+    def events(self, day: datetime.datetime, offset: float=0.0):
+        rc = []
+        for minute in range(0, 600, 15):
+            eventTime = (day + datetime.timedelta(hours=8, minutes=minute)).strftime('%Y-%m-%d %H:%M:%S')
+            rc.append((eventTime, offset + minute, 100.0 + minute % 60, 230, 0.4, 40, None, eventTime, 'unittest'))
+        return rc
+
+    def testSchema(self):
+        monitor = self._monitor
+        self.assertEqual(7, monitor.dbSchemaVersion())
+        self.assertEqual(0, monitor.dbMigrate(monitor.migrations()))
+        self.assertTrue({'events', 'days', 'dirty_days', 'events_5m', 'events_1h'} <= monitor.dbTables())
+        self.assertTrue(monitor.dbHasIndex('days', 'day_date'))
+        self.assertFalse(monitor.addColumnIfNotExists('events', 'event_device', 'varchar(32)'))
+
+    def testEventsAndDays(self):
+        monitor = self._monitor
+        day = SunMonTest.testDay
+        monitor._events = self.events(day)
+        monitor.flushEvents()
+        self.assertEqual(1, monitor.updateDirtyDays())
+        rows = monitor.dbSelect('SELECT day_date, day_totalmin, day_totalmax, day_energy FROM days;')
+        self.assertEqual([(day.date(), 0.0, 585.0, 585.0)], rows)
+        # the upsert replaces the day:
+        monitor._events = self.events(day + datetime.timedelta(minutes=7), 1000)
+        monitor.flushEvents()
+        self.assertEqual(1, monitor.updateDirtyDays())
+        rows = monitor.dbSelect('SELECT day_date, day_totalmax FROM days;')
+        self.assertEqual([(day.date(), 1585.0)], rows)
+        self.assertEqual([], monitor.dbSelect('SELECT dirty_date FROM dirty_days;'))
+        rows = monitor.dbSelect('SELECT event_time FROM events ORDER BY event_time LIMIT 1;')
+        self.assertEqual(day + datetime.timedelta(hours=8), rows[0][0])
+        # two inserts of 4 events per hour:
+        rows = monitor.dbSelect('SELECT rollup_count, rollup_timefirst, rollup_totallast FROM events_1h '
+                                + 'WHERE rollup_start=%s;', ((day + datetime.timedelta(hours=8)).strftime('%Y-%m-%d %H:%M:%S'),))
+        self.assertEqual([(8, day + datetime.timedelta(hours=8), 1045.0)], rows)
+
+    def testChartDataAndRetention(self):
+        monitor = self._monitor
+        day = SunMonTest.testDay
+        monitor._events = self.events(day, 1.0)
+        monitor.flushEvents()
+        chartData = ChartData(monitor, None, 60, True)
+        start = day.strftime('%Y-%m-%d 00:00:00')
+        end = day.strftime('%Y-%m-%d 23:59:59')
+        rows = chartData.query(start, end, 2000)
+        self.assertEqual('events', chartData.lastSource)
+        self.assertEqual(40, len(rows))
+        self.assertEqual((day + datetime.timedelta(hours=8)).timestamp(), rows[0][0])
+        rows = chartData.query(start, end, 12, ['apower', 'total'])
+        self.assertEqual('events_1h', chartData.lastSource)
+        self.assertEqual(10, len(rows))
+        self.assertEqual(46, rows[0][2])
+        self.assertEqual(40, Retention(monitor).prune((day + datetime.timedelta(days=1)).date(), 7))
+        self.assertEqual([(0,)], monitor.dbSelect('SELECT COUNT(*) FROM events;'))
+
+    def testMaintain(self):
+        monitor = self._monitor
+        day = SunMonTest.testDay
+        monitor._retentionDays = 1
+        monitor._events = self.events(day, 1.0) + self.events(day + datetime.timedelta(days=1), 1000.0)
+        monitor.flushEvents()
+        monitor.updateDirtyDays()
+        sql = 'SELECT day_date, day_totalmin, day_totalmax, day_energy, day_hour12 FROM days ORDER BY day_date;'
+        expected = monitor.dbSelect(sql)
+        self.assertEqual(2, len(expected))
+        # without archive nothing is removed:
+        monitor.maintain()
+        self.assertEqual([(80,)], monitor.dbSelect('SELECT COUNT(*) FROM events;'))
+        monitor._archiveDir = '/tmp/sunmon_sqlite_archive'
+        shutil.rmtree(monitor._archiveDir, ignore_errors=True)
+        monitor.archiveMonths(day.date() + datetime.timedelta(days=31), None)
+        # the events of the first day are summarized and archived:
+        rollups = monitor.dbSelect('SELECT * FROM events_1h ORDER BY rollup_start;')
+        monitor.maintain()
+        self.assertEqual([(40,)], monitor.dbSelect('SELECT COUNT(*) FROM events;'))
+        # a backfill does not remove the rollups of the removed events:
+        monitor.rollup().backfill(day.date() - datetime.timedelta(days=30), day.date() + datetime.timedelta(days=2))
+        self.assertEqual(rollups, monitor.dbSelect('SELECT * FROM events_1h ORDER BY rollup_start;'))
+        # a recompute after the pruning reads the archive:
+        self.assertEqual(2, monitor.recomputeDays(day.date(), day.date() + datetime.timedelta(days=2)))
+        self.assertEqual(expected, monitor.dbSelect(sql))
+        # without events and archive the days are kept:
+        shutil.rmtree(monitor._archiveDir, ignore_errors=True)
+        monitor._archive = None
+        self.assertEqual(1, monitor.recomputeDays(day.date(), day.date() + datetime.timedelta(days=2)))
+        self.assertEqual(expected, monitor.dbSelect(sql))
+
+    def testMaintainDevices(self):
+        monitor = self._monitor
+        day = SunMonTest.testDay
+        monitor._retentionDays = 1
+        events = []
+        for device in ('roof', 'garage'):
+            for offset in (0, 1):
+                events += list(map(lambda row: row[0:6] + (device,) + row[7:],
+                                   self.events(day + datetime.timedelta(days=offset), 1000.0 * offset)))
+        monitor._events = events
+        monitor.flushEvents()
+        monitor.updateDirtyDays()
+        monitor._archiveDir = '/tmp/sunmon_sqlite_archive'
+        shutil.rmtree(monitor._archiveDir, ignore_errors=True)
+        # only roof is archived: the events of garage must stay
+        monitor.archiveMonths(day.date() + datetime.timedelta(days=31), 'roof')
+        monitor.maintain()
+        self.assertEqual([('garage', 80), ('roof', 80)], monitor.dbSelect(
+            'SELECT event_device, COUNT(*) FROM events GROUP BY event_device ORDER BY event_device;'))
+        monitor.archiveMonths(day.date() + datetime.timedelta(days=31), 'garage')
+        monitor.maintain()
+        self.assertEqual([('garage', 40), ('roof', 40)], monitor.dbSelect(
+            'SELECT event_device, COUNT(*) FROM events GROUP BY event_device ORDER BY event_device;'))
+
+    def testFlushEvents(self):
+        monitor = self._monitor
+        monitor._batchSize = 3
+        monitor._bufferMax = 5
+        start = int(SunMonTest.testDay.timestamp()) + 10 * 3600
+        statements = []
+        executeMany = monitor.dbExecuteMany
+
+        def failing(sql, rows):
+            statements.append(len(rows))
+            raise Exception('database not available')
+        monitor.dbExecuteMany = failing
+        for ix in range(3):
+            monitor.storeEvent(start + 60 * ix, 100.0 + ix, 50.0, 230, 0.2, 40, 'roof')
+        # the failed batch is kept in the buffer:
+        self.assertEqual([3], statements)
+        self.assertEqual(3, len(monitor._events))
+        for ix in range(3, 6):
+            monitor.storeEvent(start + 60 * ix, 100.0 + ix, 50.0, 230, 0.2, 40, 'roof')
+        # no new try before ingest.batch.age is over, the buffer is limited: the oldest event is dropped
+        self.assertEqual([3], statements)
+        self.assertEqual(5, len(monitor._events))
+        self.assertIn('1 event(s) dropped', monitor.errorsAsString())
+        monitor.dbExecuteMany = executeMany
+        monitor.flushEvents()
+        self.assertEqual([], monitor._events)
+        rows = monitor.dbSelect('SELECT event_total FROM events ORDER BY event_time;')
+        self.assertEqual([(101.0,), (102.0,), (103.0,), (104.0,), (105.0,)], rows)
+
+    def testArchive(self):
+        monitor = self._monitor
+        day = SunMonTest.testDay
+        monitor._archiveDir = '/tmp/sunmon_sqlite_archive'
+        shutil.rmtree(monitor._archiveDir, ignore_errors=True)
+        monitor._events = self.events(day, 1.0)
+        monitor.flushEvents()
+        expected = monitor.computeDays(day.date(), day.date() + datetime.timedelta(days=1))
+        self.assertEqual(1, monitor.archiveMonths(day.date() + datetime.timedelta(days=31), None))
+        # the statistics and the charts do not need the events of archived months:
+        monitor.dbExecute('DELETE FROM events;')
+        self.assertEqual(expected, monitor.computeDays(day.date(), day.date() + datetime.timedelta(days=1)))
+        chartData = ChartData(monitor, None, 60, False, archive=monitor.archive())
+        rows = chartData.query(day.strftime('%Y-%m-%d 00:00:00'), day.strftime('%Y-%m-%d 23:59:59'), 2000)
+        self.assertEqual('archive', chartData.lastSource)
+        self.assertEqual(40, len(rows))
+        self.assertEqual((int((day + datetime.timedelta(hours=8)).timestamp()), 100.0, 1.0, 0.4, 230.0, 40.0), rows[0])
+        # the current month is not closed:
+        self.assertEqual(0, monitor.archiveMonths(datetime.date.today() + datetime.timedelta(days=31), None))
+        # a delayed event of an archived month is merged into the archive:
+        eventTime = (day + datetime.timedelta(hours=7)).strftime('%Y-%m-%d %H:%M:%S')
+        monitor.storeEvents([(eventTime, 0.5, 50.0, 231, 0.2, 39, None, eventTime, 'unittest')])
+        rows = chartData.query(day.strftime('%Y-%m-%d 00:00:00'), day.strftime('%Y-%m-%d 23:59:59'), 2000)
+        self.assertEqual('archive', chartData.lastSource)
+        self.assertEqual(41, len(rows))
+        self.assertEqual((int((day + datetime.timedelta(hours=7)).timestamp()), 50.0, 0.5, 0.2, 231.0, 39.0), rows[0])
+        self.assertEqual((int((day + datetime.timedelta(hours=8)).timestamp()), 100.0, 1.0, 0.4, 230.0, 40.0), rows[1])
+        # archived again: the event is not duplicated
+        self.assertEqual(41, monitor.archive().archiveMonth(Archive.monthStart(day.date()), None))
+
+    def testJournal(self):
+        monitor = self._monitor
+        monitor._journalFile = '/tmp/sunmon_sqlite_journal/journal.dat'
+        shutil.rmtree(os.path.dirname(monitor._journalFile), ignore_errors=True)
+        monitor._batchSize = 100
+        monitor.startJournal()
+        now = int(time.time())
+        for ix in range(5):
+            monitor.storeEvent(now + ix * 60, 1000.0 + ix, 50.0 + ix, 230, 0.2, 40, 'roof')
+        # the events are written into the journal at once (not buffered), the drainer stores them:
+        self.assertEqual([], monitor._events)
+        self.assertEqual(5, monitor._journal.count)
+        events = monitor._journal.events(datetime.datetime.fromtimestamp(now), device='roof')
+        self.assertEqual(5, len(events))
+        monitor.stopJournal()
+        self.assertEqual([(5,)], monitor.dbSelect('SELECT COUNT(*) FROM events;'))
+        monitor.startJournal()
+        self.assertEqual(0, monitor._journal.pending())
+        monitor.stopJournal()
+        # a crash after the INSERT: the events are replayed, but not stored twice
+        journal = Journal(monitor._journalFile)
+        journal.drained = 0
+        journal.writeHeader()
+        journal.close()
+        # an event of another device at the same time is no duplicate:
+        monitor.storeEvents([(datetime.datetime.fromtimestamp(now).strftime('%Y-%m-%d %H:%M:%S'), 999.0, 49.0,
+                              230, 0.2, 40, 'garage', None, 'unittest')])
+        monitor.startJournal()
+        monitor.stopJournal()
+        self.assertEqual([(6,)], monitor.dbSelect('SELECT COUNT(*) FROM events;'))
+        rows = monitor.dbSelect('SELECT SUM(rollup_count) FROM events_5m;')
+        self.assertEqual([(6,)], rows)
+
+    def testJournalFailure(self):
+        monitor = self._monitor
+        monitor._journalFile = '/tmp/sunmon_sqlite_journal/journal.dat'
+        shutil.rmtree(os.path.dirname(monitor._journalFile), ignore_errors=True)
+        monitor.startJournal()
+
+        def failing(events):
+            raise OSError('No space left on device')
+        monitor._journal.append = failing
+        now = int(time.time())
+        for ix in range(3):
+            monitor.storeEvent(now + ix * 60, 1000.0 + ix, 50.0 + ix, 230, 0.2, 40, 'roof')
+        # the events are stored directly into the database:
+        self.assertEqual([], monitor._events)
+        self.assertIn('No space left on device', monitor.errorsAsString())
+        self.assertEqual([(3,)], monitor.dbSelect('SELECT COUNT(*) FROM events;'))
+        self.assertEqual([(3,)], monitor.dbSelect('SELECT SUM(rollup_count) FROM events_5m;'))
+        # neither journal nor database: the events stay in the buffer
+        executeMany = monitor.dbExecuteMany
+
+        def failingDb(sql, rows):
+            raise Exception('database not available')
+        monitor.dbExecuteMany = failingDb
+        monitor.storeEvent(now + 180, 1003.0, 53.0, 230, 0.2, 40, 'roof')
+        self.assertEqual(1, len(monitor._events))
+        monitor.dbExecuteMany = executeMany
+        monitor.stopJournal()
+        monitor.flushEvents()
+        self.assertEqual([(4,)], monitor.dbSelect('SELECT COUNT(*) FROM events;'))
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,58 @@
+'''
+Created on 18.10.2026
+
+@author: wk
+'''
+import unittest
+from SunServer import Service
+from ChartData import ChartData
+
+
+class FakeDb:
+    '''Delivers a few rows for each chart query.
+    '''
+
+    def __init__(self):
+        self.statements = []
+
+    def dbSelect(self, sql: str, values=None):
+        return list(self.dbIterate(sql, values))
+
+    def dbIterate(self, sql: str, values=None):
+        self.statements.append((sql, values))
+        columns = sql.split('FROM')[0].count(',')
+        return iter(map(lambda ix: (1680000000 + ix * 3600,) + (100.0 + ix,) * columns, range(5)))
+
+    def debug(self, message: str):
+        pass
+
+
+class ServiceTest(unittest.TestCase):
+
+    def setUp(self):
+        self.service = Service(['--config=/tmp/sunserver_test.missing.conf'])
+        self.service.printErrors = False
+        self.service.fieldMode = 2
+        Service._instance = self.service
+        self.db = FakeDb()
+
+    def tearDown(self):
+        Service._instance = None
+
+    def testDayToSvgRollup(self):
+        self.service._chartData = ChartData(self.db, useRollup=True)
+        content = self.service.dayToSvg('01.01.2023 00:00', '31.12.2023 23:59')
+        chart = self.service.chartData()
+        self.assertEqual('events_1h', chart.lastSource)
+        self.assertNotIn('current', self.db.statements[-1][0])
+        self.assertIn('<svg', content)
+
+    def testDayToSvgEvents(self):
+        self.service._chartData = ChartData(self.db, useRollup=True)
+        self.service.dayToSvg('28.03.2023 04:00', '28.03.2023 22:00')
+        self.assertEqual('events', self.service.chartData().lastSource)
+        self.assertIn('event_temperature', self.db.statements[-1][0])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,72 @@
+'''
+Created on 18.10.2026
+
+@author: wk
+'''
+import unittest
+import datetime
+import random
+from SunMon import Monitor, Statistics
+from VectorStatistics import VectorStatistics
+
+
+class VectorStatisticsTest(unittest.TestCase):
+
+    def events(self, start: datetime.datetime, days: int, seed: int):
+        '''Builds random events with gaps, fractional seconds and counter resets.
+        '''
+        generator = random.Random(seed)
+        rc = []
+        total = 5000.0
+        current = start
+        end = start + datetime.timedelta(days=days)
+        while current < end:
+            if 5 <= current.hour <= 21:
+                power = generator.uniform(0, 650)
+                total += power / 60
+                if generator.random() < 0.003:
+                    total = 0.0
+                rc.append((current, round(total, 3), round(power, 1)))
+            current += datetime.timedelta(seconds=generator.choice((30, 59.5, 60, 60, 60, 600, 3700)))
+        return rc
+
+    def assertSameStatistics(self, rows):
+        reference = Monitor().statisticsOfDay(rows)
+        (timestamps, totals, powers) = VectorStatistics.fromRows(rows)
+        vector = VectorStatistics(Statistics.limitsPower, Statistics.limitsHoursMin,
+                                  Statistics.limitsHoursMax).populate(timestamps, totals, powers)
+        self.assertEqual(reference.energyMin, vector.energyMin)
+        self.assertEqual(reference.energyMax, vector.energyMax)
+        self.assertEqual(reference.energyOfDay, vector.energyOfDay)
+        self.assertEqual(reference.powerValues, vector.powerValues)
+        self.assertEqual(reference.timeValues[Statistics.limitsHoursMin:Statistics.limitsHoursMax + 2],
+                         vector.timeValues[Statistics.limitsHoursMin:Statistics.limitsHoursMax + 2])
+
+    def testIdenticalResults(self):
+        for seed in range(5):
+            rows = self.events(datetime.datetime(2023, 3, 24 + seed, 0, 0, 0), 1, seed)
+            self.assertSameStatistics(rows)
+
+    def testFewRows(self):
+        rows = [(datetime.datetime(2023, 6, 1, 12, 0, 0), 100.0, 250.0)]
+        self.assertSameStatistics(rows)
+        rows.append((datetime.datetime(2023, 6, 1, 12, 0, 0), 100.0, 250.0))
+        self.assertSameStatistics(rows)
+        rows.append((datetime.datetime(2023, 6, 1, 19, 30, 0), 0.0, 0.0))
+        self.assertSameStatistics(rows)
+
+    def testSplitDays(self):
+        rows = self.events(datetime.datetime(2023, 3, 25, 0, 0, 0), 3, 7)
+        (timestamps, totals, powers) = VectorStatistics.fromRows(rows)
+        days = VectorStatistics.splitDays(timestamps)
+        self.assertEqual(3, len(days))
+        self.assertEqual(0, days[0][0])
+        self.assertEqual(len(rows), days[-1][1])
+        for start, end in days:
+            self.assertEqual(rows[start][0].date(), rows[end - 1][0].date())
+            self.assertSameStatistics(rows[start:end])
+        self.assertEqual([], VectorStatistics.splitDays(timestamps[0:0]))
+
+
+if __name__ == "__main__":
+    unittest.main()